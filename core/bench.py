@@ -0,0 +1,178 @@
+''' Repeatable timing of a program on each target.
+    The program is built once per target, so the build time is left out of
+    the runs. After the warm up runs, each run is timed and the report has
+    the min, median and standard deviation of the times and the peak memory
+    (RSS) of the process. '''
+
+import os
+import sys
+import json
+import time
+import statistics
+import tempfile
+import subprocess
+from contextlib import redirect_stdout
+
+def build(filename, lang, standardLibs, buildOptions=None):
+    ''' Transpile and build the program. Return the command that runs it. '''
+    from interpreter import Interpreter
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        interpreter = Interpreter(filename=filename, lang=lang, standardLibs=standardLibs,
+            transpileOnly=True, buildOptions=buildOptions)
+        interpreter.run()
+        return interpreter.engine.compile()
+
+def runOnce(command, inputFile=None):
+    ''' Run the command. Return its time in seconds and its peak RSS in KB,
+        or None where the RSS of a child process is not available. '''
+    stdin = open(inputFile, 'rb') if inputFile else subprocess.DEVNULL
+    try:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdin=stdin, stdout=subprocess.DEVNULL)
+        if hasattr(os, 'wait4'):
+            _, status, usage = os.wait4(process.pid, 0)
+            elapsed = time.perf_counter() - start
+            process.returncode = os.waitstatus_to_exitcode(status)
+            # ru_maxrss is in bytes on macOS and in KB elsewhere
+            rss = usage.ru_maxrss // 1024 if sys.platform == 'darwin' else usage.ru_maxrss
+        else:
+            process.wait()
+            elapsed = time.perf_counter() - start
+            rss = None
+    finally:
+        if inputFile:
+            stdin.close()
+    if process.returncode:
+        raise subprocess.CalledProcessError(process.returncode, command)
+    return elapsed, rss
+
+def peakRss(command, inputFile=None, interval=0.0005):
+    ''' Run the command and return its peak RSS in KB. On Linux the
+        ru_maxrss of a child includes the peak RSS of Photon, inherited on
+        fork, so the VmHWM of the program is read from /proc while it runs.
+        Return None if the program ended before it was read twice, as the
+        first read may be right after the exec. '''
+    stdin = open(inputFile, 'rb') if inputFile else subprocess.DEVNULL
+    peaks = []
+    try:
+        # Popen returns after the exec, so only the program itself is read
+        process = subprocess.Popen(command, stdin=stdin, stdout=subprocess.DEVNULL)
+        while process.poll() is None:
+            try:
+                with open(f'/proc/{process.pid}/status') as f:
+                    peaks += [int(line.split()[1]) for line in f if line.startswith('VmHWM:')]
+            except OSError:
+                pass
+            time.sleep(interval)
+    finally:
+        if inputFile:
+            stdin.close()
+    return max(peaks) if len(peaks) > 1 else None
+
+def stats(times):
+    return {
+        'min':min(times),
+        'median':statistics.median(times),
+        'mean':statistics.mean(times),
+        'stdev':statistics.stdev(times) if len(times) > 1 else 0.0,
+        'runs':len(times),
+    }
+
+def measure(command, repeat=10, warmup=1, inputFile=None):
+    ''' Return the stats of the runs of the command and their peak RSS '''
+    times = []
+    peaks = []
+    for i in range(warmup + repeat):
+        elapsed, rss = runOnce(command, inputFile)
+        if i >= warmup:
+            times.append(elapsed)
+            peaks.append(rss)
+    result = stats(times)
+    if os.path.isdir('/proc/self'):
+        # Sampled on a run of its own, so the timed runs are not slowed down
+        result['rss'] = peakRss(command, inputFile)
+    else:
+        result['rss'] = None if None in peaks else max(peaks)
+    return result
+
+def bench(filename, langs, standardLibs, repeat=10, warmup=1, buildOptions=None, inputFile=None):
+    ''' Return {lang: stats} of the program. A target that can't build
+        or run the program has an error instead of stats. '''
+    results = {}
+    for lang in langs:
+        try:
+            start = time.perf_counter()
+            command = build(filename, lang, standardLibs, buildOptions)
+            buildTime = time.perf_counter() - start
+            results[lang] = measure(command, repeat, warmup, inputFile)
+            results[lang]['build'] = buildTime
+        except (Exception, SystemExit) as e:
+            results[lang] = {'error':f'{type(e).__name__}: {e}'.strip()}
+    # Speedup of each target over the slowest one
+    medians = [r['median'] for r in results.values() if not 'error' in r]
+    for result in results.values():
+        if not 'error' in result:
+            result['speedup'] = max(medians) / result['median'] if result['median'] else None
+    return results
+
+def report(filename, results):
+    ''' Return the table of the results '''
+    lines = [f'{filename}', f'{"target":<8}{"min":>10}{"median":>10}{"stdev":>10}{"peak RSS":>12}{"speedup":>9}{"build":>9}']
+    for lang, result in results.items():
+        if 'error' in result:
+            lines.append(f'{lang:<8}failed: {result["error"].splitlines()[0]}')
+            continue
+        rss = '-' if result['rss'] is None else f'{result["rss"] / 1024:.1f} MB'
+        speedup = f'{result["speedup"]:.2f}x' if result['speedup'] else '-'
+        lines.append(f'{lang:<8}{result["min"]:>9.4f}s{result["median"]:>9.4f}s{result["stdev"]:>9.4f}s'
+            f'{rss:>12}{speedup:>9}{result["build"]:>8.2f}s')
+    runs = next((r['runs'] for r in results.values() if 'runs' in r), 0)
+    lines.append(f'{runs} runs per target, build time not included')
+    return '\n'.join(lines)
+
+def timeSnippet(history, snippet, lang='c', standardLibs=None, repeat=5, minTime=0.2):
+    ''' Time the Photon snippet on the target, after the lines of history.
+        The snippet runs in a loop whose count is read from the input, so
+        the program is built once. Return the number of loops and the time
+        per loop of each repeat, without the time of a run with no loops. '''
+    standardLibs = standardLibs or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'libs/')
+    source = history + ['timeitLoops = readInts()', 'for timeitLoop in 0..timeitLoops[0]:']
+    source += ['    ' + line for line in snippet]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            with open('snippet.w', 'w', encoding='utf8') as f:
+                f.write('\n'.join(source) + '\n')
+            command = build('snippet.w', lang, standardLibs)
+            def run(loops):
+                with open('loops.txt', 'w') as f:
+                    f.write(str(loops))
+                return runOnce(command, 'loops.txt')[0]
+            empty = min(run(0) for i in range(3))
+            loops = 1
+            # The compiler may remove a loop without effects, so loops are capped
+            while run(loops) - empty < minTime and loops < 10**9:
+                loops *= 10
+            if loops >= 10**9:
+                raise RuntimeError(f'The snippet takes no time on {lang}. Its result is probably unused and optimized away.')
+            times = [max(run(loops) - empty, 0) / loops for i in range(repeat)]
+        finally:
+            os.chdir(cwd)
+    return loops, times
+
+def formatTime(seconds):
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if seconds >= scale:
+            return f'{seconds / scale:.3g} {unit}'
+    return f'{seconds / 1e-9:.3g} ns'
+
+def timeitReport(lang, loops, times):
+    ''' Return the line of the timing of a snippet '''
+    mean = statistics.mean(times)
+    stdev = statistics.stdev(times) if len(times) > 1 else 0.0
+    return (f'{lang}: {formatTime(mean)} ± {formatTime(stdev)} per loop '
+        f'(best {formatTime(min(times))}, {len(times)} runs, {loops} loops each)')
+
+def toJson(filename, results):
+    return json.dumps({'program':filename, 'platform':sys.platform, 'results':results}, indent=4)
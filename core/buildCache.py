@@ -0,0 +1,144 @@
+''' Content addressed cache of native builds.
+    Binaries are stored in ~/.photon/cache by the hash of everything
+    that goes into the build, so unchanged programs skip the compiler. '''
+
+import os
+import re
+import hashlib
+import pathlib
+import shutil
+import subprocess
+import tempfile
+from glob import glob
+import probe
+
+# Size limit of the cache in bytes. Least recently used builds are removed first.
+MAX_CACHE_SIZE = int(os.environ.get('PHOTON_CACHE_SIZE', 256)) * 1024 * 1024
+
+def cacheDir():
+    ''' Return the cache directory, creating it if needed '''
+    path = os.path.join(pathlib.Path.home(), '.photon', 'cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def writeIfChanged(filename, content):
+    ''' Write content to filename only if it differs from the current one.
+        Return True if the file was written. '''
+    try:
+        with open(filename, 'r') as f:
+            if f.read() == content:
+                return False
+    except (FileNotFoundError, UnicodeDecodeError):
+        pass
+    with open(filename, 'w') as f:
+        f.write(content)
+    return True
+
+def compilerVersion(compiler):
+    ''' Return the version banner of the compiler '''
+    info = probe.tool(compiler)
+    if info is None:
+        return b''
+    return info['version'].encode()
+
+def localIncludes(filename):
+    ''' Return the source file and every local header it includes, recursively '''
+    folder = os.path.dirname(filename)
+    files = []
+    pending = [filename]
+    while pending:
+        name = pending.pop()
+        if name in files or not os.path.isfile(name):
+            continue
+        files.append(name)
+        with open(name, 'rb') as f:
+            for header in re.findall(rb'#include\s+"([^"]+)"', f.read()):
+                pending.append(os.path.join(folder, header.decode()))
+    return sorted(files)
+
+def buildKey(source, command, salt=''):
+    ''' Hash the sources, headers, compiler command and compiler version.
+        salt adds other inputs of the build, like a training profile. '''
+    key = hashlib.sha256(salt.encode())
+    key.update(compilerVersion(command[0]))
+    key.update('\0'.join(command).encode())
+    for name in localIncludes(source):
+        key.update(os.path.basename(name).encode() + b'\0')
+        with open(name, 'rb') as f:
+            key.update(f.read())
+    return key.hexdigest()
+
+def linkKey(objectKeys, command):
+    ''' Hash the keys of the linked objects and the link command '''
+    key = hashlib.sha256()
+    key.update(compilerVersion(command[0]))
+    key.update('\0'.join(objectKeys + command).encode())
+    return key.hexdigest()
+
+def fetch(key, output):
+    ''' Copy the cached build to output. Return True on a cache hit. '''
+    cached = os.path.join(cacheDir(), key)
+    if not os.path.isfile(cached):
+        return False
+    # Mark as recently used
+    os.utime(cached)
+    shutil.copy2(cached, output)
+    return True
+
+def store(key, output):
+    ''' Save the build output in the cache and evict old entries '''
+    cached = os.path.join(cacheDir(), key)
+    temp = f'{cached}.{os.getpid()}.tmp'
+    shutil.copy2(output, temp)
+    os.replace(temp, cached)
+    os.utime(cached)
+    evict()
+
+def evict(maxSize=None):
+    ''' Remove the least recently used builds until the cache fits maxSize '''
+    if maxSize is None:
+        maxSize = MAX_CACHE_SIZE
+    entries = []
+    for entry in os.scandir(cacheDir()):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= maxSize:
+            break
+        os.remove(path)
+        total -= size
+
+def runtimeFlags(flags):
+    ''' Flags used to build the runtime library. LTO and profiling are left
+        out so the archive can be linked by any build of the program. '''
+    return [f for f in flags if not f.startswith(('-flto', '-fprofile', '-Wno-missing-profile'))]
+
+def runtimeLibrary(runtimeDir, flags, compiler='gcc'):
+    ''' Return the path of libphoton.a built from the runtime sources.
+        It's compiled once per compiler, flags and runtime version and
+        kept in ~/.photon/lib. '''
+    flags = runtimeFlags(flags)
+    sources = sorted(glob(os.path.join(runtimeDir, '*.c')))
+    key = hashlib.sha256(compilerVersion(compiler))
+    key.update('\0'.join([compiler] + flags).encode())
+    for name in sources + sorted(glob(os.path.join(runtimeDir, '*.h'))):
+        key.update(os.path.basename(name).encode() + b'\0')
+        with open(name, 'rb') as f:
+            key.update(f.read())
+    libDir = os.path.join(pathlib.Path.home(), '.photon', 'lib', key.hexdigest()[:16])
+    library = os.path.join(libDir, 'libphoton.a')
+    if os.path.isfile(library):
+        return library
+    os.makedirs(libDir, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=libDir) as temp:
+        objects = []
+        for source in sources:
+            obj = os.path.join(temp, os.path.basename(source)[:-2] + '.o')
+            subprocess.check_call([compiler] + flags + ['-c', source, '-o', obj])
+            objects.append(obj)
+        archive = os.path.join(temp, 'libphoton.a')
+        subprocess.check_call(['ar', 'rcs', archive] + objects)
+        os.replace(archive, library)
+    return library
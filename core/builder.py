@@ -3,8 +3,20 @@
 # according to the target platform and preferences
 # Each target is handled by its Toolchain
 
-class Builder():
-    def __init__(self, platform, **kwargs):
-        pass
+from toolchain import LinuxToolchain
 
+toolchains = {
+    'linux': LinuxToolchain,
+}
 
+class Builder():
+    def __init__(self, platform, **kwargs):
+        if not platform in toolchains:
+            print(f'ERROR: Build for platform {platform} not implemented yet.')
+            return
+        self.toolchain = toolchains[platform](platform, **kwargs)
+        self.toolchain.transpile()
+        self.toolchain.getBuildFiles()
+        self.toolchain.prepare()
+        if self.toolchain.make():
+            self.toolchain.runProject()
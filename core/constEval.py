@@ -0,0 +1,92 @@
+''' Compile time evaluation of the const declarations.
+    The pure functions of the program and its consts run on the astEngine
+    while the program is transpiled. Each const is then assigned the
+    literal of its value, so no target computes it when the program runs,
+    and the uses of scalar consts are replaced by their literals. '''
+
+import math
+import marshal
+from copy import deepcopy
+
+# Tokens of the functions that can't run at compile time
+impureTokens = {'printFunc', 'inputFunc', 'import', 'class'}
+
+def tokens(token):
+    ''' Return the kinds of tokens in the token '''
+    kinds = set()
+    if isinstance(token, dict):
+        kinds.add(token.get('token'))
+        for value in token.values():
+            kinds |= tokens(value)
+    elif isinstance(token, (list, tuple)):
+        for value in token:
+            kinds |= tokens(value)
+    return kinds
+
+def isPure(token):
+    ''' If the function has no effects other than its result. Functions
+        that read globals fail when they run, as the consts are the only
+        globals defined at compile time. '''
+    return not tokens(token['block']) & impureTokens
+
+def snapshot(token):
+    ''' Copy of the token before the transpiler changes it. Tokens are
+        plain dicts and lists, which marshal copies faster than deepcopy. '''
+    return marshal.loads(marshal.dumps(token))
+
+def scalar(name, value):
+    ''' Return the literal token of an int, float, bool or str value '''
+    if isinstance(value, bool):
+        return {'token':'bool', 'type':'bool', 'value':'true' if value else 'false'}
+    elif isinstance(value, int):
+        literal = {'token':'num', 'type':'int', 'value':str(abs(value))}
+    elif isinstance(value, float):
+        if not math.isfinite(value):
+            raise SyntaxError(f'Const {name} is {value}, which has no literal.')
+        literal = {'token':'floatNumber', 'type':'float', 'value':repr(abs(value))}
+    elif isinstance(value, str):
+        if any(c in value for c in '"\\{}\n'):
+            raise SyntaxError(f'Const {name} with quotes, braces or escapes not implemented yet.')
+        return {'token':'str', 'type':'str', 'value':f'"{value}"', 'expressions':[]}
+    else:
+        raise SyntaxError(f'Const {name} of type {type(value).__name__} not implemented yet.')
+    if value < 0:
+        literal['modifier'] = '-'
+    return literal
+
+def literal(name, value):
+    ''' Return the expr token of the value of the const '''
+    if isinstance(value, list):
+        elements = [expr(scalar(name, v)) for v in value]
+        types = {e['type'] for e in elements}
+        if len(types) > 1:
+            raise SyntaxError(f'Const {name} with elements of types {", ".join(sorted(types))} not implemented yet.')
+        elementType = types.pop() if types else 'unknown'
+        return expr({'token':'array', 'type':'array', 'elementType':elementType,
+            'len':len(elements), 'size':'unknown', 'elements':elements})
+    return expr(scalar(name, value))
+
+def expr(token):
+    return {'token':'expr', 'type':token['type'], 'args':[token], 'ops':[]}
+
+class ConstEvaluator():
+    ''' Runs the pure functions and the consts of a program on the astEngine '''
+    def __init__(self, standardLibs):
+        from engines.astEngine import Engine
+        self.engine = Engine('', standardLibs=standardLibs)
+
+    def define(self, token):
+        ''' Define the pure function in the compile time globals '''
+        exec(self.engine.bytecode(deepcopy(token), echo=False), self.engine.globals)
+
+    def evaluate(self, name, token, varType='unknown'):
+        ''' Return the value of the expr token of the const, converted to its declared type '''
+        assign = {'token':'assign', 'opcode':'assign', 'line':token.get('line', -1),
+            'target':{'token':'var', 'type':'unknown', 'name':name}, 'expr':deepcopy(token)}
+        try:
+            exec(self.engine.bytecode(assign, echo=False), self.engine.globals)
+        except Exception as e:
+            raise SyntaxError(f'Const {name} can\'t be evaluated at compile time: {type(e).__name__}: {e}')
+        if varType in {'int', 'float', 'str', 'bool'}:
+            self.engine.globals[name] = {'int':int, 'float':float, 'str':str, 'bool':bool}[varType](self.engine.globals[name])
+        return self.engine.globals[name]
@@ -3,6 +3,7 @@
 
 import os
 import sys
+import probe
 
 UPDATED_REPO = False
 
@@ -41,17 +42,8 @@ def getSystem():
 
 def programIsInstalled(name):
     ''' Verify if program is installed it system. '''
-    try:
-        platform_os = getSystem()
-        if platform_os == "win":
-            return str(os.popen(f'where /q {name} && echo %ERRORLEVEL%').read()).strip() == "0"
-        elif platform_os == "unix":
-            return str(os.popen(f'command -v {name}').read()).strip() != ""
-        else:
-            raise Exception('`platform_os` not supported')
-    except Exception as e:
-        print(f"error: {e}")
-        return False
+    # Probes are cached, so this doesn't spawn a shell for known programs
+    return probe.tool(name) is not None
 
 # INIT - Installer for Win32/Windows (Chocolatey)
 def powershellIsInstalled():
@@ -0,0 +1,275 @@
+''' Engine that runs Photon programs inside this Python process.
+    The format hooks of the Python transpiler are overridden to lower the
+    statements to Python ast nodes, which are compiled and executed without
+    writing Sources/py/main.py or starting another interpreter. Names and
+    numbers become ast nodes directly. Other expressions are still
+    formatted by the transpiler, as they carry its type rules, and parsed
+    as ast expressions. '''
+
+import ast
+import sys
+import keyword
+import traceback
+from typeProfile import TypeRecorder
+from transpilers.pyTranspiler import Transpiler as PyTranspiler
+from engines.pyEngine import Engine as PyEngine
+
+def debug(*args):
+    #print(*args)
+    pass
+
+# Python 3.12 added the type parameters of functions and classes
+typeParams = {'type_params':[]} if sys.version_info >= (3, 12) else {}
+
+class Elif():
+    ''' An elif in the statements, before they are nested in their blocks '''
+    def __init__(self, node):
+        self.node = node
+
+class Transpiler(PyTranspiler):
+    def inferType(self, expr):
+        # Python values carry their types, so unknown ones are left for the runtime
+        return expr['type']
+
+    def expression(self, value):
+        value = value.strip()
+        if value in {'True', 'False', 'None'}:
+            return ast.Constant(ast.literal_eval(value))
+        elif value.isidentifier() and not keyword.iskeyword(value):
+            return ast.Name(value, ast.Load())
+        elif value.isdigit():
+            return ast.Constant(int(value))
+        return ast.parse(value, mode='eval').body
+
+    def store(self, value):
+        node = self.expression(value)
+        node.ctx = ast.Store()
+        return node
+
+    def call(self, func, args):
+        return ast.Expr(ast.Call(func=func, args=args, keywords=[]))
+
+    def locate(self, node):
+        ''' Give the node and its expressions the Photon line of the statement '''
+        line = self.currentLine or 1
+        for n in ast.walk(node):
+            if 'lineno' in n._attributes:
+                n.lineno = n.end_lineno = line
+                n.col_offset = n.end_col_offset = 0
+
+    def insertCode(self, line, index=None):
+        if isinstance(line, (ast.AST, Elif)):
+            self.locate(line.node if isinstance(line, Elif) else line)
+            # The base class keeps the origin of text lines only
+            currentLine, self.currentLine = self.currentLine, None
+            super().insertCode(line, index)
+            self.currentLine = currentLine
+        elif line:
+            super().insertCode(line, index)
+
+    def processExpression(self, token):
+        expr = self.processExpr(token)
+        # Some array methods are statements, like fill
+        for node in ast.parse(expr['value']).body:
+            self.insertCode(node)
+
+    def processBreak(self, token):
+        self.insertCode(ast.Break())
+
+    def formatVarInit(self, name, varType):
+        return ast.Assign(targets=[self.store(name)], value=ast.Constant(None))
+
+    def formatIndexAssign(self, target, expr, inMemory=False):
+        if target['type'] in {'array', 'map'}:
+            index = self.processExpr(target['indexAccess'])['value']
+            return ast.Assign(targets=[self.store(f'{target["name"]}[{index}]')],
+                value=self.expression(self.formatExpr(expr)))
+        raise SyntaxError(f'Index assign with type {target["type"]} not implemented in py target.')
+
+    def formatArrayAppend(self, target, expr):
+        append = ast.Attribute(value=self.expression(target['value']), attr='append', ctx=ast.Load())
+        return self.call(append, [self.expression(self.formatExpr(expr))])
+
+    def formatArrayIncrement(self, target, index, expr):
+        return ast.AugAssign(target=self.store(f'{target["name"]}[{index}]'), op=ast.Add(),
+            value=self.expression(self.formatExpr(expr)))
+
+    def formatIncrement(self, target, expr):
+        return ast.AugAssign(target=self.store(target['value']), op=ast.Add(),
+            value=self.expression(self.formatExpr(expr)))
+
+    def formatAssign(self, target, expr, inMemory=False):
+        if target['token'] == 'var':
+            variable = target['name']
+        elif target['token'] == 'dotAccess':
+            variable = self.getValAndType(target)['value']
+        else:
+            raise SyntaxError(f'Format assign with variable {target} not implemented yet.')
+        return ast.Assign(targets=[self.store(variable)], value=self.expression(self.formatExpr(expr)))
+
+    def formatIf(self, expr):
+        return ast.If(test=self.expression(expr['value']), body=[], orelse=[])
+
+    def formatElif(self, expr):
+        return Elif(self.formatIf(expr))
+
+    def formatWhile(self, expr):
+        return ast.While(test=self.expression(self.formatExpr(expr)), body=[], orelse=[])
+
+    def formatFor(self, variables, iterable):
+        if 'from' in iterable:
+            bounds = [iterable[key]['value'] for key in ['from', 'to', 'step']]
+            iterator = ast.Call(func=ast.Name('range', ast.Load()),
+                args=[self.expression(value) for value in bounds], keywords=[])
+        else:
+            iterator = self.expression(iterable['value'])
+        return ast.For(target=self.store(variables[0]['value']), iter=iterator, body=[], orelse=[])
+
+    def formatFunc(self, name, returnType, args, kwargs):
+        names = [arg['value'] for arg in args] + [kw['name'] for kw in kwargs]
+        if self.inClass and name == 'new':
+            name = self.constructorName
+        arguments = ast.arguments(posonlyargs=[], args=[ast.arg(arg=n) for n in names],
+            kwonlyargs=[], kw_defaults=[], defaults=[])
+        return ast.FunctionDef(name=name, args=arguments, body=[], decorator_list=[], **typeParams)
+
+    def formatProbe(self, site):
+        start, end = super().formatProbe(site)
+        probe = self.expression(start[len('with '):-1])
+        return ast.With(items=[ast.withitem(context_expr=probe)], body=[]), end
+
+    def formatClass(self, name, args):
+        self.className = name
+        return ast.ClassDef(name=name, bases=[], keywords=[], body=[], decorator_list=[], **typeParams)
+
+    def formatClassAttribute(self, variable, expr):
+        return ast.Assign(targets=[self.store(variable['value'])], value=self.expression(self.formatExpr(expr)))
+
+    def formatReturn(self, expr):
+        return ast.Return(value=self.expression(expr['value']) if expr else None)
+
+    def formatPrint(self, value):
+        args = [self.expression(value['value'])] if value['value'] else []
+        return self.call(ast.Name('print', ast.Load()), args)
+
+    def statements(self, line):
+        ''' Return the nodes of a line of Python code, like the lines of
+            the modules, which are transpiled by the Python transpiler '''
+        if line.startswith('elif '):
+            return [Elif(self.statements(line[2:])[0])]
+        elif self.isBlock(line):
+            node = ast.parse(line + ' pass').body[0]
+            node.body = []
+            return [node]
+        return ast.parse(line.strip()).body
+
+    def nest(self, lines):
+        ''' Return the statements nested in the bodies of their blocks '''
+        module = []
+        bodies = [module]
+        blocks = []
+        for line in lines:
+            if isinstance(line, str):
+                if line.startswith('#end'):
+                    if not bodies[-1]:
+                        bodies[-1].append(ast.Pass())
+                    bodies.pop()
+                    blocks.pop()
+                    continue
+                elif line == 'else:':
+                    if not bodies[-1]:
+                        bodies[-1].append(ast.Pass())
+                    bodies[-1] = blocks[-1].orelse
+                    continue
+                nodes = self.statements(line)
+            else:
+                nodes = [line]
+            for node in nodes:
+                if isinstance(node, Elif):
+                    if not bodies[-1]:
+                        bodies[-1].append(ast.Pass())
+                    blocks[-1].orelse.append(node.node)
+                    blocks[-1] = node.node
+                    bodies[-1] = node.node.body
+                    continue
+                bodies[-1].append(node)
+                if isinstance(node, ast.stmt) and getattr(node, 'body', None) == []:
+                    blocks.append(node)
+                    bodies.append(node.body)
+        return module
+
+class Engine(PyEngine):
+    def __init__(self, filename, **kwargs):
+        self.transpiler = Transpiler(filename, **kwargs)
+        self.filename = filename
+        self.globals = {'__name__':'__main__'}
+        self.definitions = {}
+        # Imports and runtime libs already run in the REPL
+        self.loaded = set()
+
+    @property
+    def classes(self):
+        return self.transpiler.classes
+
+    def module(self, lines):
+        ''' Return the ast module of the lines, after the imports and the
+            runtime libs that weren't loaded yet '''
+        body = []
+        for imp in sorted(self.transpiler.imports - self.loaded):
+            body += ast.parse(imp).body
+        for lib in sorted(self.transpiler.runtimeLibs - self.loaded):
+            with open(f'{self.transpiler.standardLibs}/native/py/{lib}', encoding='utf8') as f:
+                body += ast.parse(f.read()).body
+        self.loaded |= self.transpiler.imports | self.transpiler.runtimeLibs
+        module = ast.Module(body=body + self.transpiler.nest(lines), type_ignores=[])
+        return ast.fix_missing_locations(module)
+
+    def bytecode(self, token, echo=True):
+        ''' Lower the token to a Python ast and compile it.
+            Expressions are printed if echo is set. '''
+        self.transpiler.source = []
+        self.transpiler.outOfMain = []
+        self.transpiler.process(token)
+        module = self.module(self.transpiler.outOfMain + self.transpiler.source)
+        if token['token'] in {'expr'} and echo and module.body and isinstance(module.body[-1], ast.Expr):
+            expr = module.body[-1]
+            expr.value = ast.copy_location(ast.Call(func=ast.copy_location(ast.Name('print', ast.Load()), expr),
+                args=[expr.value], keywords=[]), expr)
+        elif token['token'] in {'func', 'class'}:
+            # A definition is compiled once, even if it's defined again
+            code = ast.dump(module)
+            if not code in self.definitions:
+                self.definitions[code] = compile(module, self.filename or '<photon>', 'exec')
+            return self.definitions[code]
+        return compile(module, self.filename or '<photon>', 'exec')
+
+    def process(self, token):
+        if self.filename:
+            # A program runs when all of it was processed
+            self.transpiler.process(token)
+            return True
+        return super().process(token)
+
+    def run(self):
+        ''' Compile the program and run it in this process '''
+        debug(f'Running {self.filename}')
+        self.execute(self.module(self.transpiler.outOfMain + self.transpiler.source))
+
+    def execute(self, module):
+        bytecode = compile(module, self.filename, 'exec')
+        # Training run of the type profile of the C target
+        recorder = TypeRecorder(self.filename) if self.transpiler.buildOptions.get('recordTypes') else None
+        if recorder:
+            recorder.start()
+        try:
+            exec(bytecode, self.globals, self.globals)
+        except SystemExit:
+            raise
+        except BaseException as e:
+            # Show only the frames of the Photon program
+            traceback.print_exception(type(e), e, e.__traceback__.tb_next, chain=False)
+            sys.exit(1)
+        finally:
+            if recorder:
+                recorder.stop()
+                recorder.save()
@@ -1,5 +1,7 @@
 from transpilers.pyTranspiler import Transpiler
 import os
+from timeit import Timer
+from contextlib import redirect_stdout
 
 def debug(*args):
     #print(*args)
@@ -9,29 +11,52 @@ class Engine():
     def __init__(self, filename, **kwargs):
         self.transpiler = Transpiler(filename, **kwargs)
         self.globals = {}
+        # Code objects of the functions and classes of the session, by their source
+        self.definitions = {}
 
-    def process(self, token):
+    def bytecode(self, token, echo=True):
+        ''' Transpile the token to Python and compile it.
+            Expressions are printed if echo is set. '''
+        self.transpiler.source = []
+        self.transpiler.outOfMain = []
         self.transpiler.process(token)
         source = self.transpiler.outOfMain + self.transpiler.source
-        code = ''
+        lines = []
         indent = 0
         for line in source:
-            if line:
-                if line.startswith('#end'):
-                    indent -= 4
-            code += ' '*indent+line+'\n'
+            if line.startswith('#end'):
+                indent -= 4
+            lines.append(' '*indent+line)
             if self.transpiler.isBlock(line):
                 indent += 4
+        code = '\n'.join(lines)
+        if token['token'] in {'expr'}:
+            if code.endswith(';'):
+                code = code[:-1]
+            if echo:
+                code = f'print({code})'
+        elif token['token'] in {'func', 'class'}:
+            # A definition is compiled once, even if it's defined again
+            if not code in self.definitions:
+                self.definitions[code] = compile(code,'<string>','exec')
+            return self.definitions[code]
+        return compile(code,'<string>','exec')
+
+    def process(self, token):
+        ''' Run the token. Return if it ran without errors. '''
         try:
-            if token['token'] in {'expr'}:
-                if code[-2] == ';':
-                    code = code[:-2]
-                bytecode = compile(f'print({code})','<string>','exec')
-                exec(bytecode, self.globals, self.globals)
-            else:
-                bytecode = compile(code,'<string>','exec')
-                exec(code, self.globals, self.globals)
+            exec(self.bytecode(token), self.globals, self.globals)
         except Exception as e:
             print(f'RuntimeError: {e}')
-        self.transpiler.source = []
-        self.transpiler.outOfMain = []
+            return False
+        return True
+
+    def timeit(self, token, repeat=5):
+        ''' Run the token in loops long enough to be timed, without its output.
+            Return the number of loops and the time per loop of each repeat. '''
+        bytecode = self.bytecode(token, echo=False)
+        timer = Timer(lambda: exec(bytecode, self.globals, self.globals))
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            loops, _ = timer.autorange()
+            times = timer.repeat(repeat, loops)
+        return loops, [t / loops for t in times]
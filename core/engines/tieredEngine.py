@@ -0,0 +1,270 @@
+''' Tiered execution of Photon programs.
+    The program starts on the astEngine, in this Python process, and the
+    calls of its functions are counted. Once a function gets hot, it's
+    compiled to C in the background, with the functions it calls, into a
+    shared library. When the library is ready, the Python functions are
+    swapped by their native versions, bound with ctypes.
+
+    Only functions of ints and floats that call other such functions can
+    be compiled, as their values cross the ctypes boundary unchanged. The
+    native code keeps the results of Python: ints are C longs there, so
+    the arithmetic is checked, and a call that overflows or divides by zero
+    runs again on Python, which gives its big int result or raises. '''
+
+import os
+import ast
+import ctypes
+import shutil
+import tempfile
+import threading
+import subprocess
+from copy import deepcopy
+from engines.astEngine import Engine as AstEngine
+from transpilers.cTranspiler import Transpiler as CTranspiler
+
+def debug(*args):
+    #print(*args)
+    pass
+
+# Calls of a function before it's compiled to C
+HOT_CALLS = 1000
+# Ints that fit in a C long
+LONG_MIN = -2**63
+LONG_MAX = 2**63 - 1
+
+# Arithmetic with the results of Python, or an error flag when C can't give them
+runtime = '''
+static int photonTierError = 0;
+int photonTierFailed(void) { int error = photonTierError; photonTierError = 0; return error; }
+static inline long photonTierAdd(long a, long b) { long r; if (__builtin_add_overflow(a, b, &r)) photonTierError = 1; return r; }
+static inline long photonTierSub(long a, long b) { long r; if (__builtin_sub_overflow(a, b, &r)) photonTierError = 1; return r; }
+static inline long photonTierMul(long a, long b) { long r; if (__builtin_mul_overflow(a, b, &r)) photonTierError = 1; return r; }
+static inline long photonTierMod(long a, long b) {
+    if (b == 0) { photonTierError = 1; return 0; }
+    if (b == -1) { return 0; }
+    long r = a % b;
+    // The result has the sign of the divisor, like in Python
+    return r != 0 && (r < 0) != (b < 0) ? r + b : r;
+}
+static inline double photonTierDiv(double a, double b) { if (b == 0) { photonTierError = 1; return 0; } return a / b; }
+'''
+
+class NativeTranspiler(CTranspiler):
+    ''' C transpiler of the hot functions, which fails on unknown types
+        and on the operations whose results aren't the ones of Python '''
+    def inferType(self, expr):
+        if self.typeKnown(expr['type']):
+            return expr['type']
+        raise SyntaxError('Type inference of hot functions not implemented yet.')
+
+    def checked(self, name, arg1, arg2):
+        if arg1['type'] == 'int' and arg2['type'] == 'int':
+            return {'value':f'photonTier{name}({arg1["value"]}, {arg2["value"]})', 'type':'int'}
+        return None
+
+    def add(self, arg1, arg2):
+        return self.checked('Add', arg1, arg2) or super().add(arg1, arg2)
+
+    def sub(self, arg1, arg2):
+        return self.checked('Sub', arg1, arg2) or super().sub(arg1, arg2)
+
+    def mul(self, arg1, arg2):
+        return self.checked('Mul', arg1, arg2) or super().mul(arg1, arg2)
+
+    def mod(self, arg1, arg2):
+        result = self.checked('Mod', arg1, arg2)
+        if result is None:
+            raise SyntaxError('Modulo of floats in hot functions not implemented yet.')
+        return result
+
+    def div(self, arg1, arg2):
+        return {'value':f'photonTierDiv({arg1["value"]}, {arg2["value"]})', 'type':'float'}
+
+    def exp(self, arg1, arg2):
+        # Python keeps int powers exact
+        raise SyntaxError('Power in hot functions not implemented yet.')
+
+    def formatIncrement(self, target, expr):
+        if target['type'] == 'int' and expr['type'] == 'int':
+            return f'{target["value"]} = photonTierAdd({target["value"]}, {self.formatExpr(expr)});'
+        elif target['type'] == 'int':
+            raise SyntaxError('Float increment of an int in hot functions not implemented yet.')
+        return super().formatIncrement(target, expr)
+
+class HotCounter():
+    ''' Python version of a function, which counts its calls until it gets hot '''
+    def __init__(self, engine, name, function):
+        self.engine = engine
+        self.name = name
+        self.function = function
+        self.calls = 0
+
+    def __call__(self, *args):
+        self.calls += 1
+        if self.calls == self.engine.hotCalls:
+            self.engine.promote(self.name)
+        return self.function(*args)
+
+class NativeFunction():
+    ''' Native version of a function. Calls with ints that don't fit in a
+        C long, or that fail in C, run on the Python version. '''
+    def __init__(self, native, function, failed):
+        self.native = native
+        self.function = function
+        self.failed = failed
+
+    def __call__(self, *args):
+        if any(type(arg) is int and not LONG_MIN <= arg <= LONG_MAX for arg in args):
+            return self.function(*args)
+        result = self.native(*args)
+        if self.failed():
+            return self.function(*args)
+        return result
+
+class Engine(AstEngine):
+    def __init__(self, filename, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.hotCalls = HOT_CALLS
+        # Photon tokens of the functions, as the transpilers change them
+        self.functions = {}
+        self.counters = {}
+        # Functions running as native code and the reason others can't
+        self.native = {}
+        self.failed = {}
+        self.lock = threading.Lock()
+
+    def process(self, token):
+        if token['token'] == 'func':
+            self.functions[token['name']] = deepcopy(token)
+        return super().process(token)
+
+    def run(self):
+        ''' Run the program, counting the calls of the functions that can be compiled '''
+        # The counters are installed after the functions are defined and before the main code
+        install = ast.Expr(ast.Call(func=ast.Name('__photonTiers__', ast.Load()), args=[], keywords=[]))
+        self.globals['__photonTiers__'] = self.installCounters
+        self.execute(self.module(self.transpiler.outOfMain + [install] + self.transpiler.source))
+
+    def installCounters(self):
+        for name in self.functions:
+            if self.compilable(name) and name in self.globals:
+                self.counters[name] = HotCounter(self, name, self.globals[name])
+                self.globals[name] = self.counters[name]
+
+    def calls(self, token):
+        ''' Return the names of the functions called in the token '''
+        names = set()
+        if isinstance(token, dict):
+            if token.get('token') == 'call':
+                names.add(token['name'].get('name'))
+            for value in token.values():
+                names |= self.calls(value)
+        elif isinstance(token, (list, tuple)):
+            for value in token:
+                names |= self.calls(value)
+        return names
+
+    def tokens(self, token):
+        ''' Return the kinds of tokens in the token '''
+        kinds = set()
+        if isinstance(token, dict):
+            kinds.add(token.get('token'))
+            if token.get('type') == 'str':
+                kinds.add('str')
+            for value in token.values():
+                kinds |= self.tokens(value)
+        elif isinstance(token, (list, tuple)):
+            for value in token:
+                kinds |= self.tokens(value)
+        return kinds
+
+    def compilable(self, name, visiting=None):
+        ''' If the function and the ones it calls only use ints and floats '''
+        visiting = set() if visiting is None else visiting
+        if name in visiting:
+            return True
+        visiting.add(name)
+        info = self.transpiler.currentScope.get(name, {})
+        if not name in self.functions or info.get('token') != 'func' or info.get('kwargs'):
+            return False
+        if not info['type'] in {'int', 'float', 'void'} or any(not arg['type'] in {'int', 'float'} for arg in info['args']):
+            return False
+        # Output, strings and containers need the Photon runtime of the C target
+        if self.tokens(self.functions[name]['block']) & {'printFunc', 'inputFunc', 'import', 'class', 'array', 'map', 'dotAccess', 'str'}:
+            return False
+        return all(self.compilable(called, visiting) for called in self.calls(self.functions[name]['block']))
+
+    def group(self, name, visited=None):
+        ''' Return the function and the ones it calls, callees first '''
+        visited = set() if visited is None else visited
+        visited.add(name)
+        order = []
+        for called in sorted(self.calls(self.functions[name]['block'])):
+            if not called in visited:
+                order += self.group(called, visited)
+        return order + [name]
+
+    def promote(self, name):
+        ''' Compile the hot function to C in the background '''
+        with self.lock:
+            if name in self.native or name in self.failed:
+                return
+            # The library has its callees too, even the native ones, as
+            # the symbols of other libraries aren't visible to it
+            names = [n for n in self.group(name) if not n in self.failed]
+            for n in names:
+                if not n in self.native:
+                    self.failed[n] = 'compiling'
+        if names:
+            tokens = [deepcopy(self.functions[n]) for n in names]
+            threading.Thread(target=self.compileNative, args=(names, tokens), daemon=True).start()
+
+    def nativeSource(self, tokens):
+        transpiler = NativeTranspiler(self.filename, standardLibs=self.transpiler.standardLibs)
+        for token in tokens:
+            transpiler.process(token)
+        includes = sorted(imp for imp in transpiler.imports if '<' in imp)
+        return '\n'.join(includes + [runtime] + transpiler.tables + transpiler.indentLines([''] + transpiler.outOfMain)) + '\n'
+
+    def compileNative(self, names, tokens):
+        folder = tempfile.mkdtemp(prefix='photonTier')
+        try:
+            with open(os.path.join(folder, 'tier.c'), 'w') as f:
+                f.write(self.nativeSource(tokens))
+            library = os.path.join(folder, 'tier.so')
+            subprocess.run(['gcc', '-std=c99', '-O2', '-shared', '-fPIC', os.path.join(folder, 'tier.c'), '-o', library, '-lm'],
+                check=True, capture_output=True)
+            native = ctypes.CDLL(library)
+        except Exception as e:
+            reason = e.stderr.decode(errors='replace') if getattr(e, 'stderr', None) else str(e)
+            with self.lock:
+                for name in names:
+                    if name in self.native:
+                        continue
+                    self.failed[name] = reason
+                    # Stop counting the calls
+                    if name in self.counters:
+                        self.globals[name] = self.counters[name].function
+            debug(f'Native build of {", ".join(names)} failed: {reason}')
+            return
+        finally:
+            shutil.rmtree(folder, ignore_errors=True)
+        ctypeOf = {'int':ctypes.c_long, 'float':ctypes.c_double, 'void':None}
+        failed = native.photonTierFailed
+        failed.restype = ctypes.c_int
+        with self.lock:
+            for name in names:
+                info = self.transpiler.currentScope[name]
+                function = getattr(native, name)
+                function.argtypes = [ctypeOf[arg['type']] for arg in info['args']]
+                function.restype = ctypeOf[info['type']]
+                if name in self.native:
+                    python = self.native[name].function
+                elif name in self.counters:
+                    python = self.counters[name].function
+                else:
+                    python = self.globals[name]
+                self.native[name] = NativeFunction(function, python, failed)
+                self.failed.pop(name, None)
+                self.globals[name] = self.native[name]
+        debug(f'{", ".join(names)} running as native code')
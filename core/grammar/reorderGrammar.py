@@ -0,0 +1,112 @@
+''' Reorder the grammar patterns using the statistics of a corpus.
+    Patterns that reduce often are tried at the front, so the parser scans
+    fewer patterns per reduction. A pattern is only moved if every line of
+    the corpus still parses to the same struct and the total scans of the
+    corpus go down.
+
+    Usage: python reorderGrammar.py [files or folders with .w sources] [--write]
+    With --write, generatedGrammar.py is rewritten in the new order, unless
+    it doesn't scan less than the current one. '''
+
+import os
+import sys
+from glob import glob
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import photonParser
+from photonParser import parse, assembly
+
+def corpusLines(paths):
+    ''' Return the non empty lines of the .w files in paths '''
+    lines = []
+    for path in paths:
+        if os.path.isdir(path):
+            files = sorted(glob(os.path.join(path, '**', '*.w'), recursive=True))
+        else:
+            files = [path]
+        for filename in files:
+            with open(filename, encoding='utf8') as f:
+                lines += [line for line in f if line.strip()]
+    return lines
+
+def parseCorpus(lines, order):
+    ''' Parse each line with the patterns in the given order.
+        Return the parsed structs (or errors) as strings. '''
+    photonParser.patterns = {pattern:rules[pattern] for pattern in order}
+    results = []
+    for line in lines:
+        try:
+            results.append(repr(assembly(parse(line))))
+        except Exception as e:
+            results.append(f'{type(e).__name__}: {e}')
+    return results
+
+def corpusStats(lines, order):
+    ''' Return the parsed structs and the pattern stats of the corpus '''
+    photonParser.collectRuleStats()
+    results = parseCorpus(lines, order)
+    stats = photonParser.ruleStats
+    photonParser.collectRuleStats(False)
+    return results, stats
+
+def reorder(lines):
+    ''' Return the new pattern order and the stats before and after '''
+    original = list(rules)
+    expected, before = corpusStats(lines, original)
+    order = list(original)
+    scans = totalScans(before)
+    placed = 0
+    candidates = sorted((p for p in original if before.get(p, {}).get('successes')),
+        key=lambda p: -before[p]['successes'])
+    for pattern in candidates:
+        index = order.index(pattern)
+        if index < placed:
+            continue
+        candidate = order[:placed] + [pattern] + order[placed:index] + order[index+1:]
+        # Only keep the move if it doesn't change any parse of the corpus
+        # and the patterns it passes cost less scans than it saves
+        results, stats = corpusStats(lines, candidate)
+        if results == expected and totalScans(stats) < scans:
+            order = candidate
+            scans = totalScans(stats)
+            placed += 1
+    after = corpusStats(lines, order)[1]
+    photonParser.patterns = rules
+    return order, before, after
+
+def totalScans(stats):
+    return sum(s['scans'] for s in stats.values())
+
+def writeGrammar(order, filename, before, after):
+    ''' Write the grammar in the new order if it scans less than the
+        current one. Return if it was written. '''
+    if totalScans(after) >= totalScans(before):
+        return False
+    with open(filename, 'w') as g:
+        g.write('patterns = {\n')
+        for pattern in order:
+            g.write(f'  {pattern}: {rules[pattern].__name__},\n')
+        g.write('}')
+    return True
+
+rules = photonParser.patterns
+
+if __name__ == '__main__':
+    paths = [arg for arg in sys.argv[1:] if arg != '--write']
+    if not paths:
+        print('Please, provide the corpus files or folders')
+        sys.exit()
+    lines = corpusLines(paths)
+    order, before, after = reorder(lines)
+    # Stats are from the original order, listed in the new order
+    print(f'{"pattern":<60}{"scans":>8}{"matches":>9}{"continues":>11}{"successes":>11}{"time (ms)":>11}')
+    for pattern in order:
+        s = before.get(pattern, {'scans':0, 'matches':0, 'continues':0, 'successes':0, 'time':0.0})
+        print(f'{" ".join(pattern):<60}{s["scans"]:>8}{s["matches"]:>9}{s["continues"]:>11}{s["successes"]:>11}{s["time"] * 1000:>11.3f}')
+    print(f'Pattern scans on {len(lines)} lines: {totalScans(before)} before, {totalScans(after)} after')
+    if '--write' in sys.argv:
+        filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generatedGrammar.py')
+        if not writeGrammar(order, filename, before, after):
+            print('generatedGrammar.py not written, the new order doesn\'t scan less')
+            sys.exit(1)
+        print('generatedGrammar.py written')
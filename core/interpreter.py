@@ -11,7 +11,7 @@ from photonParser import debug as debugFunc
 import sys
 
 class Interpreter():
-    def __init__(self, filename='', lang='c', target=sys.platform, module=False, standardLibs='', debug=False, transpileOnly=False):
+    def __init__(self, filename='', lang='c', target=sys.platform, module=False, standardLibs='', debug=False, transpileOnly=False, buildOptions=None):
         self.debug = debug
         if lang == 'c':
             from transpilers.cTranspiler import Transpiler
@@ -30,15 +30,15 @@ class Interpreter():
             sys.exit()
         self.filename = filename
         if filename:
-            self.engine = Transpiler(filename=filename,target=target, module=module, standardLibs=standardLibs)
+            if lang in {'py', 'python'} and not transpileOnly and not module:
+                # Python programs run in this process, without writing their source
+                if buildOptions and buildOptions.get('tiered'):
+                    from engines.tieredEngine import Engine as Transpiler
+                else:
+                    from engines.astEngine import Engine as Transpiler
+            self.engine = Transpiler(filename=filename,target=target, module=module, standardLibs=standardLibs, buildOptions=buildOptions)
             self.input = self.file
-            try:
-                # Read utf8 but write as the default on the OS
-                with open(filename,'r',encoding='utf8') as f:
-                    self.source = [line for line in f]
-            except UnicodeDecodeError:
-                with open(filename,'r') as f:
-                    self.source = [line for line in f]
+            self.source = self.read(filename)
         else:
             try:
                 import readline
@@ -49,16 +49,31 @@ class Interpreter():
                 except ModuleNotFoundError:
                     # Run without history and arrow key functionality
                     pass
-            from engines.pyEngine import Engine
+            from engines.astEngine import Engine
             self.engine = Engine(filename=filename,target=target, module=module, standardLibs=standardLibs)
             self.input = self.console
         self.end = False
         self.processing = True
         self.transpileOnly = transpileOnly
         self.lineNumber = 0
+        # Lines of the statement being read and of the statements run in the REPL
+        self.lines = []
+        self.history = []
+
+    def read(self, filename):
+        ''' Return the lines of the source file '''
+        try:
+            # Read utf8 but write as the default on the OS
+            with open(filename,'r',encoding='utf8') as f:
+                return [line for line in f]
+        except UnicodeDecodeError:
+            with open(filename,'r') as f:
+                return [line for line in f]
 
     def console(self, glyph='>>> '):
-        return input(glyph)
+        line = input(glyph)
+        self.lines.append(line)
+        return line
 
     def file(self, *args):
         try:
@@ -152,20 +167,50 @@ class Interpreter():
             struct = assembly(tokenized)
             return struct, False
 
+    def timeit(self, line):
+        ''' Time a statement or block of the REPL: %timeit [-c] statement
+            With -c the snippet is also built and timed on the C target.
+            Return if the line after the block was already read. '''
+        from bench import timeSnippet, timeitReport
+        snippet = line[len('%timeit'):].strip()
+        withC = snippet.startswith('-c ')
+        if withC:
+            snippet = snippet[3:].strip()
+        self.line = snippet
+        self.lines = [snippet]
+        tokenized = parse(self.line, filename=self.filename, no=self.lineNumber, debug=self.debug)
+        struct, nextLine = self.handleTokenized(tokenized)
+        block = self.lines[:-1] if nextLine else self.lines
+        try:
+            print(timeitReport('py', *self.engine.timeit(struct)))
+            if withC:
+                print(timeitReport('c', *timeSnippet(self.history, block)))
+        except Exception as e:
+            print(f'RuntimeError: {e}')
+        return nextLine
+
     def run(self):
         nextLine = False
         while True:
             if not nextLine or self.line == '':
+                self.lines = []
                 self.line = self.input('>>> ')
+            else:
+                # The line after the block starts the next statement
+                self.lines = self.lines[-1:]
             self.processing = True
             if self.line == 'exit':
                 break
+            if self.line.startswith('%timeit'):
+                nextLine = self.timeit(self.line)
+                continue
             try:
                 tokenized = parse(self.line, filename=self.filename, no=self.lineNumber, debug=self.debug)
                 struct, nextLine = self.handleTokenized(tokenized)
             except Exception as e:
                 showError(e)
-            self.engine.process(struct)
+            if self.engine.process(struct):
+                self.history += self.lines[:-1] if nextLine else self.lines
             self.processing = False
 
 if __name__ == "__main__":
@@ -249,7 +249,7 @@ def convertToExpr(token):
         else:
             varType = 'float'
         return {'token':'expr', 'type':varType, 'args':[token], 'ops':[]}
-    elif token['token'] in {'var','group','inputFunc','call', 'array', 'dotAccess'}:
+    elif token['token'] in {'var','group','inputFunc','call', 'array', 'map', 'dotAccess'}:
         return {'token':'expr', 'type':token['type'], 'args':[token], 'ops':[]}
     else:
         raise SyntaxError(f'Cant convert token {token} to expr')
@@ -594,6 +594,8 @@ def array(i, t):
 
 def hashmap(i, t):
     ''' Verify if its a valid hashmap and return a map token if it is '''
+    # Only the empty map literal is supported by the grammar for now
+    elements = []
     t[i] = convertToExpr({'token':'map','type':'map','valType':'unknown','keyType':'unknown',
         'elements':elements})
     del t[i+1] # rbrace
@@ -5,7 +5,7 @@
 #ifndef _vscprintf
     /* For some reason, MSVC fails to honour this #ifndef. */
     /* Hence function renamed to _vscprintf_so(). */
-    int _vscprintf_so(const char* format, va_list pargs) {
+    static int _vscprintf_so(const char* format, va_list pargs) {
         int retval;
         va_list argcopy;
         va_copy(argcopy, pargs);
@@ -16,7 +16,7 @@
 #endif // _vscprintf
 
 #ifndef vasprintf
-    int vasprintf(char** strp, const char* fmt, va_list ap) {
+    static int vasprintf(char** strp, const char* fmt, va_list ap) {
         int len = _vscprintf_so(fmt, ap);
         if (len == -1) return -1;
         char* str = malloc((size_t) len + 1);
@@ -29,7 +29,7 @@
 #endif // vasprintf
 
 #ifndef asprintf
-    int asprintf(char* strp[], const char* fmt, ...) {
+    static int asprintf(char* strp[], const char* fmt, ...) {
         va_list ap;
         va_start(ap, fmt);
         int r = vasprintf(strp, fmt, ap);
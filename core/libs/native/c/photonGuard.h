@@ -0,0 +1,17 @@
+#ifndef PHOTON_GUARD_H
+#define PHOTON_GUARD_H
+
+#include <stdio.h>
+#include <stdlib.h>
+
+// Arg that was only an int in the type profile, called with a float
+static inline long photonGuardInt(double value, const char* site) {
+    long result = (long) value;
+    if (result != value) {
+        fprintf(stderr, "Type guard failed: %s was an int in the type profile and got %g. Record the types again with this input.\n", site, value);
+        exit(1);
+    }
+    return result;
+}
+
+#endif
@@ -0,0 +1,170 @@
+#include "photonInput.h"
+#include <string.h>
+#include <locale.h>
+
+#define PHOTON_INPUT_BLOCK 65536
+
+char *photonInput()
+{
+    // Read a whole line, growing the buffer geometrically
+    size_t size = 128;
+    size_t read_size = 0;
+    char *line = malloc(size);
+    if (!line)
+    {
+        perror("malloc");
+        return line;
+    }
+    line[0] = '\0';
+    while (fgets(line + read_size, size - read_size, stdin))
+    {
+        read_size += strlen(line + read_size);
+        if (read_size > 0 && line[read_size - 1] == '\n')
+        {
+            line[--read_size] = '\0';
+            break;
+        }
+        if (read_size + 1 < size)
+        {
+            // End of file without a new line
+            break;
+        }
+        size *= 2;
+        char *test = realloc(line, size);
+        if (!test)
+        {
+            perror("realloc");
+            return line;
+        }
+        line = test;
+    }
+    return line;
+}
+
+char *photonReadAll(size_t *length)
+{
+    // Read the remaining stdin in large blocks
+    size_t size = PHOTON_INPUT_BLOCK;
+    size_t read_size = 0;
+    size_t n;
+    char *data = malloc(size + 1);
+    if (!data)
+    {
+        perror("malloc");
+        exit(1);
+    }
+    while ((n = fread(data + read_size, 1, size - read_size, stdin)) > 0)
+    {
+        read_size += n;
+        if (read_size == size)
+        {
+            size *= 2;
+            char *test = realloc(data, size + 1);
+            if (!test)
+            {
+                perror("realloc");
+                exit(1);
+            }
+            data = test;
+        }
+    }
+    data[read_size] = '\0';
+    *length = read_size;
+    return data;
+}
+
+static int photonIsSpace(char c)
+{
+    return c == ' ' || c == '\n' || c == '\t' || c == '\r' || c == '\v' || c == '\f';
+}
+
+long *photonReadInts(long *count)
+{
+    // Parse every whitespace separated int left in stdin
+    size_t length;
+    char *data = photonReadAll(&length);
+    long size = 1024;
+    long len = 0;
+    long *values = malloc(sizeof(long) * size);
+    char *c = data;
+    char *end = data + length;
+    while (c < end)
+    {
+        while (c < end && photonIsSpace(*c)) c++;
+        if (c == end) break;
+        int negative = 0;
+        if (*c == '-' || *c == '+')
+        {
+            negative = *c == '-';
+            c++;
+        }
+        if (c == end || *c < '0' || *c > '9')
+        {
+            printf("ValueError: invalid int in input\n");
+            exit(1);
+        }
+        unsigned long value = 0;
+        while (c < end && *c >= '0' && *c <= '9')
+        {
+            value = value * 10 + (*c - '0');
+            c++;
+        }
+        if (c < end && !photonIsSpace(*c))
+        {
+            printf("ValueError: invalid int in input\n");
+            exit(1);
+        }
+        if (len == size)
+        {
+            size *= 2;
+            values = realloc(values, sizeof(long) * size);
+        }
+        values[len++] = negative ? -(long)value : (long)value;
+    }
+    free(data);
+    *count = len;
+    return values;
+}
+
+double *photonReadFloats(long *count)
+{
+    // Parse every whitespace separated float left in stdin
+    size_t length;
+    char *data = photonReadAll(&length);
+    char decimalPoint = localeconv()->decimal_point[0];
+    long size = 1024;
+    long len = 0;
+    double *values = malloc(sizeof(double) * size);
+    char *c = data;
+    char *end = data + length;
+    while (c < end)
+    {
+        while (c < end && photonIsSpace(*c)) c++;
+        if (c == end) break;
+        char *start = c;
+        while (c < end && !photonIsSpace(*c))
+        {
+            // Input always uses '.', strtod follows the current locale
+            if (*c == '.') *c = decimalPoint;
+            c++;
+        }
+        *c = '\0';
+        char *parsed;
+        double value = strtod(start, &parsed);
+        if (parsed != c)
+        {
+            printf("ValueError: invalid float in input\n");
+            exit(1);
+        }
+        if (len == size)
+        {
+            size *= 2;
+            values = realloc(values, sizeof(double) * size);
+        }
+        values[len++] = value;
+        c++;
+    }
+    free(data);
+    *count = len;
+    return values;
+}
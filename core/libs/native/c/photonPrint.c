@@ -0,0 +1,22 @@
+#include "photonPrint.h"
+#ifdef _WIN32
+#include <io.h>
+#define STDOUT_FILENO _fileno(stdout)
+#define isatty _isatty
+#else
+#include <unistd.h>
+#endif
+
+#define PHOTON_PRINT_BUFFER 65536
+
+static char __photonPrintBuffer__[PHOTON_PRINT_BUFFER];
+
+void photonPrintInit()
+{
+    // Terminals keep line buffering, files and pipes get a large buffer.
+    // stdout is flushed at exit and before reading input.
+    if (!isatty(STDOUT_FILENO))
+    {
+        setvbuf(stdout, __photonPrintBuffer__, _IOFBF, PHOTON_PRINT_BUFFER);
+    }
+}
@@ -0,0 +1,90 @@
+#ifndef PHOTON_PRINT_H
+#define PHOTON_PRINT_H
+
+#include <stdio.h>
+#include <string.h>
+
+// Implemented in photonPrint.c, part of libphoton.a
+void photonPrintInit();
+
+static inline void photonWriteInt(long value)
+{
+    char buffer[24];
+    int i = sizeof(buffer);
+    unsigned long digits = value < 0 ? -(unsigned long)value : (unsigned long)value;
+    do
+    {
+        buffer[--i] = '0' + digits % 10;
+        digits /= 10;
+    } while (digits);
+    if (value < 0)
+    {
+        buffer[--i] = '-';
+    }
+    fwrite(buffer + i, 1, sizeof(buffer) - i, stdout);
+}
+
+static inline void photonWriteFloat(double value)
+{
+    // Same digits as printf("%f"), from the exact binary value of the double.
+    // inf, nan, values from 2^53 up and nonzero values under 2^-8 use printf.
+    unsigned long long bits;
+    memcpy(&bits, &value, sizeof(bits));
+    int biased = (bits >> 52) & 0x7ff;
+    unsigned long long mantissa = (bits & 0xfffffffffffffULL) | (biased ? 1ULL << 52 : 0);
+    int shift = 1075 - biased;
+    if (mantissa && (shift < 0 || shift > 60))
+    {
+        printf("%f", value);
+        return;
+    }
+    if (!mantissa)
+    {
+        shift = 0;
+    }
+    unsigned long long mask = (1ULL << shift) - 1;
+    unsigned long long integer = mantissa >> shift;
+    unsigned long long rest = mantissa & mask;
+    long fraction = 0;
+    for (int i = 0; i < 6; i++)
+    {
+        rest *= 10;
+        fraction = fraction * 10 + (long)(rest >> shift);
+        rest &= mask;
+    }
+    // Round half to even, like printf
+    unsigned long long half = shift ? 1ULL << (shift - 1) : 0;
+    if (shift && (rest > half || (rest == half && fraction & 1)))
+    {
+        fraction += 1;
+        if (fraction == 1000000)
+        {
+            fraction = 0;
+            integer += 1;
+        }
+    }
+    if (bits >> 63)
+    {
+        putchar('-');
+    }
+    photonWriteInt((long)integer);
+    char buffer[7] = {'.'};
+    for (int i = 6; i > 0; i--)
+    {
+        buffer[i] = '0' + fraction % 10;
+        fraction /= 10;
+    }
+    fwrite(buffer, 1, sizeof(buffer), stdout);
+}
+
+static inline void photonWriteStr(const char *value)
+{
+    fputs(value, stdout);
+}
+
+static inline void photonWriteBool(int value)
+{
+    fputs(value ? "True" : "False", stdout);
+}
+
+#endif
@@ -0,0 +1,110 @@
+#define _POSIX_C_SOURCE 199309L
+#include "photonProfile.h"
+#include <stdio.h>
+#include <stdlib.h>
+#include <time.h>
+
+typedef struct {
+    photonProbe* site;
+    double start;
+    double children;
+} photonFrame;
+
+static photonProbe* sites = NULL;
+static photonFrame* frames = NULL;
+static long depth = 0;
+static long capacity = 0;
+
+static double photonNow()
+{
+#ifdef CLOCK_MONOTONIC
+    struct timespec now;
+    clock_gettime(CLOCK_MONOTONIC, &now);
+    return now.tv_sec + now.tv_nsec * 1e-9;
+#else
+    return (double)clock() / CLOCKS_PER_SEC;
+#endif
+}
+
+static void photonWriteString(FILE* f, const char* value)
+{
+    fputc('"', f);
+    for (; *value; value++)
+    {
+        if (*value == '"' || *value == '\\')
+        {
+            fputc('\\', f);
+        }
+        fputc(*value, f);
+    }
+    fputc('"', f);
+}
+
+static void photonProfileWrite()
+{
+    // Save the probes as JSON, read by photon --report
+    FILE* f = fopen("photon.profile.json", "w");
+    if (!f)
+    {
+        perror("photon.profile.json");
+        return;
+    }
+    fprintf(f, "{\"probes\": [");
+    for (photonProbe* site = sites; site; site = site->next)
+    {
+        fprintf(f, "\n    {\"name\": ");
+        photonWriteString(f, site->name);
+        fprintf(f, ", \"kind\": ");
+        photonWriteString(f, site->kind);
+        fprintf(f, ", \"file\": ");
+        photonWriteString(f, site->file);
+        fprintf(f, ", \"line\": %ld, \"calls\": %ld, \"inclusive\": %.9f, \"exclusive\": %.9f}%s",
+            site->line, site->calls, site->inclusive, site->exclusive, site->next ? "," : "");
+    }
+    fprintf(f, "\n]}\n");
+    fclose(f);
+}
+
+photonProbe* photonProfileEnter(photonProbe* site)
+{
+    if (!site->registered)
+    {
+        if (!sites)
+        {
+            atexit(photonProfileWrite);
+        }
+        site->registered = 1;
+        site->next = sites;
+        sites = site;
+    }
+    if (depth == capacity)
+    {
+        capacity = capacity ? capacity * 2 : 64;
+        frames = realloc(frames, sizeof(photonFrame) * capacity);
+    }
+    site->calls++;
+    site->active++;
+    frames[depth].site = site;
+    frames[depth].children = 0;
+    frames[depth].start = photonNow();
+    depth++;
+    return site;
+}
+
+void photonProfileExit(photonProbe** probe)
+{
+    double now = photonNow();
+    photonFrame* frame = &frames[--depth];
+    double elapsed = now - frame->start;
+    photonProbe* site = frame->site;
+    site->exclusive += elapsed - frame->children;
+    if (--site->active == 0)
+    {
+        // Recursive calls are only counted once in the inclusive time
+        site->inclusive += elapsed;
+    }
+    if (depth > 0)
+    {
+        frames[depth - 1].children += elapsed;
+    }
+}
@@ -0,0 +1,22 @@
+#ifndef PHOTON_PROFILE_H
+#define PHOTON_PROFILE_H
+
+// Probe of a Photon function or loop, one static instance per site
+typedef struct photonProbe {
+    const char* name;
+    const char* kind;
+    const char* file;
+    long line;
+    long calls;
+    long active;
+    double inclusive;
+    double exclusive;
+    int registered;
+    struct photonProbe* next;
+} photonProbe;
+
+// Implemented in photonProfile.c, part of libphoton.a
+photonProbe* photonProfileEnter(photonProbe* site);
+void photonProfileExit(photonProbe** site);
+
+#endif
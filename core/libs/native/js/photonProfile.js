@@ -0,0 +1,36 @@
+const __photonProfile__ = {
+    // Probes of Photon functions and loops
+    sites: new Map(),
+    stack: [],
+    enter(name, kind, file, line) {
+        const key = `${file}:${line}:${name}`;
+        let site = this.sites.get(key);
+        if (!site) {
+            if (this.sites.size == 0) {
+                process.on('exit', () => this.write());
+            }
+            site = {name, kind, file, line, calls: 0, active: 0, inclusive: 0, exclusive: 0};
+            this.sites.set(key, site);
+        }
+        site.calls++;
+        site.active++;
+        this.stack.push({site, start: performance.now(), children: 0});
+        return site;
+    },
+    exit() {
+        const frame = this.stack.pop();
+        const elapsed = (performance.now() - frame.start) / 1000;
+        frame.site.exclusive += elapsed - frame.children;
+        if (--frame.site.active == 0) {
+            // Recursive calls are only counted once in the inclusive time
+            frame.site.inclusive += elapsed;
+        }
+        if (this.stack.length) {
+            this.stack[this.stack.length - 1].children += elapsed;
+        }
+    },
+    write() {
+        const probes = [...this.sites.values()].map(({active, ...site}) => site);
+        require('fs').writeFileSync('photon.profile.json', JSON.stringify({probes}, null, 4));
+    },
+};
@@ -0,0 +1,39 @@
+import time as __photonTime__
+
+class __photonProbe__():
+    ''' Probe of a Photon function or loop, used as a context manager '''
+    sites = {}
+    stack = []
+
+    def __init__(self, name, kind, file, line):
+        key = (file, line, name)
+        if not key in self.sites:
+            if not self.sites:
+                import atexit
+                atexit.register(__photonProbe__.write)
+            self.sites[key] = {'name':name, 'kind':kind, 'file':file, 'line':line,
+                'calls':0, 'active':0, 'inclusive':0.0, 'exclusive':0.0}
+        self.site = self.sites[key]
+
+    def __enter__(self):
+        self.site['calls'] += 1
+        self.site['active'] += 1
+        self.stack.append([self.site, __photonTime__.perf_counter(), 0.0])
+
+    def __exit__(self, *args):
+        site, start, children = self.stack.pop()
+        elapsed = __photonTime__.perf_counter() - start
+        site['exclusive'] += elapsed - children
+        site['active'] -= 1
+        if site['active'] == 0:
+            # Recursive calls are only counted once in the inclusive time
+            site['inclusive'] += elapsed
+        if self.stack:
+            self.stack[-1][2] += elapsed
+
+    @staticmethod
+    def write():
+        import json
+        probes = [{k:v for k, v in site.items() if k != 'active'} for site in __photonProbe__.sites.values()]
+        with open('photon.profile.json', 'w') as f:
+            json.dump({'probes':probes}, f, indent=4)
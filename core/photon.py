@@ -25,6 +25,16 @@ def photonConfigLang(defineLang = None):
             json.dump(defaultConfig, conf)
     return defaultConfig['lang']
 
+def popOption(option):
+    ''' Remove option and its value from the arguments. Return the value. '''
+    index = sys.argv.index(option)
+    if index + 1 >= len(sys.argv):
+        print(f'ERROR: missing value for {option}')
+        sys.exit(1)
+    value = sys.argv[index + 1]
+    del sys.argv[index:index + 2]
+    return value
+
 if __name__ == "__main__":
     langs = ['c', 'd', 'js', 'dart', 'haxe', 'py']
     platforms = ['web', 'linux', 'flutter-android']
@@ -43,16 +53,59 @@ if __name__ == "__main__":
             DEBUG = True
         else:
             DEBUG = False
+        buildOptions = {'mode':'default', 'native':False, 'train':None, 'instrument':False, 'tiered':False, 'recordTypes':False, 'types':None}
+        for option in ['--native', '--instrument', '--tiered']:
+            if option in sys.argv:
+                sys.argv.remove(option)
+                buildOptions[option[2:]] = True
+        if '--record-types' in sys.argv:
+            sys.argv.remove('--record-types')
+            buildOptions['recordTypes'] = True
+        for option in ['--mode', '--train', '--types']:
+            if option in sys.argv:
+                buildOptions[option[2:]] = popOption(option)
+        if '--profile' in sys.argv or '--trace' in sys.argv:
+            import profiler
+            trace = None
+            if '--trace' in sys.argv:
+                trace = popOption('--trace')
+            if '--profile' in sys.argv:
+                sys.argv.remove('--profile')
+            profiler.enable(trace=trace)
         first = sys.argv[1]
     except IndexError:
-        print(f'Photon - {__version__} - pyEngine')
+        print(f'Photon - {__version__} - astEngine')
         Interpreter(debug=DEBUG).run()
         sys.exit()
     if first == '--version' or first == '-v' :
         print(f'Photon Version {__version__}')
+    elif first == '--report':
+        from profileReport import report
+        filename = sys.argv[2] if len(sys.argv) > 2 else 'photon.profile.json'
+        try:
+            print(report(filename))
+        except FileNotFoundError:
+            print(f'ERROR: Profile {filename} not found. Run the program with --instrument first.')
+    elif first == '--bench':
+        import bench
+        options = {'--lang':'c,py,js', '-n':'10', '--input':None}
+        for option in options:
+            if option in sys.argv:
+                options[option] = popOption(option)
+        asJson = '--json' in sys.argv
+        if asJson:
+            sys.argv.remove('--json')
+        if len(sys.argv) < 3:
+            print('ERROR: Program to benchmark not informed.')
+            print('>> photon --bench [file.w] --lang c,py,js -n 10')
+            sys.exit(1)
+        filename = sys.argv[2]
+        results = bench.bench(filename, options['--lang'].lower().split(','), os.path.join(PHOTON_INSTALL_PATH, 'libs/'),
+            repeat=int(options['-n']), buildOptions=buildOptions, inputFile=options['--input'])
+        print(bench.toJson(filename, results) if asJson else bench.report(filename, results))
     elif first == '--build' or first == '-b':
         try:
-            Builder(platform = sys.argv[2], standardLibs = os.path.join(PHOTON_INSTALL_PATH, 'libs/'), debug=DEBUG)
+            Builder(platform = sys.argv[2], standardLibs = os.path.join(PHOTON_INSTALL_PATH, 'libs/'), debug=DEBUG, buildOptions=buildOptions)
         except IndexError:
             print(f'ERROR: Platform [{(", ".join(platforms))}] not informed.')
     elif first == '--lang' or first == '-l':
@@ -77,6 +130,34 @@ if __name__ == "__main__":
         print('Available commands:\r\n')
         print('# Runs the script using the default lang')
         print('>> photon [file.w]\r\n')
+        print('# Starts the REPL. In it, %timeit times a statement or block')
+        print('# and -c also times it compiled to C')
+        print('>> photon')
+        print('>>> %timeit [-c] statement\r\n')
+        print('# Selects the build mode of the C target (default -O2)')
+        print('>> photon [file.w] --mode [dev, release, pgo]')
+        print('# Optimizes for the current CPU in release and pgo modes')
+        print('>> photon [file.w] --mode release --native')
+        print('# Trains the pgo build with the given input file')
+        print('>> photon [file.w] --mode pgo --train [input.txt]\r\n')
+        print('# Prints the time spent in each stage of Photon')
+        print('>> photon [file.w] --profile')
+        print('# Also saves the stages in the Chrome trace format')
+        print('>> photon [file.w] --profile --trace [trace.json]\r\n')
+        print('# Runs the program with timers in its functions and loops')
+        print('>> photon [file.w] --instrument')
+        print('# Runs on the py target and moves hot functions to C while running')
+        print('>> photon [file.w] -l py --tiered')
+        print('# Runs on the py target and saves the types seen in photon.types.json')
+        print('>> photon [file.w] --record-types')
+        print('# Gives the types of the profile to the variables of unknown type on C')
+        print('>> photon [file.w] -l c --types [photon.types.json]')
+        print('# Shows the profile saved by the instrumented program')
+        print('>> photon --report [photon.profile.json]\r\n')
+        print('# Times N runs of the program on each target, without the build')
+        print('>> photon --bench [file.w] --lang c,py,js -n 10')
+        print('# Reads the input of the runs from a file and prints JSON')
+        print('>> photon --bench [file.w] --input [input.txt] --json\r\n')
         print('# Builds and runs the project for the target platform')
         print(f'>> photon --build [{(", ".join(platforms))}]')
         print(f'>> photon -b [{(", ".join(platforms))}]\r\n')
@@ -114,4 +195,7 @@ if __name__ == "__main__":
             (otherParams[0] == '-l' or otherParams[0] == '--lang') and \
             (otherParams[1].lower() in langs):
             lang = otherParams[1].lower()
-        Interpreter(filename = first, lang = lang, standardLibs = os.path.join(PHOTON_INSTALL_PATH, 'libs/'), debug = DEBUG).run()
+        if buildOptions['recordTypes']:
+            # The types are recorded on the py target
+            lang = 'py'
+        Interpreter(filename = first, lang = lang, standardLibs = os.path.join(PHOTON_INSTALL_PATH, 'libs/'), debug = DEBUG, buildOptions = buildOptions).run()
@@ -4,6 +4,7 @@
 # This struct is used by the Engine to execute the code.
 
 import re
+import time
 from lexer import *
 
 statements = ['if','else','elif','def','cdef','for','in','as','return','import','class','while','break','continue','try']
@@ -40,6 +41,9 @@ parsePhrase = ''
 
 DEBUG = False
 
+# Pattern -> counters of the reductions tried with it. None when not collecting.
+ruleStats = None
+
 def debug(*args, center=False):
     if DEBUG:
         if center:
@@ -64,7 +68,7 @@ def parse(line, filename='', no=-1, debug=False):
     for i in tokens:
         if not indentationSet and not (i == ' ' or i == '\t'):
             indentationSet = True
-            tokenized.append({'token':'indent','indent':indentation})
+            tokenized.append({'token':'indent','indent':indentation,'line':no})
         if (i == ' ' or i == '\t') and not indentationSet:
             indentation += 1
         elif i in statements:
@@ -90,7 +94,7 @@ def parse(line, filename='', no=-1, debug=False):
             tokenized.append(inference(i))
 
     if tokenized == []:
-        tokenized = [{'token':'indent','indent':0}]
+        tokenized = [{'token':'indent','indent':0,'line':no}]
     return tokenized
 
 def token2word(tokens):
@@ -114,16 +118,99 @@ def token2word(tokens):
         phrase += ' '
     return phrase[:-1]
 
+def collectRuleStats(enable=True):
+    ''' Start (or stop) counting scans, matches, rejections and time of each pattern '''
+    global ruleStats
+    ruleStats = {} if enable else None
+
+def ruleFunctionStats():
+    ''' Return the pattern stats added up by the lexer rule function '''
+    functions = {}
+    for pattern, stats in (ruleStats or {}).items():
+        total = functions.setdefault(patterns[pattern].__name__, dict.fromkeys(stats, 0))
+        for key, value in stats.items():
+            total[key] += value
+    return functions
+
+def reduceWithStats(tokens, tokenList):
+    ''' Same as reduce inside reduceToken, but counting each attempt '''
+    for pattern in patterns:
+        stats = ruleStats.setdefault(pattern, {'scans':0, 'matches':0, 'continues':0, 'successes':0, 'time':0.0})
+        for i in range(len(tokenList)):
+            stats['scans'] += 1
+            if pattern == tuple(tokenList[i:i+len(pattern)]):
+                stats['matches'] += 1
+                start = time.perf_counter()
+                reduced = patterns[pattern](i+1,tokens)
+                stats['time'] += time.perf_counter() - start
+                if reduced == 'continue':
+                    stats['continues'] += 1
+                    continue
+                stats['successes'] += 1
+                return reduced
+
+def numberLiteral(tokens, i):
+    ''' Return the expr token of the number at i, maybe negative, and the
+        index after it. The token is None if there's no number at i. '''
+    modifier = None
+    if tokens[i]['token'] == 'operator' and tokens[i]['operator'] == '-':
+        modifier = '-'
+        i += 1
+    if i + 1 >= len(tokens) or tokens[i]['token'] != 'num':
+        return None, i
+    if tokens[i+1]['token'] == 'dot':
+        if i + 2 >= len(tokens) or tokens[i+2]['token'] != 'num':
+            return None, i
+        literal = {'token':'floatNumber', 'type':'float', 'value':f"{tokens[i]['value']}.{tokens[i+2]['value']}"}
+        i += 3
+    else:
+        literal = dict(tokens[i])
+        i += 1
+    if modifier:
+        literal['modifier'] = modifier
+    return convertToExpr(literal), i
+
+def reduceLiterals(tokens):
+    ''' Reduce the array literals of numbers to array exprs in one pass.
+        The patterns reduce one element at a time and scan the whole line
+        at each step, which is quadratic on large tables. '''
+    reduced = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        # After a var or a bracket it's an index access
+        if token['token'] == 'lbracket' and reduced and not reduced[-1]['token'] in {'var', 'rparen', 'rbracket'}:
+            elements = []
+            j = i + 1
+            while True:
+                element, j = numberLiteral(tokens, j)
+                if element is None or not tokens[j]['token'] in {'comma', 'rbracket'}:
+                    break
+                elements.append(element)
+                j += 1
+                if tokens[j-1]['token'] == 'rbracket':
+                    break
+            if len(elements) > 1 and tokens[j-1]['token'] == 'rbracket' and element:
+                reduced.append(convertToExpr({'token':'array', 'type':'array', 'elementType':'unknown',
+                    'len':len(elements), 'size':'unknown', 'elements':elements}))
+                i = j
+                continue
+        reduced.append(token)
+        i += 1
+    return reduced
+
 def reduceToken(tokens):
     ''' Find patterns that can be reduced to a single token '''
     ''' and return the reduced list of tokens '''
     global parsePhrase
     def reduce():
+        if not ruleStats is None:
+            return reduceWithStats(tokens, tokenList)
         for pattern in patterns:
             for i in range(len(tokenList)):
                 if pattern == tuple(tokenList[i:i+len(pattern)]):
                     debug(pattern)
-                    result = reduceToken(patterns[pattern](i+1,tokens))
+                    result = patterns[pattern](i+1,tokens)
                     if result == 'continue':
                         continue
                     else:
@@ -131,10 +218,16 @@ def reduceToken(tokens):
 
     if tokens == 'continue':
         return 'continue'
-    tokenList = [ token['token'] for token in tokens if not token['token'] == 'indent' ]
-    parsePhrase = token2word(tokens)
-    debug(parsePhrase)
-    reduce()
+    tokens = reduceLiterals(tokens)
+    # Reduce one pattern at a time until none matches. It's a loop instead of
+    # a recursion, so long lines don't exceed the recursion limit.
+    reduced = tokens
+    while not reduced is None:
+        tokens = reduced
+        tokenList = [ token['token'] for token in tokens if not token['token'] == 'indent' ]
+        parsePhrase = token2word(tokens)
+        debug(parsePhrase)
+        reduced = reduce()
 
     # No patterns were found, reduced to maximum
     if len(tokens) > 2: #indent reducedToken (beginBlock)
@@ -173,6 +266,8 @@ def assembly(tokens, block=None, modifier=None):
         if len(reduced) > 1:
             struct = reduced[1]
             struct['opcode'] = struct['token']
+            # Source line of the statement, used by probes and line directives
+            struct['line'] = reduced[0].get('line', -1)
             return struct
 
 def showError(error):
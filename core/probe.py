@@ -0,0 +1,78 @@
+''' Detection of the programs used to build and run Photon projects.
+    Paths, versions and supported flags are probed once and cached in
+    ~/.photon/probe.json, keyed by PATH and the program mtime, so the
+    command line doesn't spawn processes to check them again. '''
+
+import os
+import json
+import shutil
+import pathlib
+import tempfile
+import subprocess
+
+# Flags that are tested on C compilers
+compilerFlags = {
+    'lto': ['-flto'],
+    'openmp': ['-fopenmp'],
+    'native': ['-march=native'],
+}
+compilers = {'gcc', 'clang', 'cc'}
+
+probed = None
+
+def probeFile():
+    return os.path.join(pathlib.Path.home(), '.photon', 'probe.json')
+
+def loadProbes():
+    ''' Return the probes of the current PATH '''
+    global probed
+    if probed is None:
+        try:
+            with open(probeFile()) as f:
+                probed = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            probed = {}
+    return probed.setdefault(os.environ.get('PATH', ''), {})
+
+def saveProbes():
+    os.makedirs(os.path.dirname(probeFile()), exist_ok=True)
+    temp = f'{probeFile()}.{os.getpid()}.tmp'
+    with open(temp, 'w') as f:
+        json.dump(probed, f, indent=4)
+    os.replace(temp, probeFile())
+
+def supportsFlags(compiler, flags):
+    ''' Return True if the compiler builds an empty program with the flags '''
+    with tempfile.TemporaryDirectory() as temp:
+        result = subprocess.run([compiler] + flags + ['-x', 'c', '-', '-o', os.path.join(temp, 'probe')],
+            input=b'int main() { return 0; }\n', capture_output=True)
+    return result.returncode == 0
+
+def probeTool(name, path):
+    ''' Run the program to find its version and capabilities '''
+    info = {'path':path, 'mtime':os.stat(path).st_mtime, 'version':'', 'flags':{}}
+    try:
+        result = subprocess.run([path, '--version'], capture_output=True, timeout=30)
+        info['version'] = result.stdout.decode(errors='replace').strip()
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    if name in compilers:
+        info['flags'] = {flag:supportsFlags(path, args) for flag, args in compilerFlags.items()}
+    return info
+
+def tool(name):
+    ''' Return the probe of the program or None if it's not installed '''
+    probes = loadProbes()
+    path = shutil.which(name)
+    if path is None:
+        return None
+    info = probes.get(name)
+    if info is None or info['path'] != path or info['mtime'] != os.stat(path).st_mtime:
+        info = probes[name] = probeTool(name, path)
+        saveProbes()
+    return info
+
+def supports(compiler, flag):
+    ''' Return True if the compiler supports the capability (lto, openmp, native) '''
+    info = tool(compiler)
+    return bool(info) and info['flags'].get(flag, False)
@@ -0,0 +1,41 @@
+''' Report of the profile written by instrumented programs.
+    Programs built with --instrument save the calls and times of each
+    function and loop in photon.profile.json. The report lists them by
+    source file, next to the line of Photon code they come from. '''
+
+import os
+import json
+
+def loadProfile(filename='photon.profile.json'):
+    ''' Return the probes of the profile '''
+    with open(filename) as f:
+        return json.load(f)['probes']
+
+def sourceLines(filename, folder=''):
+    ''' Return the lines of the Photon source or an empty list if it's missing '''
+    for path in [os.path.join(folder, filename), filename]:
+        if os.path.isfile(path):
+            with open(path, encoding='utf8') as f:
+                return f.read().splitlines()
+    return []
+
+def report(filename='photon.profile.json'):
+    ''' Return the report of the profile, slowest sites first '''
+    probes = loadProfile(filename)
+    folder = os.path.dirname(os.path.abspath(filename))
+    total = sum(p['exclusive'] for p in probes) or 1
+    files = {}
+    for p in probes:
+        files.setdefault(p['file'], []).append(p)
+    lines = []
+    for name in sorted(files):
+        source = sourceLines(name, folder)
+        lines.append(f'{name}')
+        lines.append(f'{"line":>6}{"calls":>12}{"total (s)":>12}{"self (s)":>12}{"self %":>8}  source')
+        for p in sorted(files[name], key=lambda p: -p['exclusive']):
+            line = p['line']
+            code = source[line - 1].strip() if 0 < line <= len(source) else p['name']
+            lines.append(f'{line:>6}{p["calls"]:>12}{p["inclusive"]:>12.4f}{p["exclusive"]:>12.4f}'
+                f'{p["exclusive"] / total * 100:>7.1f}%  {code}')
+        lines.append('')
+    return '\n'.join(lines)
@@ -0,0 +1,141 @@
+''' Stage timing of the Photon pipeline.
+    When enabled, the reading, tokenizing, reducing, assembly, transpiling,
+    writing, compiling and running stages are wrapped to record wall time,
+    call counts and peak Python memory. Embedders can register callbacks
+    to receive every stage event. '''
+
+import os
+import sys
+import json
+import time
+import atexit
+import tracemalloc
+from functools import wraps
+
+# Stage name -> {'calls', 'total', 'self', 'peak'}. Times are in seconds.
+stats = {}
+# Chrome trace events
+events = []
+callbacks = []
+stack = []
+# (owner, attribute, original function) of the wrapped stages
+wrapped = []
+enabled = False
+startTime = 0
+
+def addCallback(callback):
+    ''' Call callback(event) when a stage ends. The event is a dict with the
+        stage name, start and duration in seconds and the nesting depth. '''
+    callbacks.append(callback)
+
+def removeCallback(callback):
+    callbacks.remove(callback)
+
+def enter(name):
+    if stack:
+        # The peak is reset for the new stage, so keep the parent's so far
+        stack[-1]['peak'] = max(stack[-1]['peak'], tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    stack.append({'name':name, 'start':time.perf_counter(), 'children':0.0, 'peak':0})
+
+def leave():
+    end = time.perf_counter()
+    frame = stack.pop()
+    duration = end - frame['start']
+    peak = max(frame['peak'], tracemalloc.get_traced_memory()[1])
+    stage = stats.setdefault(frame['name'], {'calls':0, 'total':0.0, 'self':0.0, 'peak':0})
+    stage['calls'] += 1
+    stage['self'] += duration - frame['children']
+    stage['peak'] = max(stage['peak'], peak)
+    if stack:
+        parent = stack[-1]
+        parent['children'] += duration
+        parent['peak'] = max(parent['peak'], peak)
+    if not any(f['name'] == frame['name'] for f in stack):
+        # Recursive calls are only counted once in the total time
+        stage['total'] += duration
+    events.append({'name':frame['name'], 'ph':'X', 'pid':os.getpid(), 'tid':0,
+        'ts':(frame['start'] - startTime) * 1e6, 'dur':duration * 1e6})
+    for callback in callbacks:
+        callback({'name':frame['name'], 'start':frame['start'] - startTime,
+            'duration':duration, 'depth':len(stack)})
+
+def profiled(name, function):
+    ''' Return function wrapped as the stage name '''
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        enter(name)
+        try:
+            return function(*args, **kwargs)
+        finally:
+            leave()
+    wrapper.__profiled__ = True
+    return wrapper
+
+def wrap(owner, attribute, name):
+    function = getattr(owner, attribute, None)
+    if function is None or getattr(function, '__profiled__', False):
+        return
+    wrapped.append((owner, attribute, function))
+    setattr(owner, attribute, profiled(name, function))
+
+def instrument():
+    ''' Wrap the stages of the pipeline '''
+    import photonParser
+    import interpreter
+    from transpilers import baseTranspiler
+    from transpilers import cTranspiler, pyTranspiler, jsTranspiler
+    from engines import astEngine
+    # The parser functions are also imported by name in other modules
+    for module in [photonParser, interpreter]:
+        wrap(module, 'parse', 'tokenize')
+        wrap(module, 'assembly', 'assembly')
+    wrap(photonParser, 'reduceToken', 'reduce')
+    wrap(interpreter.Interpreter, 'read', 'read')
+    wrap(baseTranspiler.BaseTranspiler, 'process', 'transpile')
+    for module in [cTranspiler, pyTranspiler, jsTranspiler]:
+        wrap(module.Transpiler, 'write', 'write')
+        wrap(module.Transpiler, 'run', 'run')
+    wrap(cTranspiler.Transpiler, 'build', 'compile')
+    # Python programs and REPL statements are lowered to an ast and run in this process
+    wrap(astEngine.Engine, 'module', 'compile')
+    wrap(astEngine.Engine, 'bytecode', 'compile')
+    wrap(astEngine.Engine, 'execute', 'run')
+
+def enable(report=True, trace=None):
+    ''' Start profiling. If report is True, the summary is printed at exit
+        and if trace is a filename, the Chrome trace is saved there. '''
+    global enabled, startTime
+    if enabled:
+        return
+    enabled = True
+    startTime = time.perf_counter()
+    tracemalloc.start()
+    instrument()
+    if report:
+        atexit.register(lambda: print(summary(), file=sys.stderr))
+    if trace:
+        atexit.register(exportTrace, trace)
+
+def disable():
+    ''' Stop profiling and restore the unwrapped stages '''
+    global enabled
+    if not enabled:
+        return
+    enabled = False
+    while wrapped:
+        owner, attribute, function = wrapped.pop()
+        setattr(owner, attribute, function)
+    tracemalloc.stop()
+
+def summary():
+    ''' Return the table of the stages, slowest first '''
+    lines = [f'{"stage":<12}{"calls":>10}{"total (s)":>12}{"self (s)":>12}{"peak (KB)":>12}']
+    for name, stage in sorted(stats.items(), key=lambda s: -s[1]['self']):
+        lines.append(f'{name:<12}{stage["calls"]:>10}{stage["total"]:>12.4f}{stage["self"]:>12.4f}{stage["peak"] / 1024:>12.1f}')
+    return '\n'.join(lines)
+
+def exportTrace(filename):
+    ''' Save the stage events in the Chrome trace event format '''
+    with open(filename, 'w') as f:
+        json.dump({'traceEvents':events, 'displayTimeUnit':'ms'}, f)
@@ -0,0 +1,43 @@
+''' Source maps of the generated JavaScript, in the version 3 format.
+    Node (--enable-source-maps), browsers and V8 profilers use them to
+    report the Photon lines instead of the generated ones. '''
+
+import os
+
+BASE64 = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+
+def encodeVlq(value):
+    ''' Encode the integer as a base64 variable length quantity '''
+    value = (-value << 1) | 1 if value < 0 else value << 1
+    encoded = ''
+    while True:
+        digit = value & 31
+        value >>= 5
+        if value:
+            digit |= 32
+        encoded += BASE64[digit]
+        if not value:
+            return encoded
+
+def sourceMap(filename, origins, folder):
+    ''' Return the source map of the generated file. origins has the
+        (Photon file, line) of each generated line or None. Sources are
+        relative to the folder of the generated file. '''
+    sources = []
+    mappings = []
+    # Fields of the segments are relative to the previous segment
+    previousSource = 0
+    previousLine = 0
+    for origin in origins:
+        if origin is None:
+            mappings.append('')
+            continue
+        path = os.path.relpath(os.path.abspath(origin[0]), folder).replace(os.sep, '/')
+        if not path in sources:
+            sources.append(path)
+        source = sources.index(path)
+        line = origin[1] - 1
+        mappings.append(encodeVlq(0) + encodeVlq(source - previousSource) + encodeVlq(line - previousLine) + encodeVlq(0))
+        previousSource = source
+        previousLine = line
+    return {'version':3, 'file':filename, 'sources':sources, 'names':[], 'mappings':';'.join(mappings)}
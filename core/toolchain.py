@@ -1,11 +1,15 @@
+import os
+import probe
+import subprocess
 from interpreter import Interpreter
 
 class Toolchain():
-    def __init__(self, platform, test=False, standardLibs=''):
+    def __init__(self, platform, test=False, standardLibs='', lang='c', debug=False, buildOptions=None):
         self.standardLibs = standardLibs
         self.platform = platform
         self.test = test
-        self.interpreter = Interpreter('main.w', standardLibs=standardLibs)
+        self.interpreter = Interpreter('main.w', lang=lang, standardLibs=standardLibs, debug=debug,
+            transpileOnly=True, buildOptions=buildOptions)
 
     def logcat(self):
         pass
@@ -24,3 +28,30 @@ class Toolchain():
 
     def runProject(self):
         pass
+
+class LinuxToolchain(Toolchain):
+    ''' Build the C target with Ninja, or Make when Ninja is not installed '''
+
+    def transpile(self):
+        self.interpreter.run()
+
+    def getBuildFiles(self):
+        self.interpreter.engine.writeBuildFiles()
+
+    def make(self):
+        ''' Run the build graph on all cores. Return True on success. '''
+        jobs = str(os.cpu_count() or 1)
+        if probe.tool('ninja'):
+            command = ['ninja', '-C', 'Sources/c', '-j', jobs]
+        else:
+            command = ['make', '-C', 'Sources/c', '-j', jobs]
+        try:
+            subprocess.check_call(command)
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            print(e)
+            print('Compilation error. Check errors above.')
+            return False
+        return True
+
+    def runProject(self):
+        subprocess.call(['./Sources/c/main'])
@@ -1,15 +1,32 @@
 from interpreter import Interpreter
 from copy import deepcopy
+from collections import ChainMap
 import os
+import constEval
+
+class SourceLine(str):
+    ''' Generated code that remembers the Photon file and line it came from '''
+    def __new__(cls, code, origin):
+        line = super().__new__(cls, code)
+        line.origin = origin
+        return line
+
+def keepOrigin(code, line):
+    ''' Return code with the origin of line, if it has one '''
+    origin = getattr(line, 'origin', None)
+    return SourceLine(code, origin) if origin else code
 
 class BaseTranspiler():
-    def __init__(self, filename, target='web', module=False, standardLibs=''):
+    def __init__(self, filename, target='web', module=False, standardLibs='', buildOptions=None):
         self.debug = False # make this a global variable instead, inseide the debug module
         self.standardLibs = standardLibs
         self.target = target
+        # Options of the native build, like the build mode. See photon --help
+        self.buildOptions = buildOptions if buildOptions else {}
         self.lang = 'photon'
         self.libExtension = 'photonExt'
         self.filename = filename.split('/')[-1].replace('.w','.photon')
+        self.sourceFile = filename.split('/')[-1]
         self.module = module
 
         self.operators = ['**','*','%','/','-','+','==','!=','>','<','>=','<=','is','in','andnot','and','or','&', '<<', '>>'] # in order 
@@ -44,7 +61,7 @@ class BaseTranspiler():
             'or': self.orOperator,
         }
         self.terminator = ';'
-        self.currentScope = {}
+        self.currentScope = ChainMap()
         # Old scope is a list because of nested scopes.
         # E.g. methods of a class have the classScope and the method scope
         self.oldScope = []
@@ -55,6 +72,31 @@ class BaseTranspiler():
         self.insertMode = True
         self.source = []
         self.outOfMain = []
+        # Photon line of the statement being processed
+        self.currentLine = None
+        # Pure functions not yet defined in the const evaluator and the
+        # scalar consts, with their scope entry and literal token
+        self.pureFunctions = []
+        self.constEvaluator = None
+        self.constants = {}
+        # Functions available without import and the value they return
+        self.builtins = {
+            'readInts': {'type':'array', 'elementType':'int', 'size':'unknown'},
+            'readFloats': {'type':'array', 'elementType':'float', 'size':'unknown'},
+            'flush': {'type':'void'},
+        }
+        # Methods available on every array and the type they return.
+        # 'element' is the element type and 'array' an array of the same type.
+        self.arrayMethods = {
+            'reserve': 'void',
+            'extend': 'void',
+            'copy': 'array',
+            'clear': 'void',
+            'pop': 'element',
+            'insert': 'void',
+            'shrinkToFit': 'void',
+            'fill': 'void',
+        }
         self.nativeTypes = {
             'int':'int',
             'float':'float',
@@ -65,6 +107,8 @@ class BaseTranspiler():
 
     def insertCode(self, line, index=None):
         if self.insertMode:
+            if self.currentLine:
+                line = SourceLine(line, (self.sourceFile, self.currentLine))
             if self.inFunc or self.inClass:
                 if not index is None:
                     self.outOfMain.insert(index, line)
@@ -77,7 +121,12 @@ class BaseTranspiler():
                     self.source.append(line)
 
     def process(self, token):
+        previousLine = self.currentLine
+        if token.get('line', -1) > 0:
+            self.currentLine = token['line']
         self.instructions[token['opcode']](token)
+        # The end of a block belongs to the statement that opened it
+        self.currentLine = previousLine
 
     def nativeType(self, varType):
         if varType in self.nativeTypes:
@@ -118,6 +167,11 @@ class BaseTranspiler():
             return False
         return True
 
+    def profiledType(self, name, kind):
+        ''' Return the type of the variable of the current function seen in
+            a training run and if it's certain. Kind is args, locals or return. '''
+        return None, False
+
     def processInput(self, token):
         if 'expr' in token:
             expr = self.processExpr(token['expr'])
@@ -132,6 +186,35 @@ class BaseTranspiler():
             self.currentScope[name] = {'type':varType}
         self.insertCode(self.formatVarInit(name, varType))
 
+    def isConst(self, token):
+        ''' If the var token is a scalar const, not shadowed in this scope '''
+        name = token.get('name')
+        return name in self.constants and self.currentScope.get(name) is self.constants[name][0]
+
+    def evaluateConst(self, name, expr, varType):
+        ''' Return the value of the const, computed by the const evaluator '''
+        if self.constEvaluator is None:
+            self.constEvaluator = constEval.ConstEvaluator(self.standardLibs)
+        for function in self.pureFunctions:
+            try:
+                self.constEvaluator.define(function)
+            except Exception:
+                # Consts that call it won't be evaluated
+                pass
+        self.pureFunctions = []
+        return self.constEvaluator.evaluate(name, expr, varType)
+
+    def processConst(self, token):
+        ''' Assign the literal of the value of the const, evaluated at compile time '''
+        target = token['target']
+        name = target['name']
+        target['type'] = target['type'][len('const'):].strip() or 'unknown'
+        value = self.evaluateConst(name, token['expr'], target['type'])
+        expr = constEval.literal(name, value)
+        self.processAssign(dict(token, expr=expr))
+        if expr['type'] != 'array':
+            self.constants[name] = (self.currentScope.get(name), expr['args'][0])
+
     def processVar(self, token):
         name = token['name']
         if self.typeKnown(token['type']):
@@ -143,6 +226,9 @@ class BaseTranspiler():
             if varType == 'array':
                 token['elementType'] = self.currentScope[name]['elementType']
                 token['size'] = self.currentScope[name]['size']
+            elif varType == 'map':
+                token['keyType'] = self.currentScope[name]['keyType']
+                token['valType'] = self.currentScope[name]['valType']
         elif name == self.inFunc and self.returnType:
             for rt in self.returnType:
                 if self.typeKnown(rt):
@@ -165,6 +251,15 @@ class BaseTranspiler():
                     'indexAccess':token['indexAccess'], 'type':v['type']}
             return {'value':token['name'], 'type':varType,
                 'elementType':token['elementType'], 'size':token['size']}
+        elif varType == 'map':
+            if 'indexAccess' in token:
+                # Accessing the value of a key
+                token['type'] = varType
+                v = self.processIndexAccess(token)
+                return {'value':v['value'],
+                    'indexAccess':token['indexAccess'], 'type':v['type']}
+            return {'value':token['name'], 'type':varType,
+                'keyType':token['keyType'], 'valType':token['valType']}
         return {'value':token['name'], 'type':varType}
 
     def processIndexAccess(self, token):
@@ -172,11 +267,15 @@ class BaseTranspiler():
             varType = token['elementType']
             return {'value':self.formatIndexAccess(token),
                 'type':varType}
+        elif token['type'] == 'map':
+            return {'value':self.formatIndexAccess(token),
+                'type':token['valType']}
         else:
             raise SyntaxError(f'IndexAccess with type {token["type"]} not implemented yet')
 
     def processFormatStr(self, token):
         expressions = [self.processExpr(expr) for expr in token['expressions']]
+        token['typedValues'] = expressions
         string, expressions = self.formatStr(token['value'], expressions)
         if expressions:
             # It's a format string
@@ -216,6 +315,14 @@ class BaseTranspiler():
         return {'value':self.formatArray(elements, varType, token['size']), 'type':'array',
         'elements':elements, 'elementType':varType, 'size':'unknown'}
 
+    def processMap(self, token):
+        keyType = token['keyType']
+        valType = token['valType']
+        if not self.typeKnown(keyType) or not self.typeKnown(valType):
+            raise SyntaxError('Map with unknown key or value type not implemented yet.')
+        return {'value':self.formatMap(keyType, valType), 'type':'map',
+            'keyType':keyType, 'valType':valType}
+
     def getValAndType(self, token):
         if 'value' in token and 'type' in token and (self.typeKnown(token['type']) or not self.insertMode):
             if token['type'] == 'str':
@@ -235,6 +342,8 @@ class BaseTranspiler():
         elif token['token'] == 'group':
             return self.processGroup(token)
         elif token['token'] == 'var':
+            if self.isConst(token) and not {'modifier', 'indexAccess'} & set(token):
+                return self.getValAndType(deepcopy(self.constants[token['name']][1]))
             return self.processVar(token)
         elif token['token'] == 'dotAccess':
             return self.processDotAccess(token)
@@ -242,13 +351,17 @@ class BaseTranspiler():
             return self.processInput(token)
         elif token['token'] == 'array':
             return self.processArray(token)
+        elif token['token'] == 'map':
+            return self.processMap(token)
         else:
             raise ValueError(f'ValAndType with token {token} not implemented')
 
     def processExpression(self, token):
         ''' Process the expr token as a standalone code '''
         expr = self.processExpr(token)
-        self.insertCode(expr['value']+self.terminator)
+        if expr['value']:
+            # Empty values are statements with nothing to do on this target
+            self.insertCode(expr['value']+self.terminator)
 
     def processExpr(self, token):
         ''' Process expr tokens as values, returning its type and value '''
@@ -283,7 +396,10 @@ class BaseTranspiler():
         #TODO: Handle dict types
         variable = self.processVar(token['target'])
         expr = token['expr']
-        if self.typeKnown(variable['type']) and expr['args'][0]['type'] == 'array':
+        if variable['type'] == 'array' and expr['args'][0]['type'] == 'array':
+            # Array declaration with the elementType, e.g. int:10 values = []
+            expr['args'][0]['elementType'] = variable['elementType']
+        elif self.typeKnown(variable['type']) and expr['args'][0]['type'] == 'array':
             # The type declaration is for the elementType
             variable['elementType'] = variable['type']
             expr['args'][0]['elementType'] = variable['type']
@@ -312,6 +428,10 @@ class BaseTranspiler():
     def processAssign(self, token):
         target = token['target']
         expr = token['expr']
+        if target['token'] == 'var' and target['type'].split(' ')[0] == 'const':
+            return self.processConst(token)
+        elif self.isConst(target):
+            raise SyntaxError(f'Const {target["name"]} can\'t be assigned.')
         if target['token'] in {'var', 'dotAccess'}:
             #variable = self.processVar(target)
             variable = self.getValAndType(target)
@@ -320,6 +440,11 @@ class BaseTranspiler():
                     # Add array info into expression
                     expr['args'][0]['elementType'] = variable['elementType']
                     expr['args'][0]['size'] = variable['size']
+            elif variable['type'] == 'map' and not 'indexAccess' in variable:
+                if expr['args'][0]['type'] == 'map':
+                    # Add map info into expression
+                    expr['args'][0]['keyType'] = variable['keyType']
+                    expr['args'][0]['valType'] = variable['valType']
             elif self.typeKnown(variable['type']) and expr['args'][0]['type'] == 'array':
                 # The type declaration is for the elementType
                 expr['args'][0]['elementType'] = variable['type']
@@ -337,6 +462,9 @@ class BaseTranspiler():
                 #if not self.typeKnown(expr['elementType']):
                 #    expr['elementType'] = variable['elementType']
                 #    expr['len'] = variable['len']
+            elif variable['type'] == 'map':
+                self.currentScope[variable['value']]['keyType'] = variable['keyType']
+                self.currentScope[variable['value']]['valType'] = variable['valType']
             elif expr['type'] == 'array':
                 self.currentScope[variable['value']]['elementType'] = expr['elementType']
                 self.currentScope[variable['value']]['size'] = expr['size']
@@ -345,6 +473,8 @@ class BaseTranspiler():
                 self.currentScope[variable['value']]['type'] = 'array'
 
         else:
+            if not self.typeKnown(expr['type']):
+                expr['type'] = self.profiledType(variable['value'], 'locals')[0] or expr['type']
             varType = self.inferType(expr)
             if self.typeKnown(varType):
                 self.currentScope[variable['value']] = {'type':varType}
@@ -365,6 +495,15 @@ class BaseTranspiler():
 
     def processAugAssign(self, token):
         op = token['operator']
+        if self.isConst(token['target']):
+            raise SyntaxError(f'Const {token["target"]["name"]} can\'t be assigned.')
+        if op != '+':
+            # Other operators are written as an assignment, like x = x - (expr)
+            target = token['target']
+            expr = {'token':'expr', 'type':'unknown', 'ops':[op],
+                'args':[deepcopy(target), {'token':'group', 'type':'unknown', 'expr':token['expr']}]}
+            self.processAssign({'token':'assign', 'opcode':'assign', 'target':deepcopy(target), 'expr':expr})
+            return
         expr = self.processExpr(token['expr'])
         if token['target']['token'] in {'var','dotAccess'}:
             variable = self.getValAndType(token['target'])
@@ -383,7 +522,7 @@ class BaseTranspiler():
             raise SyntaxError(f'AugAssign with variable {token["target"]} not supported yet.')
 
     def formatIndexAccess(self, token):
-        if token['type'] == 'array':
+        if token['type'] in {'array', 'map'}:
             indexAccess = self.processExpr(token['indexAccess'])['value']
             name = token['name']
             return f'{name}[{indexAccess}]'
@@ -408,11 +547,14 @@ class BaseTranspiler():
         self.insertCode(self.formatEndIf())
 
     def processWhile(self, token):
+        probe = self.loopProbe('while', token)
         expr = self.processExpr(token['expr'])
         self.insertCode(self.formatWhile(expr))
         for c in token['block']:
             self.process(c)
         self.insertCode(self.formatEndWhile())
+        if probe:
+            self.insertCode(probe)
 
     def processRange(self, token):
         rangeType = 'unknown'
@@ -430,20 +572,39 @@ class BaseTranspiler():
         return {'type':rangeType, 'from':fromVal, 'step':step, 'to':toVal}
 
     def processFor(self, token):
+        probe = self.loopProbe('for', token)
         if token['iterable']['token'] == 'expr':
             iterable = self.processExpr(token['iterable'])
         else:
             iterable = self.processRange(token['iterable'])
+            # The number of iterations is known, so arrays that grow by one
+            # element per iteration can be allocated once before the loop
+            fromVal = iterable['from']['value']
+            toVal = iterable['to']['value']
+            step = iterable['step']['value']
+            if step == '1':
+                count = f'({toVal}) - ({fromVal})'
+            else:
+                count = f'(({toVal}) - ({fromVal}) + ({step}) - 1) / ({step})'
+            for array in self.rangeAppends(token['block']):
+                reserve = self.formatArrayReserve(array, count)
+                if reserve:
+                    self.insertCode(reserve)
         variables = [ self.processVar(v) for v in token['vars'] ]
         self.insertCode(self.formatFor(variables, iterable))
-        #TODO: Handle dict iteration and multivar for loop
+        #TODO: Handle multivar for loop
         if iterable['type'] == 'array':
             self.currentScope[variables[-1]['value']] = {'type':iterable['elementType']}
+        elif iterable['type'] == 'map':
+            # Iterating over a map gives its keys
+            self.currentScope[variables[-1]['value']] = {'type':iterable['keyType']}
         else:
             self.currentScope[variables[-1]['value']] = {'type':iterable['type']}
         for c in token['block']:
             self.process(c)
         self.insertCode(self.formatEndFor())
+        if probe:
+            self.insertCode(probe)
 
     def processArgs(self, tokens, inferType=False):
         args = []
@@ -455,6 +616,11 @@ class BaseTranspiler():
                 # ignore value type because of the scope
                 # Function arguments need explicit type
                 args.append( {'type':tok['type'], 'value':arg['value']} )
+                if tok['type'] == 'array':
+                    # Typed array arguments, like float:10 values
+                    for key in ['elementType', 'size']:
+                        if key in tok['args'][0]:
+                            args[-1][key] = tok['args'][0][key]
         return args
 
     def processKwargs(self, tokens):
@@ -473,6 +639,8 @@ class BaseTranspiler():
 
     def processCall(self, token, className=None):
         name = self.getValAndType(token['name'])
+        if className is None and name['value'] in self.builtins and not name['value'] in self.currentScope:
+            return self.processBuiltin(name['value'], token)
         args = self.processArgs(token['args'], inferType=True)
         # Put kwargs in the right order
         if not className is None:
@@ -500,13 +668,28 @@ class BaseTranspiler():
             val = token['modifier'].replace('not',self.notOperator) + val
         return {'value':val, 'type':callType}
 
+    def processBuiltin(self, name, token):
+        args = self.processArgs(token['args'], inferType=True)
+        builtin = dict(self.builtins[name])
+        builtin['value'] = self.formatBuiltin(name, args)
+        return builtin
+
     def processDotAccess(self, token):
         tokens = token['dotAccess']
-        varType = self.processVar(tokens[0])['type']
+        first = self.processVar(tokens[0])
+        varType = first['type']
+        elementType = first.get('elementType')
         currentType = varType
         tokens[0]['type'] = varType
         for n, v in enumerate(tokens[1:], 1):
-            if varType in self.classes:
+            if currentType == 'array' and v['token'] == 'call' and v['name']['name'] in self.arrayMethods:
+                array = {'value':self.formatDotAccess(tokens[:n]), 'type':'array', 'elementType':elementType}
+                return self.processArrayMethod(array, v)
+            elif currentType in {'array', 'map'} and v['name'] == 'len':
+                tokens[n]['type'] = 'int'
+                currentType = 'int'
+                varType = 'int'
+            elif varType in self.classes:
                 if v['token'] == 'call':
                     name = v['name']['name']
                 else:
@@ -515,15 +698,12 @@ class BaseTranspiler():
                     currentType = self.classes[varType]['scope'][name]['type']
                     if currentType == 'array':
                         varType = self.classes[varType]['scope'][name]['elementType']
+                        elementType = varType
                         tokens[n]['type'] = currentType
                         tokens[n]['elementType'] = varType
                     else:
                         varType = currentType
                         tokens[n]['type'] = varType
-            elif currentType == 'array' and v['name'] == 'len':
-                tokens[n]['type'] = 'int'
-                currentType = 'int'
-                varType = 'int'
         value = self.formatDotAccess(tokens)
         
         # pass other arguments to be compatible with processVar method
@@ -539,13 +719,65 @@ class BaseTranspiler():
 
         return {'value':value, 'type':varType}
 
+    def processArrayMethod(self, array, token):
+        method = token['name']['name']
+        args = [self.processExpr(arg) for arg in token['args']]
+        value = self.formatArrayMethod(array, method, args)
+        returnType = self.arrayMethods[method]
+        if returnType == 'array':
+            return {'value':value, 'type':'array', 'elementType':array['elementType'], 'size':'unknown'}
+        elif returnType == 'element':
+            return {'value':value, 'type':array['elementType']}
+        return {'value':value, 'type':returnType}
+
+    def rangeAppends(self, block):
+        ''' Return the arrays that are appended once in every iteration of the block '''
+        arrays = []
+        for c in block:
+            if c['token'] == 'augAssign' and c['operator'] == '+' and c['target']['token'] == 'var':
+                name = c['target']['name']
+                if name in self.currentScope and self.currentScope[name]['type'] == 'array' \
+                        and not 'indexAccess' in c['target']:
+                    arrays.append({'value':name, 'type':'array',
+                        'elementType':self.currentScope[name]['elementType']})
+        return arrays
+
+    def formatArrayReserve(self, array, count):
+        # Only targets that manage the array capacity need to pre-size it
+        return None
+
+    def probeSite(self, name, kind, token):
+        ''' Return the site of a probe of the instrumented build '''
+        return {'name':name, 'kind':kind, 'file':self.sourceFile, 'line':token.get('line', -1)}
+
+    def loopProbe(self, kind, token):
+        ''' Insert the start of the loop probe and return its end '''
+        if not self.buildOptions.get('instrument'):
+            return None
+        line = token.get('line', -1)
+        site = self.probeSite(f'{self.inFunc or "main"}:{kind}@{line}', 'loop', token)
+        start, end = self.formatLoopProbe(site)
+        self.insertCode(start)
+        return end
+
+    def formatFuncProbe(self, site):
+        # Return the code inserted at the start and at the end of the function
+        raise SyntaxError('Instrumented build not implemented yet.')
+
+    def formatLoopProbe(self, site):
+        # Return the code inserted before and after the loop
+        raise SyntaxError('Instrumented build not implemented yet.')
+
     def startScope(self):
-        self.oldScope.append(deepcopy(self.currentScope))
+        # The inner scope looks up the outer one instead of copying it, so
+        # starting a scope doesn't grow with the definitions before it
+        self.oldScope.append(self.currentScope)
+        self.currentScope = self.currentScope.new_child()
         # refresh returnType
         self.returnType = set()
 
     def endScope(self):
-        scope = deepcopy(self.currentScope)
+        scope = self.currentScope
         self.currentScope = self.oldScope.pop()
         return scope
 
@@ -602,8 +834,17 @@ class BaseTranspiler():
         kwargs = self.processKwargs(token['kwargs'])
         name = token['name']
         returnType = token['type']
+        if self.inFunc is None and self.inClass is None and constEval.isPure(token):
+            self.pureFunctions.append(constEval.snapshot(token))
         self.returnType = returnType
         self.inFunc = name
+        # Args without a type get the one seen when the program ran
+        for arg in args:
+            if not self.typeKnown(arg['type']):
+                profiled, certain = self.profiledType(arg['value'], 'args')
+                if profiled:
+                    arg['type'] = profiled
+                    arg['profiled'] = certain
         # infer return type if not known
         if not self.typeKnown(returnType):
             # Pre process code and get returnType
@@ -612,9 +853,8 @@ class BaseTranspiler():
             self.startScope()
             # put args in scope
             for arg in args:
-                argType = arg['type']
                 argVal = arg['value']
-                self.currentScope[argVal] = {'type':argType}
+                self.currentScope[argVal] = {k:v for k, v in arg.items() if k != 'value'}
             # put kwargs in scope
             for kw in kwargs:
                 kwType = kw['type']
@@ -629,7 +869,7 @@ class BaseTranspiler():
                     returnType = rt
                     break
             else:
-                returnType = 'void'
+                returnType = self.profiledType(name, 'return')[0] or 'void'
             self.endScope()
             # return to normal mode
             self.insertMode = True
@@ -639,9 +879,8 @@ class BaseTranspiler():
         index = len(self.outOfMain)
         # put args in scope
         for arg in args:
-            argType = arg['type']
             argVal = arg['value']
-            self.currentScope[argVal] = {'type':argType}
+            self.currentScope[argVal] = {k:v for k, v in arg.items() if k != 'value'}
         # put kwargs in scope
         for kw in kwargs:
             kwType = kw['type']
@@ -650,9 +889,16 @@ class BaseTranspiler():
         for c in token['block']:
             self.process(c)
         self.insertCode(self.formatFunc(name, returnType, args, kwargs),index)
+        if self.buildOptions.get('instrument'):
+            site = self.probeSite(f'{self.inClass}.{name}' if self.inClass else name, 'function', token)
+            start, end = self.formatFuncProbe(site)
+            self.insertCode(start, index + 1)
+            if end:
+                self.insertCode(end)
         self.insertCode(self.formatEndFunc())
         self.inFunc = None
-        funcScope = self.endScope()
+        # Only the names declared in the function are kept with it
+        funcScope = self.endScope().maps[0]
         self.currentScope[name] = {'scope':funcScope, 'type':returnType, 'token':'func', 'args':args, 'kwargs':kwargs}
 
     def processReturn(self, token):
@@ -684,14 +930,16 @@ class BaseTranspiler():
                         module=True,
                         standardLibs=self.standardLibs,
                         transpileOnly=True,
-                        debug=self.debug)
+                        debug=self.debug,
+                        buildOptions=self.buildOptions)
                 interpreter.run()
                 self.classes.update(interpreter.engine.classes)
                 self.currentScope.update(interpreter.engine.currentScope)
                 self.imports = self.imports.union(interpreter.engine.imports)
                 self.links = self.links.union(interpreter.engine.links)
-                self.outOfMain += interpreter.engine.outOfMain
-                self.source += interpreter.engine.source
+                self.listTypes = self.listTypes.union(interpreter.engine.listTypes)
+                self.dictTypes = self.dictTypes.union(interpreter.engine.dictTypes)
+                self.importModule(name, interpreter.engine)
             elif f"{name}.w" in os.listdir(self.standardLibs):
                 # Photon module import
                 raise SyntaxError('Photon module import not implemented yet.')
@@ -705,6 +953,11 @@ class BaseTranspiler():
                 # System library import
                 self.insertCode(self.formatSystemLibImport(token['expr']))
 
+    def importModule(self, name, engine):
+        ''' Add the code of a local module to this program '''
+        self.outOfMain += engine.outOfMain
+        self.source += engine.source
+
     def printFunc(self, token):
         if 'expr' in token:
             value = self.processExpr(token['expr'])
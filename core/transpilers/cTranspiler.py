@@ -1,5 +1,15 @@
-from transpilers.baseTranspiler import BaseTranspiler
+from transpilers.baseTranspiler import BaseTranspiler, keepOrigin
 import os
+import re
+import io
+import json
+import shutil
+import hashlib
+import subprocess
+import buildCache
+import probe
+import typeProfile
+from buildCache import writeIfChanged
 from string import Formatter
 
 def debug(*args):
@@ -16,7 +26,7 @@ class Transpiler(BaseTranspiler):
         self.imports = {'#include <stdio.h>', '#include <stdlib.h>', '#include <locale.h>'}
         self.funcIdentifier = '/*def*/'
         self.constructorName = 'new'
-        self.block = {'struct ','/*def*/', 'for ','while ','if ','else ', 'int main('}
+        self.block = {'struct ','/*def*/', 'for ','while ','if ','else ', 'int main(', '/*probe*/'}
         self.true = '1'
         self.false = '0'
         self.null = 'NULL'
@@ -37,6 +47,44 @@ class Transpiler(BaseTranspiler):
             'unknown': 'auto',
         }
         self.initInternal = False
+        # Compiler flags of each build mode
+        self.buildModes = {
+            # Debug info lets native profilers map the code back to the .w lines
+            'default': ['-O2', '-g'],
+            'dev': ['-O0', '-g'],
+            'release': ['-O3', '-flto'],
+            'pgo': ['-O3', '-flto'],
+        }
+        # Local modules, compiled separately and initialized in import order
+        self.modules = []
+        # Array literals from this length on are copied from a static table.
+        # The tables are declared at file scope, so class attributes can use them too.
+        self.tableLength = 32
+        self.tables = []
+        # Types seen in a training run, for the variables without a known type
+        self.observedTypes = {}
+        if self.buildOptions.get('types'):
+            profile = typeProfile.loadProfile(self.buildOptions['types'])
+            if os.path.basename(profile['file']) == self.sourceFile:
+                self.observedTypes = profile['functions']
+        # Body of the hash and equality functions used by the map runtime
+        # for each supported key type
+        self.hashFunctions = {
+            'int': (
+                # splitmix64 finalizer, spreads sequential keys over the slots
+                'unsigned long long x = (unsigned long long) key; x ^= x >> 30; x *= 0xbf58476d1ce4e5b9ULL; x ^= x >> 27; x *= 0x94d049bb133111ebULL; return x ^ (x >> 31);',
+                'return a == b;'),
+            'bool': (
+                'return (unsigned long long) key;',
+                'return a == b;'),
+            'float': (
+                'unsigned long long x; key = key == 0.0 ? 0.0 : key; memcpy(&x, &key, sizeof(x)); x ^= x >> 30; x *= 0xbf58476d1ce4e5b9ULL; x ^= x >> 27; return x ^ (x >> 31);',
+                'return a == b;'),
+            'str': (
+                # FNV-1a
+                'unsigned long long x = 14695981039346656037ULL; while (*key) { x ^= (unsigned char) *key++; x *= 1099511628211ULL; } return x;',
+                'return !strcmp(a, b);'),
+        }
 
     def formatSystemLibImport(self, expr):
         # TODO: Handle dotAccess imports
@@ -81,25 +129,107 @@ class Transpiler(BaseTranspiler):
         return '.'.join(dotAccess).replace('->.','->')
     
     def formatArray(self, elements, elementType, size):
-        self.listTypes.add(elementType)
-        className = f'list_{elementType.replace("*", "ptr")}'
-        if elementType in {'int', 'float', 'str'}:
-            self.imports.add(f'#include "{className}.h"')
-        else:
+        if not elementType in {'int', 'float', 'str'}:
             raise SyntaxError(f'Array of type {elementType} not implemented yet.')
-        values = ','.join(e['value'] for e in elements)
-        if size == 'unknown':
-            size = 10
-        if elements:
-            initValues = ';'.join(f'{{var}}.values[{i}] = {v["value"]}' for i, v in enumerate(elements))
-        else:
-            initValues = ''
+        self.listTypes.add(elementType)
+        className = f'list_{elementType}'
+        if size == 'unknown' or int(size) < len(elements):
+            # Literals are allocated with their exact length
+            size = len(elements) if elements else 10
+        if len(elements) >= self.tableLength and all(self.isLiteral(v) for v in elements):
+            return self.formatTable(className, elements, elementType, size)
+        initValues = ''.join(f'{{var}}.values[{i}] = {v["value"]};' for i, v in enumerate(elements))
         elementType = self.nativeType(elementType)
-        return f"{className} {{var}} = {{{{ {len(elements)}, {size}, malloc(sizeof({elementType})*{size}) }}}};{initValues};"
+        return f"{className} {{var}} = {{{{ {len(elements)}, {size}, malloc(sizeof({elementType})*{size}) }}}};{initValues}"
+
+    def isLiteral(self, value):
+        if value.get('token') in {'num', 'floatNumber', 'bool'}:
+            return True
+        return value.get('token') == 'str' and not 'format' in value and not '{' in value['value'] and not '}' in value['value']
+
+    def formatTable(self, className, elements, elementType, size):
+        ''' Array literal copied from a static table, instead of a statement per element '''
+        self.imports.add('#include <string.h>')
+        self.instanceCounter += 1
+        table = f'__table{self.instanceCounter}__'
+        elementType = self.nativeType(elementType)
+        values = ', '.join(v['value'] for v in elements)
+        self.tables.append(f"static const {elementType} {table}[] = {{ {values} }};")
+        return (f"{className} {{var}} = {{{{ {len(elements)}, {size}, malloc(sizeof({elementType})*{size}) }}}}; "
+            f"memcpy({{var}}.values, {table}, sizeof({table}));")
+
+    def formatArrayMethod(self, array, method, args):
+        className = f'list_{array["elementType"]}'
+        target = f'&{array["value"]}'
+        if method == 'copy':
+            return f'{className} {{var}} = {className}_copy({target});'
+        elif method == 'extend':
+            other = args[0]['value']
+            if '{var}' in other:
+                # Temp array, must be initialized first
+                tempArray = other.format(var='__tempArray__')
+                return f'{{ {tempArray} {className}_extend({target}, &__tempArray__); free(__tempArray__.values); }}'
+            return f'{className}_extend({target}, &{other})'
+        arguments = ''.join(f', {arg["value"]}' for arg in args)
+        return f'{className}_{method}({target}{arguments})'
+
+    def formatArrayReserve(self, array, count):
+        name = array['value']
+        return f'list_{array["elementType"]}_reserve(&{name}, {name}.len + {count});'
+
+    def importModule(self, name, engine):
+        ''' Modules are compiled on their own, only their header is included '''
+        self.imports.add(f'#include "{name}.h"')
+        for module in engine.modules + [name]:
+            if not module in self.modules:
+                self.modules.append(module)
+
+    def formatMap(self, keyType, valType):
+        if not keyType in self.hashFunctions:
+            raise SyntaxError(f'Map with key type {keyType} not implemented yet.')
+        if not valType in {'int', 'float', 'str', 'bool'}:
+            raise SyntaxError(f'Map with value type {valType} not implemented yet.')
+        self.dictTypes.add((keyType, valType))
+        className = f'dict_{keyType}_{valType}'
+        return f"{className} {{var}} = {{{{ 0, 0, NULL, NULL, NULL }}}};"
+
+    def renderTemplate(self, template, name, replacements):
+        ''' Instantiate a runtime template as the header name.h '''
+        with open(f'{self.standardLibs}/native/c/{template}.template') as t:
+            header = t.read()
+        for placeholder, value in replacements.items():
+            header = header.replace(f'{{{placeholder}}}', value)
+        writeIfChanged(f'Sources/c/{name}.h', header)
+
+    def instantiateContainers(self):
+        ''' Generate the headers of the containers used by the program.
+            Return their includes. '''
+        containers = []
+        for elementType in self.listTypes:
+            self.renderTemplate('list', f'list_{elementType}', {
+                'typeName': elementType,
+                'type': self.nativeType(elementType),
+                'numeric': '1' if elementType in {'int', 'float'} else '0',
+            })
+            containers.append(f'list_{elementType}')
+        for keyType, valType in self.dictTypes:
+            hashBody, equalsBody = self.hashFunctions[keyType]
+            self.renderTemplate('dict', f'dict_{keyType}_{valType}', {
+                'hash': hashBody,
+                'equals': equalsBody,
+                'keyTypeName': keyType,
+                'valTypeName': valType,
+                'keyType': self.nativeType(keyType),
+                'valType': self.nativeType(valType),
+            })
+            containers.append(f'dict_{keyType}_{valType}')
+        return [f'#include "{name}.h"' for name in sorted(containers)]
 
     def formatInput(self, expr):
         self.imports.add('#include "photonInput.h"')
-        message = self.formatPrint(expr).replace('\\n', '', 1) if expr['value'] else ''
+        message = self.formatPrint(expr, newline=False) if expr['value'] else ''
+        # Buffered output must be visible before waiting for input
+        message += ' fflush(stdout);'
         if not self.initInternal:
             initInternal = ' char* __inputStr__;'
             self.initInternal = True
@@ -107,6 +237,16 @@ class Transpiler(BaseTranspiler):
             initInternal = ''
         return  f'{message}{initInternal} __inputStr__ = photonInput();'
 
+    def formatBuiltin(self, name, args):
+        if name in {'readInts', 'readFloats'}:
+            self.imports.add('#include "photonInput.h"')
+            elementType = self.builtins[name]['elementType']
+            self.listTypes.add(elementType)
+            return f'list_{elementType} {{var}}; {{var}}.values = photon{name[0].upper()}{name[1:]}(&{{var}}.len); {{var}}.size = {{var}}.len;'
+        elif name == 'flush':
+            return 'fflush(stdout)'
+        raise SyntaxError(f'Builtin {name} not implemented yet.')
+
     def formatStr(self, string, expressions):
         string = '"' + string[1:-1].replace('"', '\\"').replace('%', '%%') + '"'
         exprs = []
@@ -120,17 +260,43 @@ class Transpiler(BaseTranspiler):
                 if valType == 'str':
                     string = string.replace('{}', '%s', 1)
                 elif valType == 'int':
-                    string = string.replace('{}', '%d', 1)
+                    # Photon ints are longs in C
+                    string = string.replace('{}', '%ld', 1)
                 elif valType == 'float':
                     string = string.replace('{}', '%f', 1)
                 else:
                     raise SyntaxError(f'Cannot format {valType} in formatStr')
         return string, exprs
 
+    def profiledType(self, name, kind):
+        function = f'{self.inClass}.{self.inFunc}' if self.inClass else self.inFunc or '<module>'
+        counts = self.observedTypes.get(function, {}).get(kind, {})
+        if kind != 'return':
+            counts = counts.get(name, {})
+        varType, certain = typeProfile.observedType(counts)
+        # Element types of the containers aren't recorded
+        if not varType in {'int', 'float', 'str', 'bool'}:
+            return None, False
+        return varType, certain
+
+    def formatGuard(self, name, param, arg):
+        ''' Check at runtime a float passed to an arg that was only an int in the type profile '''
+        self.imports.add('#include "photonGuard.h"')
+        site = json.dumps(f'{name}({param["value"]})')
+        return f'photonGuardInt({arg["value"]}, {site})'
+
     def formatCall(self, name, returnType, args, kwargs):
         # Handle function arguments. Kwargs are in the right order
-        arguments = ', '.join(f'{arg["value"]}' if not arg['type'] in self.classes
-            else f'&{arg["value"]}' for arg in args+kwargs)
+        params = self.currentScope.get(name, {}).get('args', []) if isinstance(name, str) else []
+        arguments = []
+        for i, arg in enumerate(args+kwargs):
+            if arg['type'] in self.classes:
+                arguments.append(f'&{arg["value"]}')
+            elif i < len(params) and 'profiled' in params[i] and params[i]['type'] == 'int' and arg['type'] == 'float':
+                arguments.append(self.formatGuard(name, params[i], arg))
+            else:
+                arguments.append(f'{arg["value"]}')
+        arguments = ', '.join(arguments)
         return f'{name}({arguments})'
     
     def formatIndexAccess(self, token):
@@ -139,11 +305,15 @@ class Transpiler(BaseTranspiler):
             indexAccess = self.processExpr(token['indexAccess'])['value']
             name = token['name']
             return f'list_{varType}_get(&{name}, {indexAccess})'
+        elif token['type'] == 'map':
+            key = self.processExpr(token['indexAccess'])['value']
+            name = token['name']
+            return f'dict_{token["keyType"]}_{token["valType"]}_get(&{name}, {key})'
         else:
             raise SyntaxError(f'IndexAccess with type {token["type"]} not implemented yet')
 
     def formatIndexAssign(self, target, expr, inMemory=False):
-        if target['type'] == 'array' or target['dotAccess'][-1]['type'] == 'array':
+        if target['type'] == 'array' or ('dotAccess' in target and target['dotAccess'][-1]['type'] == 'array'):
             if 'dotAccess' in target:
                 index = self.processExpr(target['dotAccess'][-1]['indexAccess'])['value']
                 name = target['dotAccess'][-1]['name']
@@ -158,6 +328,16 @@ class Transpiler(BaseTranspiler):
                 cast = None
             expr = self.formatExpr(expr, cast = cast, var = name)
             return f'list_{varType}_set(&{name}, {index}, {expr});'
+        elif target['type'] == 'map':
+            key = self.processExpr(target['indexAccess'])['value']
+            name = target['name']
+            valType = target['valType']
+            if self.typeKnown(expr['type']) and expr['type'] != valType:
+                cast = self.nativeType(valType)
+            else:
+                cast = None
+            expr = self.formatExpr(expr, cast = cast, var = name)
+            return f'dict_{target["keyType"]}_{valType}_set(&{name}, {key}, {expr});'
         else:
             raise SyntaxError(f'Index assign with type {target["type"]} not implemented in c target.')
 
@@ -204,7 +384,8 @@ class Transpiler(BaseTranspiler):
             # It's a format string
             formatstr = expr['format']
             values = ','.join(expr['values'])
-            return f'{varType} {variable}; asprintf(&{variable}, {formatstr},{values});'
+            declaration = '' if inMemory else f'{self.nativeType(varType)} {variable}; '
+            return f'{declaration}asprintf(&{variable}, {formatstr},{values});'
         if expr['type'] == 'array' and expr['elementType'] != self.currentScope[variable]['elementType']:
             cast = self.nativeType(varType)
         elif self.typeKnown(expr['type']) and expr['type'] != varType:
@@ -225,11 +406,16 @@ class Transpiler(BaseTranspiler):
                 return formattedExpr + f'{varType}{variable}; {variable} = __inputStr__;'
         except KeyError:
             pass
-        if expr['type'] == 'array':
+        if expr['type'] in {'array', 'map'}:
             return formattedExpr.format(var=variable)
-        elif expr['type'] in self.classes:
+        elif expr['type'] in self.classes and formattedExpr.startswith(f'{expr["type"]}('):
+            # Constructor call
             className = expr["type"]
             classInit = self.formatClassInit(className, variable)#.format(var=variable)
+            if self.constructorName in self.classes[className]['methods']:
+                arguments = formattedExpr[len(className) + 1:-1]
+                arguments = f'&{variable}, {arguments}' if arguments else f'&{variable}'
+                classInit += f' {className}_{self.constructorName}({arguments});'
             return f'{className} {variable} = {classInit};'
         return f'{varType}{variable} = {formattedExpr};'
 
@@ -283,7 +469,7 @@ class Transpiler(BaseTranspiler):
         if 'from' in iterable:
             # For with range
             self.iterVar.append(variables[0]['value'])
-            varType = iterable['type']
+            varType = self.nativeType(iterable['type'])
             fromVal = iterable['from']['value']
             self.step = iterable['step']['value']
             toVal = iterable['to']['value']
@@ -293,7 +479,7 @@ class Transpiler(BaseTranspiler):
                 varType = varType + ' '
             return f'{varType}{self.iterVar[-1]} = {fromVal}; for (; {self.iterVar[-1]} < {toVal}; {self.iterVar[-1]} += {self.step}) {{'
         elif iterable['type'] == 'array':
-            varType = iterable['elementType']
+            varType = self.nativeType(iterable['elementType'])
             self.iterVar.append(variables[0]['value'])
             if self.iterVar[-1] in self.currentScope:
                 varType = ''
@@ -303,14 +489,25 @@ class Transpiler(BaseTranspiler):
                 # Temp array, must be initialized first
                 tempArray = iterable['value'].format(var="__tempArray__")
                 self.freeTempArray = 'free(__tempArray__.values); }'
-                beginScope = '{{ '
+                beginScope = '{ '
                 iterable["value"] = "__tempArray__"
-                self.listTypes.add(varType)
+                self.listTypes.add(iterable['elementType'])
             else:
                 tempArray = ''
                 beginScope = ''
             # tempArray is inside a scope block, must end that when closing the loop
             return f'{varType}{self.iterVar[-1]}; {beginScope}{tempArray}; for (int __iteration__=0; __iteration__ < {iterable["value"]}.len; __iteration__++) {{ {self.iterVar[-1]}={iterable["value"]}.values[__iteration__];'
+        elif iterable['type'] == 'map':
+            # Iterate over the keys, walking the used slots of the map
+            varType = self.nativeType(iterable['keyType'])
+            self.iterVar.append(variables[0]['value'])
+            if self.iterVar[-1] in self.currentScope:
+                varType = ''
+            else:
+                varType = varType + ' '
+            dictName = f'dict_{iterable["keyType"]}_{iterable["valType"]}'
+            name = iterable['value']
+            return f'{varType}{self.iterVar[-1]}; for (long __slot__ = {dictName}_next(&{name}, 0); __slot__ >= 0; __slot__ = {dictName}_next(&{name}, __slot__ + 1)) {{ {self.iterVar[-1]} = {name}.keys[__slot__];'
         else:
             raise SyntaxError(f'Format for with iterable {iterable["type"]} not suported yet.')
     
@@ -324,10 +521,17 @@ class Transpiler(BaseTranspiler):
             # Must also close the tempArray scope block
             return f'}}{self.freeTempArray}'
 
+    def formatArg(self, arg):
+        if arg['type'] in self.classes:
+            return f'{self.nativeType(arg["type"])}* {arg["value"]}'
+        elif arg['type'] == 'array' and 'elementType' in arg:
+            # The list shares its values with the caller
+            self.listTypes.add(arg['elementType'])
+            return f'list_{arg["elementType"]} {arg["value"]}'
+        return f'{self.nativeType(arg["type"])} {arg["value"]}'
+
     def formatArgs(self, args):
-        return ', '.join([ 
-            f'{self.nativeType(arg["type"])} {arg["value"]}' if not arg['type'] in self.classes
-            else f'{self.nativeType(arg["type"])}* {arg["value"]}' for arg in args])
+        return ', '.join([self.formatArg(arg) for arg in args])
 
     def formatFunc(self, name, returnType, args, kwargs):
         # convert kwargs to args
@@ -342,6 +546,19 @@ class Transpiler(BaseTranspiler):
     def formatEndFunc(self):
         return '}\n'
 
+    def formatProbe(self, site):
+        # The probe is closed by the cleanup attribute when its scope ends, even on return
+        self.imports.add('#include "photonProfile.h"')
+        fields = ', '.join([json.dumps(site['name']), json.dumps(site['kind']), json.dumps(site['file']), str(site['line'])])
+        return f'static photonProbe __site__ = {{{fields}}}; photonProbe* __probe__ __attribute__((cleanup(photonProfileExit))) = photonProfileEnter(&__site__);'
+
+    def formatFuncProbe(self, site):
+        return self.formatProbe(site), None
+
+    def formatLoopProbe(self, site):
+        # The loop gets a scope of its own, so the probe ends with it
+        return '{ /*probe*/ ' + self.formatProbe(site), '}'
+
     def formatClass(self, name, args):
         self.className = name
         return f'typedef struct {self.className} {{'
@@ -354,8 +571,8 @@ class Transpiler(BaseTranspiler):
         elementType = array['elementType']
         elementType = self.nativeType(elementType)
         size = array['size']
-        if size == 'unknown':
-            size = 10
+        if size == 'unknown' or int(size) < len(elements):
+            size = len(elements) if elements else 10
         return f"{{ {len(elements)}, {size}, malloc(sizeof({elementType})*{size}) }}"
 
     def formatClassInit(self, className, variable):
@@ -416,24 +633,113 @@ class Transpiler(BaseTranspiler):
         else:
             return {'value':f'{arg1["value"]} == {arg2["value"]}', 'type':'bool'}
 
-    def formatPrint(self, value):
-        if value['type'] == 'int':
-            return f'printf("%ld\\n", {value["value"]});'
-        elif value['type'] == 'float':
-            return f'printf("%f\\n", {value["value"]});'
-        elif value['type'] == 'str':
-            if 'format' in value:
-                # It's a format string
-                formatstr = value['format'][:-1] + '\\n' + value['format'][-1:]
-                values = ', '.join(value['values'])
-                return f'printf({formatstr}, {values});'
-            return f'printf("%s\\n", {value["value"]});'
-        elif value['type'] == 'bool':
-            return f'if ({value["value"]} == 0) {{printf("False\\n");}} else {{printf("True\\n");}}'
-        elif value['type'] == 'null':
-            return 'printf("\\n");'
-        else:
+    def formatWrite(self, value):
+        ''' Return the writer call for a single value '''
+        writers = {'int':'photonWriteInt', 'float':'photonWriteFloat', 'str':'photonWriteStr', 'bool':'photonWriteBool'}
+        if not value['type'] in writers:
             raise SyntaxError(f'Print function with token {value} not supported yet.')
+        return f'{writers[value["type"]]}({value["value"]});'
+
+    def formatPrint(self, value, newline=True):
+        self.imports.add('#include "photonPrint.h"')
+        writes = []
+        if value['type'] == 'null':
+            pass
+        elif 'format' in value:
+            # Format strings are split into writer calls at compile time
+            string = value['value']
+            segments = string[1:-1].replace('"', '\\"').split('{}')
+            for segment, expr in zip(segments, value['typedValues'] + [None]):
+                if segment:
+                    writes.append(f'fputs("{segment}", stdout);')
+                if expr:
+                    writes.append(self.formatWrite(expr))
+        else:
+            writes.append(self.formatWrite(value))
+        if newline:
+            writes.append("putchar('\\n');")
+        return ' '.join(writes)
+
+    def splitInterface(self, lines):
+        ''' Split the code out of main into the struct definitions and function
+            prototypes of a module and the code of its implementation '''
+        interface = []
+        implementation = []
+        inStruct = False
+        for line in lines:
+            if line.startswith('typedef struct '):
+                inStruct = True
+            if inStruct:
+                interface.append(line)
+                if line.startswith('} ') and line[2:-1] in self.classes:
+                    inStruct = False
+            else:
+                if line.startswith('/*def*/'):
+                    interface.append(line.replace('/*def*/', '')[:-1].rstrip() + ';')
+                implementation.append(line)
+        return interface, implementation
+
+    def splitGlobals(self, lines):
+        ''' Split the declarations of the top level variables of a module
+            from their initialization, so they are at file scope and the
+            importers can see them. Return the declarations and the code. '''
+        declarations = []
+        code = []
+        depth = 0
+        for line in lines:
+            if line.startswith('}'):
+                depth -= 1
+            match = re.match(r'([A-Za-z_][\w\s\*]*?[\w\*])\s+([A-Za-z_]\w*) = (.*)$', line)
+            info = self.currentScope.get(match.group(2), {}) if match else {}
+            if depth == 0 and match and 'type' in info and not info.get('token') in {'func', 'class'}:
+                varType, name, init = match.groups()
+                declarations.append(f'{varType} {name};')
+                if init.startswith('{'):
+                    # Struct initializers are compound literals out of a declaration
+                    end = init.index('}') + 1
+                    init = f'({varType}){init[:end]}{init[end:]}'
+                line = keepOrigin(f'{name} = {init}', line)
+            code.append(line)
+            if self.isBlock(line):
+                depth += 1
+        return declarations, code
+
+    def indentLines(self, lines):
+        ''' Indent the code blocks '''
+        indented = []
+        indent = 0
+        for line in lines:
+            if line:
+                if line[0] == '}':
+                    indent -= 4
+            indented.append(keepOrigin(' ' * indent + line.replace('/*def*/', ''), line))
+            if self.isBlock(line):
+                indent += 4
+        return indented
+
+    def lineDirectives(self, lines, filename):
+        ''' Add #line directives, so compiler errors, debuggers and profilers
+            point at the Photon source. Code without an origin is mapped back
+            to the generated file. '''
+        output = []
+        # Physical line in the generated file and the one the compiler assumes
+        physical = 1
+        expected = None
+        for line in lines:
+            origin = getattr(line, 'origin', None)
+            if origin is None and expected is not None:
+                output.append(f'#line {physical + 1} {json.dumps(filename)}')
+                physical += 1
+                expected = None
+            elif origin is not None and origin != expected:
+                # Absolute paths, as the build graph compiles from Sources/c
+                output.append(f'#line {origin[1]} {json.dumps(os.path.abspath(origin[0]))}')
+                physical += 1
+            output.append(line)
+            physical += line.count('\n') + 1
+            if origin is not None:
+                expected = (origin[0], origin[1] + line.count('\n') + 1)
+        return output
 
     def write(self):
         boilerPlateStart = [
@@ -444,47 +750,222 @@ class Transpiler(BaseTranspiler):
             'return 0;',
             '}'
         ]
-        indent = 0
-        count = 0
         if not 'Sources' in os.listdir():
             os.mkdir('Sources')
         if not 'c' in os.listdir('Sources'):
            os.mkdir('Sources/c')
         if not self.module:
             self.filename = 'main.c'
+            if '#include "photonPrint.h"' in self.imports:
+                boilerPlateStart.append('photonPrintInit();')
         else:
-            moduleName = self.filename.split('.')[0]    
+            moduleName = self.filename.split('.')[0]
             self.filename = f'{moduleName}.c'
-            boilerPlateStart = []
-            boilerPlateEnd = []
-        with open(f'Sources/c/{self.filename}', 'w') as f:
-            for imp in self.imports:
-                module = imp.split(' ')[-1].replace('.w', '').replace('"', '')
-                debug(f'Importing {module}')
-                if module in os.listdir(f'{self.standardLibs}/native/c'):
-                    from shutil import copyfile
-                    copyfile(f'{self.standardLibs}/native/c/{module}', f'Sources/c/{module}')
-                if not f'{module}.c' in os.listdir('Sources/c'):
-                    # native import
-                    f.write(imp + '\n')
-            for line in [''] + self.outOfMain + [''] + boilerPlateStart + self.source + boilerPlateEnd:
-                if line:
-                    if line[0] == '}':
-                        indent -= 4
-                f.write(' ' * indent + line.replace('/*def*/', '') + '\n')
-                if self.isBlock(line):
-                    indent += 4
+            # Top level code of a module runs once, when it's initialized
+            boilerPlateStart = [
+                f'/*def*/void {moduleName}__init() {{',
+                'static int __initialized__ = 0;',
+                'if (__initialized__) {',
+                'return;',
+                '}',
+                '__initialized__ = 1;',
+            ]
+            boilerPlateEnd = ['}']
+        boilerPlateStart += [f'{module}__init();' for module in self.modules]
+        includes = []
+        # System headers first, then the local ones
+        for imp in sorted(self.imports, key=lambda imp: ('"' in imp, imp)):
+            module = imp.split(' ')[-1].replace('.w', '').replace('"', '')
+            debug(f'Importing {module}')
+            if module in os.listdir(f'{self.standardLibs}/native/c'):
+                with open(f'{self.standardLibs}/native/c/{module}') as lib:
+                    writeIfChanged(f'Sources/c/{module}', lib.read())
+            if not f'{module}.c' in os.listdir('Sources/c'):
+                # native import
+                includes.append(imp)
+        includes += self.instantiateContainers()
+        # Files are only rewritten when their content changes
+        if self.module:
+            # Structs and prototypes are exported in the module header
+            interface, implementation = self.splitInterface(self.outOfMain)
+            declarations, source = self.splitGlobals(self.source)
+            externs = [f'extern {declaration}' for declaration in declarations]
+            guard = f'{moduleName.upper()}_H'
+            header = [f'#ifndef {guard}', f'#define {guard}'] + includes \
+                + self.indentLines([''] + interface + externs + [f'void {moduleName}__init();', '']) \
+                + ['#endif']
+            writeIfChanged(f'Sources/c/{moduleName}.h', '\n'.join(header) + '\n')
+            lines = [f'#include "{moduleName}.h"', ''] + declarations + self.tables \
+                + self.indentLines([''] + implementation + [''] + boilerPlateStart + source + boilerPlateEnd)
+        else:
+            lines = includes + self.tables \
+                + self.indentLines([''] + self.outOfMain + [''] + boilerPlateStart + self.source + boilerPlateEnd)
+        lines = self.lineDirectives(lines, os.path.abspath(f'Sources/c/{self.filename}'))
+        writeIfChanged(f'Sources/c/{self.filename}', '\n'.join(lines) + '\n')
         debug('Generated ' + self.filename)
 
-    def run(self):
-        from subprocess import call, check_call
+    def buildFlags(self, extra=[]):
+        ''' Return the compiler flags of the selected build mode '''
+        mode = self.buildOptions.get('mode', 'default')
+        if not mode in self.buildModes:
+            raise SyntaxError(f'Build mode {mode} not implemented yet.')
+        # Capabilities of the compiler come from the cached toolchain probe
+        flags = ['-std=c99'] + [f for f in self.buildModes[mode] if f != '-flto' or probe.supports('gcc', 'lto')]
+        if self.buildOptions.get('native') and mode in {'release', 'pgo'} and probe.supports('gcc', 'native'):
+            flags.append('-march=native')
+        return flags + extra
+
+    def buildPlan(self, flags, salt=''):
+        ''' Return the object compile commands, the final command and the
+            cache key of the program built with the given flags '''
+        linkFlags = ['-s'] if self.buildOptions.get('mode') in {'release', 'pgo'} else []
+        # Cold runtime functions are precompiled, hot ones are inline in the headers
+        linkFlags = [buildCache.runtimeLibrary(f'{self.standardLibs}/native/c', flags)] + linkFlags
+        if self.modules:
+            # Each module is an object file, rebuilt only when its source
+            # or one of the headers it includes changes
+            objects = []
+            for name in self.modules + ['main']:
+                source = f'Sources/c/{name}.c'
+                command = ['gcc'] + flags + ['-c', source, '-o', f'Sources/c/{name}.o']
+                objects.append((command, buildCache.buildKey(source, command, salt)))
+            command = ['gcc'] + flags + [c[-1] for c, _ in objects] + sorted(self.links) + linkFlags + ['-o', 'Sources/c/main']
+            key = buildCache.linkKey([key for _, key in objects], command)
+        else:
+            objects = []
+            source = f'Sources/c/{self.filename}'
+            command = ['gcc'] + flags + [source] + sorted(self.links) + linkFlags + ['-o', 'Sources/c/main']
+            key = buildCache.buildKey(source, command, salt)
+        return objects, command, key
+
+    def build(self, flags, salt=''):
+        ''' Build Sources/c/main with the given flags using the build cache '''
+        from subprocess import check_call
+        objects, command, key = self.buildPlan(flags, salt)
+        if buildCache.fetch(key, 'Sources/c/main'):
+            debug(f'Using cached build {key}')
+        else:
+            for objectCommand, objectKey in objects:
+                if not buildCache.fetch(objectKey, objectCommand[-1]):
+                    debug(' '.join(objectCommand))
+                    check_call(objectCommand)
+                    buildCache.store(objectKey, objectCommand[-1])
+            debug(' '.join(command))
+            check_call(command)
+            buildCache.store(key, 'Sources/c/main')
+        # Record how the binary was built
+        with open('Sources/c/main.build.json', 'w') as f:
+            json.dump({'mode':self.buildOptions.get('mode', 'default'), 'objects':[c for c, _ in objects],
+                'command':command, 'key':key}, f, indent=4)
+
+    def writeBuildFiles(self):
+        ''' Write a build.ninja and a Makefile for Sources/c, so the program
+            can be built in parallel by Photon or by any other tool '''
+        flags = ' '.join(self.buildFlags())
+        linkFlags = ' '.join(sorted(self.links) + (['-s'] if self.buildOptions.get('mode') in {'release', 'pgo'} else []))
+        objects = [f'{name}.o' for name in self.modules + ['main']]
+        # The runtime library is built from a copy of its sources
+        os.makedirs('Sources/c/runtime', exist_ok=True)
+        runtime = []
+        for name in sorted(os.listdir(f'{self.standardLibs}/native/c')):
+            if name.endswith(('.c', '.h')):
+                with open(f'{self.standardLibs}/native/c/{name}') as lib:
+                    writeIfChanged(f'Sources/c/runtime/{name}', lib.read())
+                if name.endswith('.c'):
+                    runtime.append(f'runtime/{name[:-2]}.o')
+        runtimeFlags = ' '.join(buildCache.runtimeFlags(self.buildFlags()))
+        ninja = [
+            '# Generated by Photon',
+            'cc = gcc',
+            f'cflags = {flags}',
+            f'runtimeflags = {runtimeFlags}',
+            f'ldflags = {linkFlags}',
+            '',
+            'rule cc',
+            '  command = $cc $cflags -MMD -MF $out.d -c $in -o $out',
+            '  depfile = $out.d',
+            '  deps = gcc',
+            '  description = CC $out',
+            '',
+            'rule ar',
+            '  command = rm -f $out && ar rcs $out $in',
+            '  description = AR $out',
+            '',
+            'rule link',
+            '  command = $cc $cflags $in $ldflags -o $out',
+            '  description = LINK $out',
+            '',
+        ]
+        ninja += [f'build {obj}: cc {obj[:-2]}.c' for obj in objects]
+        ninja += [f'build {obj}: cc {obj[:-2]}.c\n  cflags = $runtimeflags' for obj in runtime]
+        ninja += [f'build libphoton.a: ar {" ".join(runtime)}']
+        ninja += [f'build main: link {" ".join(objects)} libphoton.a', '', 'default main']
+        make = [
+            '# Generated by Photon',
+            'CC = gcc',
+            f'CFLAGS = {flags}',
+            f'RUNTIMEFLAGS = {runtimeFlags}',
+            f'LDFLAGS = {linkFlags}',
+            f'OBJECTS = {" ".join(objects)}',
+            f'RUNTIME = {" ".join(runtime)}',
+            '',
+            'main: $(OBJECTS) libphoton.a',
+            '\t$(CC) $(CFLAGS) $(OBJECTS) libphoton.a $(LDFLAGS) -o $@',
+            '',
+            'libphoton.a: $(RUNTIME)',
+            '\trm -f $@ && ar rcs $@ $(RUNTIME)',
+            '',
+            'runtime/%.o: runtime/%.c',
+            '\t$(CC) $(RUNTIMEFLAGS) -MMD -MP -c $< -o $@',
+            '',
+            '%.o: %.c',
+            '\t$(CC) $(CFLAGS) -MMD -MP -c $< -o $@',
+            '',
+            'clean:',
+            '\trm -f main libphoton.a $(OBJECTS) $(RUNTIME) $(OBJECTS:.o=.d) $(RUNTIME:.o=.d)',
+            '',
+            '.PHONY: clean',
+            '',
+            '-include $(OBJECTS:.o=.d) $(RUNTIME:.o=.d)',
+        ]
+        writeIfChanged('Sources/c/build.ninja', '\n'.join(ninja) + '\n')
+        writeIfChanged('Sources/c/Makefile', '\n'.join(make) + '\n')
+
+    def buildWithProfile(self):
+        ''' Build instrumented, run the training input and rebuild with the profile '''
+        from subprocess import check_call
+        train = self.buildOptions.get('train')
+        if not train:
+            raise SyntaxError('The pgo build mode needs a training input. Use --train [input file].')
+        with open(train, 'rb') as f:
+            salt = hashlib.sha256(f.read()).hexdigest()
+        profileDir = os.path.abspath('Sources/c/profile')
+        useFlags = self.buildFlags([f'-fprofile-use={profileDir}', '-fprofile-correction', '-Wno-missing-profile'])
+        if buildCache.fetch(self.buildPlan(useFlags, salt)[2], 'Sources/c/main'):
+            debug('Using cached pgo build')
+        else:
+            shutil.rmtree(profileDir, ignore_errors=True)
+            self.build(self.buildFlags([f'-fprofile-generate={profileDir}']))
+            with open(train, 'rb') as f:
+                check_call(['./Sources/c/main'], stdin=f, stdout=subprocess.DEVNULL)
+        self.build(useFlags, salt)
+
+    def compile(self):
+        ''' Write and build the program. Return the command that runs it. '''
         self.write()
+        if self.buildOptions.get('mode') == 'pgo':
+            self.buildWithProfile()
+        else:
+            self.build(self.buildFlags())
+        return ['./Sources/c/main']
+
+    def run(self):
+        from subprocess import call
         debug(f'Running {self.filename}')
         try:
-            debug(' '.join(['gcc', '-O2', '-std=c99', f'Sources/c/{self.filename}'] + list(self.links) + ['-o', 'Sources/c/main']))
-            check_call(['gcc', '-O2', '-std=c99', f'Sources/c/{self.filename}'] + list(self.links) + ['-o', 'Sources/c/main'])
+            command = self.compile()
         except Exception as e:
             print(e)
             print('Compilation error. Check errors above.')
         else:
-            call(['./Sources/c/main'])
+            call(command)
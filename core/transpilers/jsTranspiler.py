@@ -1,5 +1,7 @@
 from transpilers.baseTranspiler import BaseTranspiler
 import os
+import json
+from sourceMap import sourceMap
 from string import Formatter
 
 def debug(*args):
@@ -13,9 +15,13 @@ class Transpiler(BaseTranspiler):
         self.lang = 'js'
         self.commentSymbol = '//'
         self.imports = set()
+        # Native runtime sources pasted in the generated program
+        self.runtimeLibs = set()
+        # Variables of the nested for loops
+        self.var = []
         self.funcIdentifier = 'function '
         self.constructorName = 'new'
-        self.block = {'class ','function ', 'for ','while ','if ','elif ','else'}
+        self.block = {'class ','function ', 'for ','while ','if ','elif ','else', 'try {'}
         self.true = 'true'
         self.false = 'false'
         self.null = 'null'
@@ -40,7 +46,13 @@ class Transpiler(BaseTranspiler):
         return f'var {name} = {self.null}'
 
     def formatDotAccess(self, tokens):
-        return '.'.join(self.getValAndType(v)['value'] for v in tokens)
+        values = []
+        for n, v in enumerate(tokens):
+            if n and v.get('name') == 'len' and tokens[n-1].get('type') in {'array', 'map'}:
+                values.append('length' if tokens[n-1]['type'] == 'array' else 'size')
+            else:
+                values.append(self.getValAndType(v)['value'])
+        return '.'.join(values)
     
     def formatInput(self, expr):
         if not self.target == 'web':
@@ -48,6 +60,17 @@ class Transpiler(BaseTranspiler):
         message = expr['value']
         return f'prompt({message})'
 
+    def formatBuiltin(self, name, args):
+        if name in {'readInts', 'readFloats'}:
+            if self.target == 'web':
+                raise SyntaxError(f'Builtin {name} not implemented for the web target.')
+            self.imports.add("fs = require('fs')")
+            return "fs.readFileSync(0, 'latin1').split(/\\s+/).filter(Boolean).map(Number)"
+        elif name == 'flush':
+            # console.log is not buffered by the program
+            return ''
+        raise SyntaxError(f'Builtin {name} not implemented yet.')
+
     def formatStr(self, string, expressions):
         if not '{' in string:
             return string, []
@@ -60,8 +83,15 @@ class Transpiler(BaseTranspiler):
         values = ', '.join(v['value'] for v in elements)
         return f'[{values}]'
     
+    def formatMap(self, keyType, valType):
+        # Map keeps the type of the keys, which objects convert to strings
+        return 'new Map()'
+
     def formatIndexAccess(self, token):
-        if token['type'] == 'array':
+        if token['type'] == 'map':
+            key = self.processExpr(token['indexAccess'])['value']
+            return f'{token["name"]}.get({key})'
+        elif token['type'] == 'array':
             varType = token['elementType']
             index = self.processExpr(token['indexAccess'])['value']
             #TODO: Optimize for constants and remove the if else test. The same applies to C
@@ -71,19 +101,38 @@ class Transpiler(BaseTranspiler):
             raise SyntaxError(f'IndexAccess with type {token["type"]} not implemented yet')
     
     def formatIndexAssign(self, target, expr, inMemory=False):
-        if target['type'] == 'array':
+        if target['type'] in {'array', 'map'}:
             index = self.processExpr(target['indexAccess'])['value']
             name = target['name']
-            varType = target['elementType']
+            varType = target['elementType'] if target['type'] == 'array' else target['valType']
             if self.typeKnown(expr['type']) and expr['type'] != varType:
                 cast = self.nativeType(varType)
             else:
                 cast = None
             expr = self.formatExpr(expr, cast=cast)
+            if target['type'] == 'map':
+                return f'{name}.set({index}, {expr})'
             return f'{name}[{index}] = {expr}'
         else:
             raise SyntaxError(f'Index assign with type {target["type"]} not implemented in py target.')
 
+    def formatArrayMethod(self, array, method, args):
+        name = array['value']
+        arguments = ', '.join(arg['value'] for arg in args)
+        if method in {'reserve', 'shrinkToFit'}:
+            # JS arrays manage their own capacity
+            return ''
+        elif method == 'extend':
+            return f'{arguments}.forEach(__element__ => {name}.push(__element__))'
+        elif method == 'copy':
+            return f'{name}.slice()'
+        elif method == 'clear':
+            return f'{name}.length = 0'
+        elif method == 'insert':
+            index, value = [arg['value'] for arg in args]
+            return f'{name}.splice({index}, 0, {value})'
+        return f'{name}.{method}({arguments})'
+
     def formatArrayAppend(self, target, expr):
         name = target['value']
         expr = self.formatExpr(expr)
@@ -119,6 +168,10 @@ class Transpiler(BaseTranspiler):
                     varType = self.nativeType(target['type'])
                 else:
                     varType = self.nativeType(self.inferType(expr))
+        elif target['token'] == 'dotAccess':
+            # Attributes are declared in the class
+            variable = self.getValAndType(target)['value']
+            return f'{variable} = {self.formatExpr(expr)};'
         else:
             raise SyntaxError(f'Format assign with variable {target} not implemented yet.')
         formattedExpr = self.formatExpr(expr, cast=cast)
@@ -164,6 +217,9 @@ class Transpiler(BaseTranspiler):
         elif iterable['type'] == 'array':
             self.var.append(variables[0]['value'])
             return f'var {self.var[-1]}; for (var __iteration__ = 0; __iteration__ < {iterable["value"]}.length; __iteration__++) {{ {self.var[-1]} = {iterable["value"]}[__iteration__];'
+        elif iterable['type'] == 'map':
+            self.var.append(variables[0]['value'])
+            return f'for (var {self.var[-1]} of {iterable["value"]}.keys()) {{'
 
     def formatEndFor(self):
         if self.step:
@@ -187,6 +243,19 @@ class Transpiler(BaseTranspiler):
     def formatEndFunc(self):
         return '}'
 
+    def formatProbe(self, site):
+        if self.target == 'web':
+            raise SyntaxError('Instrumented build for the web target not implemented yet.')
+        self.runtimeLibs.add('photonProfile.js')
+        fields = ', '.join([json.dumps(site['name']), json.dumps(site['kind']), json.dumps(site['file']), str(site['line'])])
+        return f'__photonProfile__.enter({fields}); try {{', '} finally { __photonProfile__.exit(); }'
+
+    def formatFuncProbe(self, site):
+        return self.formatProbe(site)
+
+    def formatLoopProbe(self, site):
+        return self.formatProbe(site)
+
     def formatClass(self, name, args):
         self.className = name
         return f'class {self.className} {{'
@@ -235,31 +304,46 @@ class Transpiler(BaseTranspiler):
             del self.imports[0]
             del self.imports[0]
             del self.imports[0]
+        code = []
+        for imp in self.imports:
+            module = imp.split(' ')[-1].replace('.w', '').replace('"',  '')
+            debug(f'Importing {module}')
+            if f'{module}.js' in os.listdir('Sources/js'):
+                with open(f'Sources/js/{module}.js', 'r') as m:
+                    for line in m:
+                        code.append(line)
+            else:
+                code.append(imp + '\n')
+        for lib in sorted(self.runtimeLibs):
+            with open(f'{self.standardLibs}/native/js/{lib}', encoding='utf8') as m:
+                code.append(m.read())
+        # Photon file and line of each generated line, for the source map
+        origins = [None] * ''.join(code).count('\n')
+        for line in [''] + self.outOfMain + [''] + boilerPlateStart + self.source + boilerPlateEnd:
+            if line:
+                if line.startswith('}'):
+                    indent -= 4
+            code.append(' ' * indent + line + '\n')
+            origins += [getattr(line, 'origin', None)] * (line.count('\n') + 1)
+            if self.isBlock(line):
+                indent += 4
+        code.append(f'//# sourceMappingURL={self.filename}.map\n')
         # Force utf8 on windows
         with open(f'Sources/js/{self.filename}', 'w', encoding='utf8') as f:
-            for imp in self.imports:
-                module = imp.split(' ')[-1].replace('.w', '').replace('"',  '')
-                debug(f'Importing {module}')
-                if f'{module}.js' in os.listdir('Sources/js'):
-                    with open(f'Sources/js/{module}.js', 'r') as m:
-                        for line in m:
-                            f.write(line)
-                else:
-                    f.write(imp + '\n')
-            for line in [''] + self.outOfMain + [''] + boilerPlateStart + self.source + boilerPlateEnd:
-                if line:
-                    if line.startswith('}'):
-                        indent -= 4
-                f.write(' ' * indent + line + '\n')
-                if self.isBlock(line):
-                    indent += 4
+            f.write(''.join(code))
+        with open(f'Sources/js/{self.filename}.map', 'w', encoding='utf8') as f:
+            json.dump(sourceMap(self.filename, origins, 'Sources/js'), f)
         debug('Generated ' + self.filename)
 
+    def compile(self):
+        ''' Write the program. Return the command that runs it. '''
+        self.write()
+        return ['node', '--enable-source-maps', f'Sources/js/{self.filename}']
+
     def run(self):
         from subprocess import call, check_call
-        self.write()
         debug(f'Running {self.filename}')
         try:
-            check_call(['node', f'Sources/js/{self.filename}'])
+            check_call(self.compile())
         except:
             print('Compilation error. Check errors above.')
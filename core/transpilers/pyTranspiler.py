@@ -13,9 +13,11 @@ class Transpiler(BaseTranspiler):
         self.libExtension = 'py'
         self.commentSymbol = '#'
         self.imports = set()
+        # Native runtime sources pasted in the generated program
+        self.runtimeLibs = set()
         self.funcIdentifier = 'def '
         self.constructorName = '__init__'
-        self.block = {'class ','def ', 'for ','while ','if ','elif ','else:'}
+        self.block = {'class ','def ', 'for ','while ','if ','elif ','else:', 'with '}
         self.true = 'True'
         self.false = 'False'
         self.null = 'None'
@@ -27,6 +29,7 @@ class Transpiler(BaseTranspiler):
             'str':'str',
             'bool':'bool',
             'array':'list',
+            'map':'dict',
             'unknown':'any',
             'void':'None',
         }
@@ -48,12 +51,28 @@ class Transpiler(BaseTranspiler):
         return f'{name} = None'
 
     def formatDotAccess(self, tokens):
-        return '.'.join(self.getValAndType(v)['value'] for v in tokens)
+        values = []
+        for n, v in enumerate(tokens):
+            if n and v.get('name') == 'len' and tokens[n-1].get('type') in {'array', 'map'}:
+                values = [f"len({'.'.join(values)})"]
+            else:
+                values.append(self.getValAndType(v)['value'])
+        return '.'.join(values)
 
     def formatInput(self, expr):
         message = expr['value']
         return f'input({message})'
 
+    def formatBuiltin(self, name, args):
+        if name in {'readInts', 'readFloats'}:
+            self.imports.add('import sys')
+            elementType = self.builtins[name]['elementType']
+            return f'list(map({elementType}, sys.stdin.read().split()))'
+        elif name == 'flush':
+            self.imports.add('import sys')
+            return 'sys.stdout.flush()'
+        raise SyntaxError(f'Builtin {name} not implemented yet.')
+
     def formatStr(self, string, expressions):
         if not '{' in string:
             return string, []
@@ -66,11 +85,14 @@ class Transpiler(BaseTranspiler):
         values = ', '.join(v['value'] for v in elements)
         return f'[{values}]'
     
+    def formatMap(self, keyType, valType):
+        return '{}'
+
     def formatIndexAssign(self, target, expr, inMemory=False):
-        if target['type'] == 'array':
+        if target['type'] in {'array', 'map'}:
             index = self.processExpr(target['indexAccess'])['value']
             name = target['name']
-            varType = target['elementType']
+            varType = target['elementType'] if target['type'] == 'array' else target['valType']
             if self.typeKnown(expr['type']) and expr['type'] != varType:
                 cast = self.nativeType(varType)
             else:
@@ -80,6 +102,16 @@ class Transpiler(BaseTranspiler):
         else:
             raise SyntaxError(f'Index assign with type {target["type"]} not implemented in py target.')
 
+    def formatArrayMethod(self, array, method, args):
+        name = array['value']
+        arguments = ', '.join(arg['value'] for arg in args)
+        if method in {'reserve', 'shrinkToFit'}:
+            # Python lists manage their own capacity
+            return ''
+        elif method == 'fill':
+            return f'{name}[:] = [{arguments}] * len({name})'
+        return f'{name}.{method}({arguments})'
+
     def formatArrayAppend(self, target, expr):
         name = target['value']
         expr = self.formatExpr(expr)
@@ -114,6 +146,10 @@ class Transpiler(BaseTranspiler):
                     varType = self.nativeType(target['type'])
                 else:
                     varType = self.nativeType(self.inferType(expr))
+        elif target['token'] == 'dotAccess':
+            # Attributes are declared in the class
+            variable = self.getValAndType(target)['value']
+            varType = ''
         else:
             raise SyntaxError(f'Format assign with variable {target} not implemented yet.')
         formattedExpr = self.formatExpr(expr, cast=cast)
@@ -169,11 +205,23 @@ class Transpiler(BaseTranspiler):
         kwargs = [{'value':kw['name'], 'type':kw['type']} for kw in kwargs]
         args = self.formatArgs(args+kwargs)
         returnType = self.nativeType(returnType)
+        if self.inClass and name == 'new':
+            name = self.constructorName
         return f'def {name}({args}) -> {returnType}:'
 
     def formatEndFunc(self):
         return '#end'
 
+    def formatProbe(self, site):
+        self.runtimeLibs.add('photonProfile.py')
+        return f"with __photonProbe__({site['name']!r}, {site['kind']!r}, {site['file']!r}, {site['line']}):", '#end'
+
+    def formatFuncProbe(self, site):
+        return self.formatProbe(site)
+
+    def formatLoopProbe(self, site):
+        return self.formatProbe(site)
+
     def formatClass(self, name, args):
         self.className = name
         return f'class {self.className}():'
@@ -234,20 +282,32 @@ class Transpiler(BaseTranspiler):
                             f.write(line)
                 else:
                     f.write(imp + '\n')
+            for lib in sorted(self.runtimeLibs):
+                with open(f'{self.standardLibs}/native/py/{lib}') as m:
+                    f.write(m.read())
+            opened = False
             for line in [''] + self.outOfMain + [''] + boilerPlateStart + self.source + boilerPlateEnd:
                 if line:
                     if line.startswith('#end') or line.startswith('elif ') or line.startswith('else:'):
+                        if opened:
+                            # Blocks whose statements emit nothing still need a body
+                            f.write(' ' * indent + 'pass\n')
                         indent -= 4
+                    opened = self.isBlock(line)
                 f.write(' ' * indent + line.replace('#end', '') + '\n')
                 if self.isBlock(line):
                     indent += 4
         debug('Generated ' + self.filename)
 
+    def compile(self):
+        ''' Write the program. Return the command that runs it. '''
+        self.write()
+        return ['python', f'Sources/py/{self.filename}']
+
     def run(self):
         from subprocess import call, check_call
-        self.write()
         debug(f'Running {self.filename}')
         try:
-            check_call(['python', f'Sources/py/{self.filename}'])
+            check_call(self.compile())
         except:
             print('Compilation error. Check errors above.')
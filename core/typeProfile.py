@@ -0,0 +1,61 @@
+''' Types of the variables observed while a program runs.
+    A training run on the py target records the types of the arguments,
+    locals and return values of each function in photon.types.json. The C
+    transpiler reads the profile to give a native type to the variables
+    whose types the static inference leaves unknown. '''
+
+import sys
+import json
+
+# Python types of the values and their Photon types
+photonTypes = {'int':'int', 'float':'float', 'str':'str', 'bool':'bool', 'list':'array', 'dict':'map'}
+
+class TypeRecorder():
+    ''' Records the types of the variables of the functions of a file when they return '''
+    def __init__(self, filename):
+        self.filename = filename
+        self.functions = {}
+
+    def start(self):
+        sys.setprofile(self.event)
+
+    def stop(self):
+        sys.setprofile(None)
+
+    def event(self, frame, event, arg):
+        if event != 'return' or frame.f_code.co_filename != self.filename:
+            return
+        code = frame.f_code
+        # Methods are recorded as Class.method
+        name = getattr(code, 'co_qualname', code.co_name)
+        function = self.functions.setdefault(name, {'calls':0, 'args':{}, 'locals':{}, 'return':{}})
+        function['calls'] += 1
+        arguments = code.co_varnames[:code.co_argcount]
+        for variable, value in frame.f_locals.items():
+            if not variable.startswith('__'):
+                self.count(function['args' if variable in arguments else 'locals'], variable, value)
+        self.count(function, 'return', arg)
+
+    def count(self, variables, name, value):
+        valueType = photonTypes.get(type(value).__name__)
+        if valueType:
+            counts = variables.setdefault(name, {})
+            counts[valueType] = counts.get(valueType, 0) + 1
+
+    def save(self, filename='photon.types.json'):
+        with open(filename, 'w') as f:
+            json.dump({'file':self.filename, 'functions':self.functions}, f, indent=4)
+
+def loadProfile(filename='photon.types.json'):
+    with open(filename) as f:
+        return json.load(f)
+
+def observedType(counts):
+    ''' Return the type of the counts and if it's certain. Ints and floats
+        are widened to float, which is not certain. Other mixes have no type. '''
+    types = set(counts)
+    if len(types) == 1:
+        return types.pop(), True
+    elif types == {'int', 'float'}:
+        return 'float', False
+    return None, False
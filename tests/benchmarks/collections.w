@@ -0,0 +1,14 @@
+int:int counts = {}
+for k in 0..1000:
+    counts[k] = 0
+int:1000000 values = []
+for i in 0..1000000:
+    values += (i * 7919) % 10007
+for v in values:
+    key = v % 1000
+    counts[key] = counts[key] + 1
+total = 0
+for k in 0..1000:
+    total += counts[k] * k
+print(total)
+print(values[999999])
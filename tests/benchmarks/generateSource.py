@@ -0,0 +1,102 @@
+''' Generator of synthetic Photon programs to stress the parser and the
+    transpilers. The size and shape of the program are configurable:
+    number of functions and classes, nesting depth, terms per expression,
+    elements per literal and number of imported modules.
+
+    Usage: python generateSource.py [folder] [--functions 10] [--depth 3]
+        [--terms 8] [--literal 100] [--classes 2] [--modules 0] '''
+
+import os
+import sys
+
+defaults = {'functions':10, 'depth':3, 'terms':8, 'literal':100, 'classes':2, 'modules':0}
+
+def expression(terms, variables=('x', 'y')):
+    ''' Return an arithmetic expression with the given number of terms '''
+    ops = ['+', '-', '*', '+']
+    parts = [f'{variables[0]} * 2']
+    for i in range(1, terms):
+        parts.append(ops[i % len(ops)])
+        parts.append(f'{variables[i % len(variables)]} * {i % 7 + 1}')
+    return ' '.join(parts)
+
+def block(depth, terms, indent):
+    ''' Return the lines of a body with loops and ifs nested depth levels '''
+    pad = ' ' * indent
+    if depth == 0:
+        return [f'{pad}total += {expression(terms)}']
+    var = f'i{depth}'
+    if depth % 2:
+        lines = [f'{pad}for {var} in 0..3:']
+    else:
+        lines = [f'{pad}if x > {depth}:']
+    lines += block(depth - 1, terms, indent + 4)
+    if depth % 2 == 0:
+        lines += [f'{pad}else:', f'{pad}    total += {depth}.5']
+    return lines
+
+def function(name, depth, terms):
+    return [f'def {name}(int x, float y):', '    total = 0.0'] + block(depth, terms, 4) + ['    return total', '']
+
+def classDefinition(name, index):
+    return [
+        f'class {name}():',
+        f'    int a = {index}',
+        '    float b = 1.5',
+        '    def new(int a):',
+        '        self.a = a',
+        '    def area():',
+        '        return self.a * self.b',
+        '',
+    ]
+
+def arrayLiteral(name, size):
+    values = ', '.join(str(i * 3 % 101) for i in range(max(size, 2)))
+    return [f'int:{max(size, 2)} {name} = [{values}]']
+
+def program(functions=10, depth=3, terms=8, literal=100, classes=2, modules=0):
+    ''' Return the main program and the modules it imports, as {filename: source} '''
+    files = {}
+    main = [f'import mod{m}' for m in range(modules)]
+    for m in range(modules):
+        lines = []
+        for f in range(functions):
+            lines += function(f'mod{m}Func{f}', depth, terms)
+        files[f'mod{m}.w'] = '\n'.join(lines) + '\n'
+    for c in range(classes):
+        main += classDefinition(f'Shape{c}', c)
+    for f in range(functions):
+        main += function(f'func{f}', depth, terms)
+    main += arrayLiteral('data', literal)
+    main.append('result = 0.0')
+    for f in range(functions):
+        main.append(f'result += func{f}({f % 5}, 1.5)')
+    for m in range(modules):
+        main.append(f'result += mod{m}Func0(2, 0.5)')
+    for c in range(classes):
+        main += [f'shape{c} = Shape{c}({c + 1})', f'result += shape{c}.area()']
+    main += ['print(result)', 'print(data[1])']
+    files['main.w'] = '\n'.join(main) + '\n'
+    return files
+
+def write(folder, files):
+    os.makedirs(folder, exist_ok=True)
+    for name, source in files.items():
+        with open(os.path.join(folder, name), 'w') as f:
+            f.write(source)
+
+def lineCount(files):
+    return sum(source.count('\n') for source in files.values())
+
+if __name__ == '__main__':
+    shape = dict(defaults)
+    for name in defaults:
+        option = f'--{name}'
+        if option in sys.argv:
+            index = sys.argv.index(option)
+            shape[name] = int(sys.argv[index + 1])
+            del sys.argv[index:index + 2]
+    folder = sys.argv[1] if len(sys.argv) > 1 else 'generated'
+    files = program(**shape)
+    write(folder, files)
+    print(f'{lineCount(files)} lines written in {folder}')
@@ -0,0 +1,42 @@
+float:5 x = [0.0, 4.84, 8.34, 12.89, 15.37]
+float:5 y = [0.0, -1.16, 4.12, -15.11, -25.91]
+float:5 z = [0.0, -0.10, -0.40, -0.22, 0.17]
+float:5 vx = [0.0, 0.60, -1.01, 1.08, 0.97]
+float:5 vy = [0.0, 2.81, 1.82, 0.86, 0.59]
+float:5 vz = [0.0, -0.02, 0.008, -0.01, -0.03]
+float:5 mass = [39.47, 0.037, 0.011, 0.0017, 0.002]
+
+def energy(float:5 x, float:5 y, float:5 z, float:5 vx, float:5 vy, float:5 vz, float:5 mass):
+    e = 0.0
+    for i in 0..5:
+        e += 0.5 * mass[i] * (vx[i] * vx[i] + vy[i] * vy[i] + vz[i] * vz[i])
+        for j in i + 1..5:
+            dx = x[i] - x[j]
+            dy = y[i] - y[j]
+            dz = z[i] - z[j]
+            e -= mass[i] * mass[j] / (dx * dx + dy * dy + dz * dz) ** 0.5
+    return e
+
+def advance(float:5 x, float:5 y, float:5 z, float:5 vx, float:5 vy, float:5 vz, float:5 mass, float dt):
+    for i in 0..5:
+        for j in i + 1..5:
+            dx = x[i] - x[j]
+            dy = y[i] - y[j]
+            dz = z[i] - z[j]
+            d2 = dx * dx + dy * dy + dz * dz
+            mag = dt / (d2 * d2 ** 0.5)
+            vx[i] -= dx * mass[j] * mag
+            vy[i] -= dy * mass[j] * mag
+            vz[i] -= dz * mass[j] * mag
+            vx[j] += dx * mass[i] * mag
+            vy[j] += dy * mass[i] * mag
+            vz[j] += dz * mass[i] * mag
+    for i in 0..5:
+        x[i] += dt * vx[i]
+        y[i] += dt * vy[i]
+        z[i] += dt * vz[i]
+
+print(energy(x, y, z, vx, vy, vz, mass))
+for step in 0..200000:
+    advance(x, y, z, vx, vy, vz, mass, 0.01)
+print(energy(x, y, z, vx, vy, vz, mass))
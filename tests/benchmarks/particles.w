@@ -0,0 +1,20 @@
+class Particle():
+    float x = 0.0
+    float v = 0.0
+    def new(float x, float v):
+        self.x = x
+        self.v = v
+    def step(float dt):
+        self.v -= self.x * dt
+        self.x += self.v * dt
+    def energy():
+        return 0.5 * (self.x * self.x + self.v * self.v)
+
+a = Particle(1.0, 0.0)
+b = Particle(0.5, 0.5)
+c = Particle(0.0, 1.0)
+for t in 0..3000000:
+    a.step(0.001)
+    b.step(0.001)
+    c.step(0.001)
+print(a.energy() + b.energy() + c.energy())
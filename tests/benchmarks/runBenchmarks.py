@@ -0,0 +1,125 @@
+''' Runtime benchmarks of the code generated by each target.
+    Every .w program in this folder is transpiled and built once per
+    target, then its run is timed a few times. The median of each run is
+    compared with the stored baselines and slower runs beyond the
+    threshold are reported as regressions.
+
+    Usage: python runBenchmarks.py [names] [--targets c,py,js] [--repeat 5]
+        [--threshold 0.1] [--baselines baselines.json] [--save] '''
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+from glob import glob
+
+here = os.path.dirname(os.path.abspath(__file__))
+core = os.path.join(here, os.path.pardir, os.path.pardir, 'core')
+sys.path.insert(1, core)
+from bench import build, stats
+
+def benchmarks(names=None):
+    ''' Return the benchmark programs, all of them if no names are given '''
+    programs = sorted(glob(os.path.join(here, '*.w')))
+    if names:
+        programs = [p for p in programs if os.path.basename(p)[:-2] in names]
+    return programs
+
+def prepare(program, lang, folder):
+    ''' Transpile and build the program in folder.
+        Return the command that runs it. '''
+    shutil.copy(program, folder)
+    cwd = os.getcwd()
+    os.chdir(folder)
+    try:
+        return build(os.path.basename(program), lang, os.path.join(core, 'libs/'))
+    finally:
+        os.chdir(cwd)
+
+def measure(command, folder, repeat=5, warmup=1):
+    ''' Run the command and return its output and the time of each run '''
+    times = []
+    for i in range(warmup + repeat):
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=folder, capture_output=True, check=True)
+        elapsed = time.perf_counter() - start
+        if i >= warmup:
+            times.append(elapsed)
+    return result.stdout.decode(errors='replace'), times
+
+def runBenchmarks(programs, targets, repeat=5):
+    ''' Return {target: {name: stats}}. Programs a target can't
+        transpile, build or run have an error instead of stats. '''
+    results = {}
+    for target in targets:
+        results[target] = {}
+        for program in programs:
+            name = os.path.basename(program)[:-2]
+            with tempfile.TemporaryDirectory() as folder:
+                try:
+                    command = prepare(program, target, folder)
+                    output, times = measure(command, folder, repeat)
+                except (Exception, SystemExit) as e:
+                    results[target][name] = {'error':f'{type(e).__name__}: {e}'.strip()}
+                else:
+                    results[target][name] = stats(times)
+                    results[target][name]['output'] = output.strip()
+            print(f'{target:<4}{name:<16}{summary(results[target][name])}', flush=True)
+    return results
+
+def summary(result):
+    if 'error' in result:
+        return f'failed ({result["error"].splitlines()[0][:60]})'
+    return f'median {result["median"]:.4f}s  min {result["min"]:.4f}s  stdev {result["stdev"]:.4f}s'
+
+def compare(results, baselines, threshold):
+    ''' Return the regressions of the results, as messages '''
+    regressions = []
+    for target, programs in results.items():
+        for name, result in programs.items():
+            baseline = baselines.get(target, {}).get(name)
+            if not baseline or 'error' in baseline:
+                continue
+            if 'error' in result:
+                regressions.append(f'{target} {name}: failed, the baseline ran in {baseline["median"]:.4f}s')
+            elif result['median'] > baseline['median'] * (1 + threshold):
+                change = result['median'] / baseline['median'] - 1
+                regressions.append(f'{target} {name}: {result["median"]:.4f}s is {change:.0%} slower than {baseline["median"]:.4f}s')
+    return regressions
+
+def option(name, default):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        value = sys.argv[index + 1]
+        del sys.argv[index:index + 2]
+        return value
+    return default
+
+if __name__ == '__main__':
+    targets = option('--targets', 'c,py,js').split(',')
+    repeat = int(option('--repeat', 5))
+    threshold = float(option('--threshold', 0.1))
+    baselineFile = option('--baselines', os.path.join(here, 'baselines.json'))
+    save = '--save' in sys.argv
+    if save:
+        sys.argv.remove('--save')
+    results = runBenchmarks(benchmarks(sys.argv[1:]), targets, repeat)
+    if save:
+        # Baselines are only meaningful on the machine they were measured
+        with open(baselineFile, 'w') as f:
+            json.dump({'machine':platform.platform(), 'python':platform.python_version(), **results}, f, indent=4)
+        print(f'Baselines saved in {baselineFile}')
+    elif os.path.isfile(baselineFile):
+        with open(baselineFile) as f:
+            regressions = compare(results, json.load(f), threshold)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print(f'No regressions above {threshold:.0%}')
+    else:
+        print('No baselines to compare. Run with --save to store them.')
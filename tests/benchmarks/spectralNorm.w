@@ -0,0 +1,38 @@
+def a(int i, int j):
+    return 1.0 / ((i + j) * (i + j + 1) / 2 + i + 1)
+
+def multiplyAv(int n, float:300 v, float:300 av):
+    for i in 0..n:
+        total = 0.0
+        for j in 0..n:
+            total += a(i, j) * v[j]
+        av[i] = total
+
+def multiplyAtv(int n, float:300 v, float:300 atv):
+    for i in 0..n:
+        total = 0.0
+        for j in 0..n:
+            total += a(j, i) * v[j]
+        atv[i] = total
+
+def multiplyAtAv(int n, float:300 v, float:300 atav, float:300 temp):
+    multiplyAv(n, v, temp)
+    multiplyAtv(n, temp, atav)
+
+n = 300
+float:300 u = []
+float:300 v = []
+float:300 temp = []
+for i in 0..n:
+    u += 1.0
+    v += 0.0
+    temp += 0.0
+for i in 0..10:
+    multiplyAtAv(n, u, v, temp)
+    multiplyAtAv(n, v, u, temp)
+vBv = 0.0
+vv = 0.0
+for i in 0..n:
+    vBv += u[i] * v[i]
+    vv += v[i] * v[i]
+print((vBv / vv) ** 0.5)
@@ -0,0 +1,7 @@
+matches = 0
+for i in 0..300000:
+    word = "item{i}"
+    line = "<{word}> in {matches}"
+    if line == "<item777> in 0":
+        matches += 1
+print(matches)
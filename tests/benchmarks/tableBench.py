@@ -0,0 +1,60 @@
+''' Build time of programs with a large array literal.
+    A program with a table of each number of elements is transpiled,
+    built and run once per target. The time of each step is reported, so
+    the cost of the literal in the parser, the transpiler and the native
+    compiler can be followed as the table grows.
+
+    Usage: python tableBench.py [--elements 100000,1000000] [--lang c,py,js] '''
+
+import os
+import sys
+import time
+import tempfile
+from contextlib import redirect_stdout
+
+here = os.path.dirname(os.path.abspath(__file__))
+core = os.path.join(here, os.path.pardir, os.path.pardir, 'core')
+sys.path.insert(1, core)
+from interpreter import Interpreter
+from bench import runOnce
+from generateSource import arrayLiteral
+from throughput import option
+
+def program(elements):
+    lines = arrayLiteral('table', elements)
+    lines += ['total = 0', 'for value in table:', '    total += value', 'print(total)']
+    return '\n'.join(lines) + '\n'
+
+def measure(elements, lang):
+    ''' Return the time of each step of the program with the table '''
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as folder:
+        os.chdir(folder)
+        try:
+            with open('table.w', 'w') as f:
+                f.write(program(elements))
+            with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+                start = time.perf_counter()
+                interpreter = Interpreter(filename='table.w', lang=lang, standardLibs=os.path.join(core, 'libs/'), transpileOnly=True)
+                interpreter.run()
+                transpiled = time.perf_counter()
+                command = interpreter.engine.compile()
+                built = time.perf_counter()
+            run = runOnce(command)[0]
+            size = os.path.getsize('table.w')
+        finally:
+            os.chdir(cwd)
+    return {'KB':size / 1024, 'transpile':transpiled - start, 'build':built - transpiled, 'run':run}
+
+if __name__ == '__main__':
+    sizes = [int(n) for n in option('--elements', '100000,1000000').split(',')]
+    langs = option('--lang', 'c,py,js').split(',')
+    print(f'{"elements":>10}{"target":>8}{"KB":>10}{"transpile":>11}{"build":>9}{"run":>9}')
+    for elements in sizes:
+        for lang in langs:
+            try:
+                row = measure(elements, lang)
+            except (Exception, SystemExit) as e:
+                print(f'{elements:>10}{lang:>8}  failed: {type(e).__name__}: {e}')
+                continue
+            print(f'{elements:>10}{lang:>8}{row["KB"]:>10.0f}{row["transpile"]:>10.2f}s{row["build"]:>8.2f}s{row["run"]:>8.2f}s')
@@ -0,0 +1,124 @@
+''' Throughput of the parser and the transpilers as the program grows.
+    Synthetic programs from generateSource.py are transpiled with growing
+    sizes of one shape (functions, depth, terms, literal, classes or modules).
+    The lines per second and the peak memory of each stage are reported and
+    a stage whose time grows faster than the source, beyond the maximum
+    exponent, is reported as superlinear.
+
+    Usage: python throughput.py [shapes] [--lang c] [--steps 4] [--exponent 1.5] '''
+
+import os
+import sys
+import math
+import time
+import tempfile
+import tracemalloc
+from contextlib import redirect_stdout
+
+here = os.path.dirname(os.path.abspath(__file__))
+core = os.path.join(here, os.path.pardir, os.path.pardir, 'core')
+sys.path.insert(1, core)
+import profiler
+from interpreter import Interpreter
+from generateSource import program, write, lineCount
+
+# Shape -> (parameters of the smallest program, parameter that grows)
+shapes = {
+    'functions': ({'functions':10, 'literal':2, 'classes':0}, 'functions'),
+    'depth': ({'functions':2, 'depth':2, 'literal':2, 'classes':0}, 'depth'),
+    'terms': ({'functions':2, 'terms':8, 'literal':2, 'classes':0}, 'terms'),
+    'literal': ({'functions':1, 'literal':50, 'classes':0}, 'literal'),
+    'classes': ({'functions':1, 'literal':2, 'classes':4}, 'classes'),
+    'modules': ({'functions':4, 'literal':2, 'classes':0, 'modules':1}, 'modules'),
+}
+stages = ['read', 'tokenize', 'reduce', 'assembly', 'transpile', 'write']
+# Stages faster than this are too noisy to estimate their growth
+MIN_TIME = 0.05
+
+def transpile(folder, lang):
+    cwd = os.getcwd()
+    os.chdir(folder)
+    try:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            Interpreter(filename='main.w', lang=lang, standardLibs=os.path.join(core, 'libs/'), transpileOnly=True).run()
+    finally:
+        os.chdir(cwd)
+
+def measure(files, lang, memory=False):
+    ''' Transpile the program and return the stats of each stage.
+        Memory is traced in a separate run, as tracing slows every stage. '''
+    profiler.stats.clear()
+    profiler.events.clear()
+    profiler.startTime = time.perf_counter()
+    with tempfile.TemporaryDirectory() as folder:
+        write(folder, files)
+        if memory:
+            tracemalloc.start()
+        try:
+            transpile(folder, lang)
+        finally:
+            if memory:
+                tracemalloc.stop()
+    return {stage:dict(s) for stage, s in profiler.stats.items()}
+
+def growth(points):
+    ''' Exponent of time against source size between the first and last points '''
+    (size1, time1), (size2, time2) = points[0], points[-1]
+    if time1 <= 0 or time2 < MIN_TIME or size2 <= size1:
+        return None
+    return math.log(time2 / time1) / math.log(size2 / size1)
+
+def benchmark(shape, lang='c', steps=4):
+    ''' Return the rows of the shape, doubling its parameter at each step '''
+    base, parameter = shapes[shape]
+    rows = []
+    for step in range(steps):
+        params = dict(base)
+        params[parameter] = base[parameter] * 2 ** step
+        files = program(**params)
+        size = sum(len(source) for source in files.values())
+        times = measure(files, lang)
+        peaks = measure(files, lang, memory=True)
+        rows.append({'lines':lineCount(files), 'size':size, 'param':params[parameter],
+            'time':{s:times[s]['self'] for s in stages if s in times},
+            'peak':{s:peaks[s]['peak'] for s in stages if s in peaks}})
+    return rows
+
+def report(shape, rows, maxExponent):
+    ''' Print the rows and return the stages that grow superlinearly '''
+    parameter = shapes[shape][1]
+    print(f'\n{shape}')
+    print(f'{parameter:>10}{"lines":>8}{"KB":>8}' + ''.join(f'{s + " l/s":>16}' for s in stages) + f'{"peak KB":>10}')
+    for row in rows:
+        rates = ''.join(f'{row["lines"] / row["time"][s]:>16.0f}' if row['time'].get(s) else f'{"-":>16}' for s in stages)
+        peak = max(row['peak'].values(), default=0) / 1024
+        print(f'{row["param"]:>10}{row["lines"]:>8}{row["size"] / 1024:>8.1f}{rates}{peak:>10.0f}')
+    slow = []
+    for stage in stages:
+        exponent = growth([(row['size'], row['time'].get(stage, 0)) for row in rows])
+        if exponent is not None and exponent > maxExponent:
+            slow.append(f'{shape}: {stage} grows as size^{exponent:.2f}')
+    return slow
+
+def option(name, default):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        value = sys.argv[index + 1]
+        del sys.argv[index:index + 2]
+        return value
+    return default
+
+if __name__ == '__main__':
+    lang = option('--lang', 'c')
+    steps = int(option('--steps', 4))
+    maxExponent = float(option('--exponent', 1.5))
+    profiler.instrument()
+    slow = []
+    for shape in sys.argv[1:] or shapes:
+        slow += report(shape, benchmark(shape, lang, steps), maxExponent)
+    print()
+    for message in slow:
+        print(f'SUPERLINEAR {message}')
+    if slow:
+        sys.exit(1)
+    print(f'Every stage grows below size^{maxExponent}')
@@ -0,0 +1,258 @@
+import sys, os
+sys.path.insert(1, os.path.pardir+'/core')
+from interpreter import Interpreter
+import ast
+import json
+import unittest
+import tempfile
+import threading
+from io import StringIO
+from contextlib import redirect_stdout, redirect_stderr
+
+class AstEngineTest(unittest.TestCase):
+    def runFile(self, file):
+        ''' Run the file on the astEngine and return its output '''
+        out = StringIO()
+        with redirect_stdout(out), redirect_stderr(out):
+            try:
+                Interpreter(filename=f'testFiles/{file}', lang='py').run()
+            except SystemExit:
+                pass
+        return out.getvalue().strip()
+
+    def test_expressionNodes(self):
+        ''' Names and numbers are built without parsing '''
+        from engines.astEngine import Transpiler
+        transpiler = Transpiler('')
+        self.assertIsInstance(transpiler.expression('total'), ast.Name)
+        self.assertEqual(transpiler.expression(' 42').value, 42)
+        self.assertIs(transpiler.expression('True').value, True)
+        self.assertIsInstance(transpiler.expression('total + 1'), ast.BinOp)
+
+    def test_printInt(self):
+        out = self.runFile('printFunc/printInt.w')
+        self.assertEqual(out, '26')
+
+    def test_printStr(self):
+        out = self.runFile('printFunc/printStr.w')
+        self.assertEqual(out, 'Hello World')
+
+    def test_printVar(self):
+        out = self.runFile('printFunc/printVar.w')
+        self.assertEqual(out, '2')
+
+    def test_ifElifElse(self):
+        out = self.runFile('controlFlow/ifElifElse.w')
+        self.assertEqual(out.split(), ['A', 'B', 'C'])
+
+    def test_whileBreak(self):
+        out = self.runFile('controlFlow/whileBreak.w')
+        self.assertEqual(out, '4')
+
+    def test_noSourceWritten(self):
+        self.runFile('printFunc/printInt.w')
+        self.assertFalse(os.path.isfile('Sources/py/main.py'))
+
+    def runRepl(self, lines, engine=None):
+        ''' Run the lines in the REPL. Return the interpreter and its output. '''
+        lines = iter(lines + ['exit'])
+        interpreter = Interpreter()
+        if engine:
+            interpreter.engine = engine
+        interpreter.input = lambda glyph='': next(lines)
+        out = StringIO()
+        with redirect_stdout(out):
+            interpreter.run()
+        return interpreter, out.getvalue().strip()
+
+    def test_definitionCompiledOnce(self):
+        lines = ['def twice(x):', '    return x * 2', '', 'def twice(x):', '    return x * 2', '', 'print(twice(4))']
+        interpreter, out = self.runRepl(lines)
+        self.assertEqual(out, '8')
+        self.assertEqual(len(interpreter.engine.definitions), 1)
+
+    def test_timeit(self):
+        interpreter, out = self.runRepl(['x = 3', '%timeit print(x * 2)', 'print(x)'])
+        report, last = out.splitlines()
+        # The output of the timed snippet is left out
+        self.assertRegex(report, r'^py: .+ ± .+ per loop \(best .+, 5 runs, \d+ loops each\)$')
+        self.assertEqual(last, '3')
+
+    def test_definitionCompiledOnceOnPyEngine(self):
+        from engines.pyEngine import Engine
+        lines = ['def twice(x):', '    return x * 2', '', 'def twice(x):', '    return x * 2', '', 'print(twice(4))']
+        interpreter, out = self.runRepl(lines, Engine(''))
+        self.assertEqual(out, '8')
+        self.assertEqual(len(interpreter.engine.definitions), 1)
+
+    def test_functionScopeOwnNames(self):
+        ''' A function keeps only its own names, not the ones defined before it '''
+        lines = ['limit = 3', 'def first(a):', '    return a + limit', '', 'def second(b):', '    return b * 2', '', 'print(second(first(1)))']
+        interpreter, out = self.runRepl(lines)
+        self.assertEqual(out, '8')
+        scope = interpreter.engine.transpiler.currentScope
+        self.assertEqual(set(scope['first']['scope']), {'first', 'a'})
+        self.assertEqual(set(scope['second']['scope']), {'second', 'b'})
+
+class TieredEngineTest(unittest.TestCase):
+    def test_hotFunctionRunsNative(self):
+        interpreter = Interpreter(filename='testFiles/tiered/hotFunction.w', lang='py', buildOptions={'tiered':True})
+        out = StringIO()
+        with redirect_stdout(out):
+            try:
+                interpreter.run()
+            except SystemExit:
+                pass
+        self.assertEqual(out.getvalue().strip(), '6765')
+        # Wait for the native build of the hot function
+        for thread in threading.enumerate():
+            if thread is not threading.current_thread():
+                thread.join()
+        engine = interpreter.engine
+        self.assertIn('fib', engine.native)
+        self.assertEqual(engine.globals['fib'](20), 6765)
+
+    def runTiered(self, file, tiered):
+        interpreter = Interpreter(filename=file, lang='py', buildOptions={'tiered':tiered})
+        out = StringIO()
+        with redirect_stdout(out):
+            try:
+                interpreter.run()
+            except SystemExit:
+                pass
+        for thread in threading.enumerate():
+            if thread is not threading.current_thread():
+                thread.join()
+        return out.getvalue(), interpreter.engine
+
+    def test_sameOutputAsPython(self):
+        expected, _ = self.runTiered('testFiles/tiered/semantics.w', False)
+        out, engine = self.runTiered('testFiles/tiered/semantics.w', True)
+        self.assertEqual(out, expected)
+        # Modulo, overflow and division keep the results of Python when native
+        self.assertIn('m', engine.native)
+        self.assertIn('big', engine.native)
+        self.assertEqual(engine.globals['m'](-7), -7 % 3)
+        self.assertEqual(engine.globals['big'](2**40), 2**40 * 3037000500)
+        self.assertEqual(engine.globals['big'](2**70), 2**70 * 3037000500)
+
+class TypeProfileTest(unittest.TestCase):
+    def test_untypedArgsSpecialized(self):
+        source = os.path.abspath('testFiles/typeProfile/untyped.w')
+        libs = os.path.abspath(os.path.pardir + '/core/libs')
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as folder:
+            os.chdir(folder)
+            try:
+                with redirect_stdout(StringIO()):
+                    try:
+                        Interpreter(filename=source, lang='py', buildOptions={'recordTypes':True}).run()
+                    except SystemExit:
+                        pass
+                    interpreter = Interpreter(filename=source, lang='c', transpileOnly=True, standardLibs=libs,
+                        buildOptions={'types':'photon.types.json'})
+                    interpreter.run()
+            finally:
+                os.chdir(cwd)
+        scope = interpreter.engine.currentScope
+        self.assertEqual([arg['type'] for arg in scope['scale']['args']], ['int', 'int'])
+        self.assertEqual(scope['half']['type'], 'float')
+        # Ints and floats were seen, so the arg is widened to float
+        self.assertEqual(scope['mix']['args'][0]['type'], 'float')
+
+class ConstEvalTest(unittest.TestCase):
+    def test_constsAreLiterals(self):
+        source = os.path.abspath('testFiles/const/constEval.w')
+        libs = os.path.abspath(os.path.pardir + '/core/libs')
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as folder:
+            os.chdir(folder)
+            try:
+                with redirect_stdout(StringIO()):
+                    interpreter = Interpreter(filename=source, lang='c', transpileOnly=True, standardLibs=libs)
+                    interpreter.run()
+            finally:
+                os.chdir(cwd)
+        main = '\n'.join(interpreter.engine.source)
+        self.assertIn('area = 17;', main)
+        # The pure functions only ran at compile time
+        self.assertNotIn('square(', main)
+        self.assertIn('triangle(4) + 4', main)
+
+    def test_sameOutputOnAstEngine(self):
+        out = AstEngineTest().runFile('const/constEval.w')
+        self.assertEqual(out.split(), ['17', '5.666666666666667', 'photon', '9', '12', '14'])
+
+    def test_constNotAssigned(self):
+        libs = os.path.abspath(os.path.pardir + '/core/libs')
+        cwd = os.getcwd()
+        for statement in ['size = 5', 'size += 1', 'size -= 1']:
+            with tempfile.TemporaryDirectory() as folder:
+                os.chdir(folder)
+                try:
+                    with open('const.w', 'w') as f:
+                        f.write(f'const size = 4\n{statement}\nprint(size)\n')
+                    with redirect_stdout(StringIO()), self.assertRaisesRegex(SyntaxError, "Const size can't be assigned"):
+                        Interpreter(filename='const.w', lang='c', transpileOnly=True, standardLibs=libs).run()
+                finally:
+                    os.chdir(cwd)
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        import profiler
+        self.profiler = profiler
+        profiler.enable(report=False)
+        self.events = []
+        profiler.addCallback(self.events.append)
+        with redirect_stdout(StringIO()):
+            try:
+                Interpreter(filename='testFiles/printFunc/printInt.w', lang='py').run()
+            except SystemExit:
+                pass
+        profiler.removeCallback(self.events.append)
+
+    def tearDown(self):
+        self.profiler.disable()
+
+    def stage(self, name):
+        return [e for e in self.events if e['name'] == name]
+
+    def test_stagesNested(self):
+        read, = self.stage('read')
+        run, = self.stage('run')
+        self.assertEqual((read['depth'], run['depth']), (0, 0))
+        # The file is read before the program runs, not around it
+        self.assertLessEqual(read['start'] + read['duration'], run['start'])
+        assemblies = self.stage('assembly')
+        for reduce in self.stage('reduce'):
+            self.assertTrue(any(a['start'] <= reduce['start'] and reduce['depth'] > a['depth']
+                and reduce['start'] + reduce['duration'] <= a['start'] + a['duration'] for a in assemblies))
+
+    def test_peakKeptAcrossChildren(self):
+        ''' Memory freed before a child stage still counts in the parent's peak '''
+        self.profiler.enter('outer')
+        data = bytearray(4 << 20)
+        del data
+        self.profiler.enter('inner')
+        self.profiler.leave()
+        self.profiler.leave()
+        self.assertGreaterEqual(self.profiler.stats['outer']['peak'], 4 << 20)
+
+    def test_disableUnwraps(self):
+        import interpreter
+        self.profiler.disable()
+        self.assertFalse(getattr(interpreter.Interpreter.read, '__profiled__', False))
+        self.assertFalse(getattr(interpreter.parse, '__profiled__', False))
+
+    def test_exportTrace(self):
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'trace.json')
+            self.profiler.exportTrace(filename)
+            with open(filename) as f:
+                trace = json.load(f)
+        names = {e['name'] for e in trace['traceEvents']}
+        self.assertTrue({'read', 'tokenize', 'transpile', 'compile', 'run'} <= names)
+        self.assertTrue(all(e['ph'] == 'X' and e['dur'] >= 0 for e in trace['traceEvents']))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,7 @@ sys.path.insert(1, os.path.pardir+'/core')
 from photonParser import parse
 from interpreter import Interpreter
 import unittest
+import tempfile
 
 class ParserTest(unittest.TestCase):
     def runFile(self, file):
@@ -191,5 +192,51 @@ class ParserTest(unittest.TestCase):
         self.assertEqual(struct['expr']['args'][0]['expr']['ops'], ['+'])
         self.assertEqual(struct['expr']['args'][0]['modifier'], '-')
 
+    def test_assignEmptyMap(self):
+        struct = self.runFile('assign/varEqualEmptyMap.w')
+        self.assertEqual(struct['token'], 'assign')
+        self.assertEqual(struct['target']['type'], 'map')
+        self.assertEqual(struct['target']['keyType'], 'str')
+        self.assertEqual(struct['target']['valType'], 'int')
+        self.assertEqual(struct['expr']['args'][0]['token'], 'map')
+        self.assertEqual(struct['expr']['args'][0]['elements'], [])
+
+    def test_assignNumberArray(self):
+        struct = self.runFile('assign/varEqualNumberArray.w')
+        self.assertEqual(struct['token'], 'assign')
+        array = struct['expr']['args'][0]
+        self.assertEqual(array['token'], 'array')
+        self.assertEqual(array['len'], 3)
+        self.assertEqual([e['args'][0] for e in array['elements']], [
+            {'token':'num', 'type':'int', 'value':'1'},
+            {'token':'num', 'type':'int', 'value':'2', 'modifier':'-'},
+            {'token':'floatNumber', 'type':'float', 'value':'3.5'}])
+
+class ReorderGrammarTest(unittest.TestCase):
+    def setUp(self):
+        sys.path.insert(1, os.path.pardir+'/core/grammar')
+        import reorderGrammar
+        self.reorderGrammar = reorderGrammar
+        self.lines = reorderGrammar.corpusLines([os.path.pardir+'/tests/testFiles/assign'])
+
+    def test_reorderScansLess(self):
+        order, before, after = self.reorderGrammar.reorder(self.lines)
+        self.assertLess(self.reorderGrammar.totalScans(after), self.reorderGrammar.totalScans(before))
+        self.assertEqual(self.reorderGrammar.parseCorpus(self.lines, order),
+            self.reorderGrammar.parseCorpus(self.lines, list(self.reorderGrammar.rules)))
+        self.reorderGrammar.photonParser.patterns = self.reorderGrammar.rules
+
+    def test_writeRefusesMoreScans(self):
+        order = list(self.reorderGrammar.rules)
+        stats = self.reorderGrammar.corpusStats(self.lines, order)[1]
+        self.reorderGrammar.photonParser.patterns = self.reorderGrammar.rules
+        with tempfile.TemporaryDirectory() as folder:
+            filename = os.path.join(folder, 'generatedGrammar.py')
+            self.assertFalse(self.reorderGrammar.writeGrammar(order, filename, stats, stats))
+            self.assertFalse(os.path.exists(filename))
+            fewer = {pattern:dict(s, scans=0) for pattern, s in stats.items()}
+            self.assertTrue(self.reorderGrammar.writeGrammar(order, filename, stats, fewer))
+            self.assertTrue(os.path.exists(filename))
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,24 @@
+values = [1, 2, 3]
+values.reserve(100)
+values.extend([4, 5])
+copied = values.copy()
+values.clear()
+print(values.len)
+print(copied.len)
+last = copied.pop()
+print(last)
+copied.insert(0, 9)
+print(copied[0])
+print(copied[4])
+copied.shrinkToFit()
+print(copied.len)
+copied.fill(7)
+total = 0
+for v in copied:
+    total += v
+print(total)
+squares = [0, 0]
+for i in 0..50:
+    squares += i * i
+print(squares.len)
+print(squares[50])
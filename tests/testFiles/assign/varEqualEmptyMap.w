@@ -0,0 +1 @@
+str:int d = {}
@@ -0,0 +1 @@
+a = [1, -2, 3.5]
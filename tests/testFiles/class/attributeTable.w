@@ -0,0 +1,9 @@
+class A():
+    int:40 data = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32, 33, 34, 35, 36, 37, 38, 39]
+
+a = A()
+total = 0
+for i in 0..40:
+    total += a.data[i]
+print(a.data[39])
+print(total)
@@ -0,0 +1,24 @@
+def square(int n):
+    return n * n
+
+def triangle(int n):
+    total = 0
+    for i in 0..n+1:
+        total += i
+    return total
+
+const size = 4
+const area = square(size) + 1
+const float ratio = area / 3
+const name = "photon"
+const table = [square(1), square(2), square(3)]
+def scaled(int v):
+    return v * size
+
+int x = 3
+print(area)
+print(ratio)
+print(name)
+print(table[2])
+print(scaled(x))
+print(triangle(size) + size)
@@ -0,0 +1,10 @@
+def grade(int n):
+    if n > 90:
+        return 'A'
+    elif n > 80:
+        return 'B'
+    else:
+        return 'C'
+
+for n in [95, 85, 10]:
+    print(grade(n))
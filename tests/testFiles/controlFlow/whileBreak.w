@@ -0,0 +1,6 @@
+i = 0
+while i < 10:
+    i += 1
+    if i == 4:
+        break
+print(i)
@@ -0,0 +1,6 @@
+values = readInts()
+total = 0
+for value in values:
+    total += value
+print(total)
+print(values.len)
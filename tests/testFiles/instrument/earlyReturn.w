@@ -0,0 +1,12 @@
+def firstAbove(int limit):
+    n = 0
+    while n < 100:
+        n += 1
+        if n * n > limit:
+            return n
+    return 0
+
+total = 0
+for i in 0..5:
+    total += firstAbove(i * 10)
+print(total)
@@ -0,0 +1,15 @@
+int:int squares = {}
+for i in 0..5:
+    squares[i] = i * i
+squares[2] = squares[2] + 10
+total = 0
+for k in squares:
+    total += k + squares[k]
+print(total)
+print(squares.len)
+str:int ages = {}
+ages["ana"] = 30
+ages["bob"] = 25
+ages["ana"] = 31
+print(ages["ana"] + ages["bob"])
+print(ages.len)
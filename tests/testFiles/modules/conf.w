@@ -0,0 +1,5 @@
+limit = 5
+names = [1, 2, 3]
+float ratio = 2.5
+def twice(int a):
+    return a * 2
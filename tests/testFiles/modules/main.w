@@ -0,0 +1,3 @@
+import conf
+print(limit)
+print(twice(limit))
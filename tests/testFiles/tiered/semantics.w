@@ -0,0 +1,18 @@
+def m(int a):
+    return a % 3
+
+def big(int a):
+    return a * 3037000500
+
+def half(int a):
+    return a / 2
+
+total = 0
+for i in 0..200000:
+    total += m(-7)
+print(total)
+big2 = 0
+for i in 0..3000:
+    big2 = big(3037000500 + i)
+print(big2)
+print(half(7))
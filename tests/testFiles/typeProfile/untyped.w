@@ -0,0 +1,14 @@
+def scale(x, y):
+    return x * y
+
+def half(v):
+    return v / 2
+
+def mix(a):
+    b = a + 1
+    return b
+
+print(scale(3, 4))
+print(half(5.0))
+print(mix(2))
+print(mix(2.5))
@@ -0,0 +1,154 @@
+import sys, os
+sys.path.insert(1, os.path.pardir+'/core')
+import json
+import shutil
+import unittest
+import tempfile
+import subprocess
+from unittest import mock
+import buildCache
+import probe
+from sourceMap import encodeVlq, sourceMap
+from profileReport import report
+
+class BuildCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        # The cache is kept in the home folder
+        self.home = mock.patch.dict(os.environ, {'HOME':self.folder.name})
+        self.home.start()
+
+    def tearDown(self):
+        self.home.stop()
+        self.folder.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.folder.name, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def test_keyStable(self):
+        source = self.write('main.c', '#include "list_int.h"\nint main() { return 0; }\n')
+        self.write('list_int.h', 'typedef int list_int;\n')
+        command = ['photon-missing-cc', '-O2', source]
+        key = buildCache.buildKey(source, command)
+        self.assertEqual(key, buildCache.buildKey(source, command))
+        self.assertNotEqual(key, buildCache.buildKey(source, command + ['-g']))
+        self.assertNotEqual(key, buildCache.buildKey(source, command, salt='profile'))
+        # Headers included by the source are part of the key
+        self.write('list_int.h', 'typedef long list_int;\n')
+        self.assertNotEqual(key, buildCache.buildKey(source, command))
+
+    def test_evictLeastRecentlyUsed(self):
+        for n, key in enumerate(['a', 'b', 'c']):
+            buildCache.store(key, self.write('build', key * 10))
+            cached = os.path.join(buildCache.cacheDir(), key)
+            os.utime(cached, (n, n))
+        # A hit makes a the most recently used
+        self.assertTrue(buildCache.fetch('a', os.path.join(self.folder.name, 'out')))
+        buildCache.evict(maxSize=20)
+        self.assertEqual(sorted(os.listdir(buildCache.cacheDir())), ['a', 'c'])
+        self.assertFalse(buildCache.fetch('b', os.path.join(self.folder.name, 'out')))
+
+    @unittest.skipIf(shutil.which('gcc') is None or shutil.which('ar') is None, 'gcc and ar are needed')
+    def test_runtimeLibraryBuiltOnce(self):
+        runtime = os.path.join(self.folder.name, 'runtime')
+        os.mkdir(runtime)
+        with open(os.path.join(runtime, 'photonNothing.c'), 'w') as f:
+            f.write('int photonNothing() { return 0; }\n')
+        library = buildCache.runtimeLibrary(runtime, ['-O2'])
+        built = os.stat(library).st_mtime_ns
+        # LTO and profiling flags don't change the runtime
+        self.assertEqual(buildCache.runtimeLibrary(runtime, ['-O2', '-flto']), library)
+        self.assertEqual(os.stat(library).st_mtime_ns, built)
+        self.assertNotEqual(buildCache.runtimeLibrary(runtime, ['-O0']), library)
+
+class ProbeTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        # A compiler that logs its calls, first in the PATH
+        self.log = os.path.join(self.folder.name, 'calls')
+        self.compiler = os.path.join(self.folder.name, 'cc')
+        with open(self.compiler, 'w') as f:
+            f.write(f'#!/bin/sh\necho "$@" >> {self.log}\n')
+        os.chmod(self.compiler, 0o755)
+        self.environ = mock.patch.dict(os.environ, {'HOME':self.folder.name,
+            'PATH':self.folder.name + os.pathsep + os.environ.get('PATH', '')})
+        self.environ.start()
+        probe.probed = None
+
+    def tearDown(self):
+        self.environ.stop()
+        probe.probed = None
+        self.folder.cleanup()
+
+    def calls(self):
+        with open(self.log) as f:
+            return len(f.readlines())
+
+    def test_supportsCached(self):
+        self.assertTrue(probe.supports('cc', 'lto'))
+        # The version and each of the flags
+        calls = self.calls()
+        self.assertEqual(calls, 1 + len(probe.compilerFlags))
+        self.assertTrue(probe.supports('cc', 'openmp'))
+        self.assertFalse(probe.supports('cc', 'unknown'))
+        # Later runs read the probes saved in the home folder
+        probe.probed = None
+        self.assertTrue(probe.supports('cc', 'native'))
+        self.assertEqual(self.calls(), calls)
+        # A new version of the compiler is probed again
+        os.utime(self.compiler, (0, 0))
+        probe.supports('cc', 'lto')
+        self.assertEqual(self.calls(), 2 * calls)
+
+class SourceMapTest(unittest.TestCase):
+    def test_encodeVlq(self):
+        values = [0, 1, -1, 15, 16, -16, 123, -123, 1024]
+        self.assertEqual([encodeVlq(v) for v in values], ['A', 'C', 'D', 'e', 'gB', 'hB', '2H', '3H', 'ggC'])
+
+    def test_sourceMap(self):
+        folder = os.path.join('Sources', 'js')
+        origins = [('main.w', 1), None, ('main.w', 3), ('conf.w', 2), ('main.w', 2)]
+        result = sourceMap('main.js', origins, folder)
+        self.assertEqual(result['version'], 3)
+        self.assertEqual(result['file'], 'main.js')
+        self.assertEqual(result['sources'], ['../../main.w', '../../conf.w'])
+        # Generated column, source, source line and column, relative to the previous segment
+        self.assertEqual(result['mappings'], 'AAAA;;AAEA;ACDA;ADAA')
+
+class ProfileReportTest(unittest.TestCase):
+    def test_report(self):
+        probes = [
+            {'name':'fib', 'kind':'func', 'file':'main.w', 'line':1, 'calls':177, 'inclusive':0.5, 'exclusive':0.25},
+            {'name':'for', 'kind':'loop', 'file':'main.w', 'line':5, 'calls':1, 'inclusive':1.0, 'exclusive':0.75},
+            {'name':'twice', 'kind':'func', 'file':'missing.w', 'line':3, 'calls':2, 'inclusive':0.0, 'exclusive':0.0},
+        ]
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, 'main.w'), 'w') as f:
+                f.write('def fib(n):\n    return n\n\ntotal = 0\nfor i in 0..10:\n    total += fib(i)\n')
+            filename = os.path.join(folder, 'photon.profile.json')
+            with open(filename, 'w') as f:
+                json.dump({'probes':probes}, f)
+            lines = report(filename).splitlines()
+        self.assertEqual(lines[0], 'main.w')
+        self.assertEqual(lines[1].split(), ['line', 'calls', 'total', '(s)', 'self', '(s)', 'self', '%', 'source'])
+        # Slowest first, with the share of the self time and the Photon line
+        self.assertEqual(lines[2].split(), ['5', '1', '1.0000', '0.7500', '75.0%', 'for', 'i', 'in', '0..10:'])
+        self.assertEqual(lines[3].split(), ['1', '177', '0.5000', '0.2500', '25.0%', 'def', 'fib(n):'])
+        # Without the source, the name of the site is shown
+        self.assertEqual(lines[5], 'missing.w')
+        self.assertEqual(lines[7].split(), ['3', '2', '0.0000', '0.0000', '0.0%', 'twice'])
+
+class CommandLineTest(unittest.TestCase):
+    def test_missingOptionValue(self):
+        ''' An option given without its value is an error, not the REPL '''
+        photon = os.path.join(os.path.pardir, 'core', 'photon.py')
+        for args in [['main.w', '--mode'], ['main.w', '--types'], ['--bench', 'main.w', '-n']]:
+            result = subprocess.run([sys.executable, photon] + args, stdin=subprocess.DEVNULL, capture_output=True, timeout=60)
+            self.assertEqual(result.returncode, 1, args)
+            self.assertIn(f'missing value for {args[-1]}', result.stdout.decode(), args)
+
+if __name__ == "__main__":
+    unittest.main()
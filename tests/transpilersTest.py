@@ -2,8 +2,13 @@ import sys, os
 sys.path.insert(1, os.path.pardir+'/core')
 from photonParser import parse
 from interpreter import Interpreter
+import json
+import shutil
+import tempfile
 import unittest
-from subprocess import Popen, PIPE
+from subprocess import Popen, PIPE, run
+from contextlib import redirect_stdout, nullcontext
+from io import StringIO
 
 class TranspilersTest(unittest.TestCase):
     def runFile(self, file, lang='c'):
@@ -38,5 +43,110 @@ class TranspilersTest(unittest.TestCase):
         out = self.runFile('printFunc/printVar.w')
         self.assertEqual(out, '2')
 
+    def buildAndRun(self, files, lang='c', stdin=b'', buildOptions=None, folder=None):
+        ''' Build the first file with the others in a folder, temporary if
+            not given, and return its output '''
+        libs = os.path.abspath(os.path.pardir + '/core/libs')
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() if folder is None else nullcontext(folder) as folder:
+            for name in files:
+                shutil.copy(f'testFiles/{name}', folder)
+            os.chdir(folder)
+            try:
+                with redirect_stdout(StringIO()):
+                    interpreter = Interpreter(filename=os.path.basename(files[0]), lang=lang, standardLibs=libs,
+                        transpileOnly=True, buildOptions=buildOptions or {})
+                    interpreter.run()
+                    command = interpreter.engine.compile()
+                return run(command, input=stdin, capture_output=True, check=True).stdout.decode()
+            finally:
+                os.chdir(cwd)
+
+    def test_moduleGlobals(self):
+        ''' Top level variables of a module are visible to its importers on C '''
+        out = self.buildAndRun(['modules/main.w', 'modules/conf.w'])
+        self.assertEqual(out.split(), ['5', '10'])
+
+    def test_mapOnEveryTarget(self):
+        ''' Map iteration and length give the same output on every target '''
+        for lang in ['c', 'py', 'js']:
+            out = self.buildAndRun(['map/mapIteration.w'], lang)
+            self.assertEqual(out.split(), ['50', '5', '56', '2'], lang)
+
+    def test_arrayMethodsOnEveryTarget(self):
+        ''' Array methods and range appends give the same output on every target '''
+        for lang in ['c', 'py', 'js']:
+            out = self.buildAndRun(['array/arrayMethods.w'], lang)
+            self.assertEqual(out.split(), ['0', '5', '5', '9', '4', '5', '35', '52', '2304'], lang)
+
+    def test_rangeAppendReserves(self):
+        ''' A list appended in a range loop is sized once before the loop on C '''
+        libs = os.path.abspath(os.path.pardir + '/core/libs')
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as folder:
+            shutil.copy('testFiles/array/arrayMethods.w', folder)
+            os.chdir(folder)
+            try:
+                with redirect_stdout(StringIO()):
+                    interpreter = Interpreter(filename='arrayMethods.w', lang='c', standardLibs=libs, transpileOnly=True)
+                    interpreter.run()
+            finally:
+                os.chdir(cwd)
+        source = '\n'.join(interpreter.engine.source)
+        self.assertIn('list_int_reserve(&squares, squares.len + (50) - (0));', source)
+
+    def test_readIntsOnEveryTarget(self):
+        ''' Ints are read from the whole input, across lines and spaces '''
+        for lang in ['c', 'py', 'js']:
+            out = self.buildAndRun(['input/readNumbers.w'], lang, stdin=b'3 4\n-5\n  100 7\n')
+            self.assertEqual(out.split(), ['109', '5'], lang)
+
+    def test_classAttributeTable(self):
+        ''' A class attribute initialized from a long literal, copied from a static table on C '''
+        for lang in ['c', 'py', 'js']:
+            out = self.buildAndRun(['class/attributeTable.w'], lang)
+            self.assertEqual(out.split(), ['39', '780'], lang)
+
+    def test_instrumentCallsOnEveryTarget(self):
+        ''' Every target counts the same calls of each probe, with a return out of a loop '''
+        for lang in ['c', 'py', 'js']:
+            with tempfile.TemporaryDirectory() as folder:
+                out = self.buildAndRun(['instrument/earlyReturn.w'], lang, buildOptions={'instrument':True}, folder=folder)
+                with open(os.path.join(folder, 'photon.profile.json')) as f:
+                    probes = json.load(f)['probes']
+            self.assertEqual(out.strip(), '23', lang)
+            calls = {p['name']:p['calls'] for p in probes}
+            self.assertEqual(calls, {'firstAbove':5, 'firstAbove:while@3':5, 'main:for@10':1}, lang)
+
+    def test_buildModeFlags(self):
+        ''' Each build mode maps to its C compiler flags '''
+        from transpilers.cTranspiler import Transpiler
+        flags = lambda options: Transpiler('main.w', buildOptions=options).buildFlags()
+        self.assertEqual(flags({'mode':'dev'}), ['-std=c99', '-O0', '-g'])
+        self.assertIn('-O3', flags({'mode':'release'}))
+        self.assertEqual(flags({}), ['-std=c99', '-O2', '-g'])
+        with self.assertRaises(SyntaxError):
+            flags({'mode':'fast'})
+
+    @unittest.skipIf(shutil.which('make') is None, 'make is needed')
+    def test_buildGraph(self):
+        ''' The generated Makefile builds the program without Photon '''
+        libs = os.path.abspath(os.path.pardir + '/core/libs')
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as folder:
+            shutil.copy('testFiles/printFunc/printInt.w', os.path.join(folder, 'main.w'))
+            os.chdir(folder)
+            try:
+                with redirect_stdout(StringIO()):
+                    interpreter = Interpreter(filename='main.w', lang='c', standardLibs=libs, transpileOnly=True)
+                    interpreter.run()
+                    interpreter.engine.writeBuildFiles()
+                self.assertTrue(os.path.isfile('Sources/c/build.ninja'))
+                run(['make', '-C', 'Sources/c', '-j', '2'], capture_output=True, check=True)
+                out = run(['Sources/c/main'], capture_output=True, check=True).stdout.decode()
+            finally:
+                os.chdir(cwd)
+        self.assertEqual(out.strip(), '26')
+
 if __name__ == "__main__":
     unittest.main()